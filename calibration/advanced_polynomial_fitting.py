@@ -1,10 +1,11 @@
 """
 advanced_polynomial_fitting.py
 
-This script employs SciPy's curve_fit function to perform polynomial fitting, which allows
-for a more sophisticated approach than standard polynomial fitting methods. It is capable of
-handling more complex models and provides advanced features like custom initial parameter guesses
-and optimization control.
+This script fits a polynomial and reports its coefficients together with their standard errors,
+as SciPy's curve_fit does. A polynomial is linear in its coefficients, so it is solved directly by
+QR in a Chebyshev basis, which is fast and stays well conditioned at high degrees. Per-point
+standard deviations (--sigma-var) weight the fit, and curve_fit is used when the coefficients are
+constrained with --bounds.
 
 The script is designed for users who require a nuanced approach to data modeling, such as
 fitting non-linear relationships or dealing with data that requires a more refined fitting algorithm.
@@ -30,48 +31,35 @@ This command would fit a cubic polynomial to the data provided in the specified
 using a more advanced fitting technique.
 """
 
-import numpy as np
-from scipy.optimize import curve_fit
-from dotenv import load_dotenv
-import os
 import argparse
-import matplotlib.pyplot as plt
+
+import numpy as np
+
+from calibration.cli import add_plot_arguments, add_variable_arguments, load_variables, plot_options
+from calibration.dataset import load_columns
+from calibration.models import CurveFitPolynomialModel
+from calibration.plotting import fit_curve, plot_fit
 
 # Set up command-line argument parsing
 parser = argparse.ArgumentParser(description='Fit a polynomial model of specified degree to data.')
 parser.add_argument('-d', '--degree', type=int, help='Degree of the polynomial model to fit.', required=True)
-parser.add_argument('-p', '--predictor-var', type=str, help='Environment variable name for the predictor variable data.', required=True)
-parser.add_argument('-r', '--response-var', type=str, help='Environment variable name for the response variable data.', required=True)
+add_variable_arguments(parser)
+parser.add_argument('--sigma-var', type=str, default=None,
+                    help='Environment variable or column name holding the standard deviation of each response value, used as fit weights.')
+parser.add_argument('--bounds', type=float, nargs=2, default=None, metavar=('LOWER', 'UPPER'),
+                    help='Bounds applied to every coefficient; the fit then uses curve_fit.')
+add_plot_arguments(parser)
 args = parser.parse_args()
 
-# Load environment variables from .env file
-load_dotenv()
-
-# Retrieve the data values from the .env file based on the provided variable names
-predictor_var_string = os.getenv(args.predictor_var)
-response_var_string = os.getenv(args.response_var)
-
-# Check if the data is available
-if predictor_var_string is None or response_var_string is None:
-    raise ValueError(f"Please ensure both environment variables '{args.predictor_var}' and '{args.response_var}' are set.")
+# Retrieve the data values from the .env file or data file based on the provided variable names
+predictor_vals, response_vals = load_variables(args)
 
-# Convert the string values to numpy arrays, assuming they are comma-separated
-predictor_vals = np.array(predictor_var_string.split(','), dtype=np.float64)
-response_vals = np.array(response_var_string.split(','), dtype=np.float64)
+sigma = load_columns([args.sigma_var], args.data)[0] if args.sigma_var else None
 
-# Define the form of the polynomial function you want to fit dynamically based on the degree
-def polynomial_function(x, *params):
-    return sum(p * x**i for i, p in enumerate(params))
-
-# Initial guess for the parameters -- a list of ones with the length of degree + 1
-initial_guess = [1] * (args.degree + 1)
-
-# Perform the curve fitting
-params, _ = curve_fit(polynomial_function, predictor_vals, response_vals, p0=initial_guess)
-
-# Define the fitted polynomial function using the fitted parameters
-def fitted_polynomial(x):
-    return sum(p * x**i for i, p in enumerate(params))
+# Fit the polynomial by least squares (or by curve_fit from a list of ones when bounded)
+model = CurveFitPolynomialModel(args.degree, bounds=args.bounds).fit(predictor_vals, response_vals, sigma=sigma)
+params = model.params['coefficients']
+standard_errors = np.sqrt(np.diag(model.params['covariance']))
 
 # Output the derived coefficients in descending order (highest degree first)
 print("Derived coefficients: ", end="")
@@ -86,19 +74,14 @@ print("Fitted Polynomial Model Coefficients:")
 for i in range(args.degree, -1, -1):
     print(f"a{i} = {params[::-1][args.degree-i]:.8f}")
 
-# Generate x values for plotting the fitted curve
-x_plot = np.linspace(min(predictor_vals), max(predictor_vals), 200)
-
-# Plot the original data and the fitted curve
-plt.figure(figsize=(10, 5))
-plt.scatter(predictor_vals, response_vals, label='Observed Data')
-plt.plot(x_plot, fitted_polynomial(x_plot), 'r-', label=f'Fitted Polynomial (degree={args.degree})')
+print("")
 
-# Set the labels using the command-line arguments for predictor and response variable names
-plt.xlabel(args.predictor_var.replace('_', ' ').title())
-plt.ylabel(args.response_var.replace('_', ' ').title())
+# Print the standard error of each coefficient from the covariance matrix
+print("Coefficient Standard Errors:")
+for i in range(args.degree, -1, -1):
+    print(f"a{i}: {standard_errors[i]:.8f}")
 
-plt.title('Polynomial Fit to Data')
-plt.legend()
-plt.grid(True)
-plt.show()
+# Plot the original data and the fitted curve, labelled with the predictor and response variable names
+plot_fit(predictor_vals, response_vals, fit_curve(model, predictor_vals), f'Fitted Polynomial (degree={args.degree})',
+         xlabel=args.predictor_var.replace('_', ' ').title(), ylabel=args.response_var.replace('_', ' ').title(),
+         title='Polynomial Fit to Data', **plot_options(args))
@@ -1,27 +1,29 @@
-import numpy as np
-import matplotlib.pyplot as plt
-from dotenv import load_dotenv
-import os
-
-# Load environment variables
-load_dotenv()
-
-# Fetch and process data from .env file
-humidity_vals = list(map(float, os.getenv("HUMIDITY_VALS").split(',')))
-vwc_vals = list(map(float, os.getenv("VWC_VALS").split(',')))
-
-# Perform quadratic regression to find the coefficients
-coefficients = np.polyfit(humidity_vals, vwc_vals, 2)
-
-# coefficients[0] will be 'a', coefficients[1] will be 'b', and coefficients[2] will be 'c'
-a, b, c = coefficients
-
-print(f"Derived coefficients: a = {a}, b = {b}, c = {c}")
-
-# Optional: Plotting to visualize the fit
-plt.scatter(humidity_vals, vwc_vals, label='Observed data')
-plt.plot(np.sort(humidity_vals), np.polyval(coefficients, np.sort(humidity_vals)), color='red', label='Fitted quadratic model')
-plt.xlabel('Humidity')
-plt.ylabel('VWC')
-plt.legend()
-plt.show()
\ No newline at end of file
+import numpy as np
+
+import argparse
+
+from calibration import PolynomialModel
+from calibration.cli import add_plot_arguments, add_variable_arguments, load_variables, plot_options
+from calibration.plotting import plot_fit
+
+# Set up command-line argument parsing
+parser = argparse.ArgumentParser(description='Fit a quadratic model to humidity and VWC data.')
+add_variable_arguments(parser, predictor='HUMIDITY_VALS', response='VWC_VALS')
+add_plot_arguments(parser)
+args = parser.parse_args()
+
+# Fetch and process data from the .env file or data file
+humidity_vals, vwc_vals = load_variables(args)
+
+# Perform quadratic regression to find the coefficients
+model = PolynomialModel(2).fit(humidity_vals, vwc_vals)
+
+# coefficients[0] will be 'a', coefficients[1] will be 'b', and coefficients[2] will be 'c'
+a, b, c = model.params['coefficients']
+
+print(f"Derived coefficients: a = {a}, b = {b}, c = {c}")
+
+# Optional: Plotting to visualize the fit
+sorted_humidity = np.sort(humidity_vals)
+plot_fit(humidity_vals, vwc_vals, (sorted_humidity, model.predict(sorted_humidity)), 'Fitted quadratic model',
+         xlabel='Humidity', ylabel='VWC', figsize=None, grid=False, **plot_options(args))
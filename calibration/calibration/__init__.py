@@ -0,0 +1,17 @@
+"""
+Shared calibration core used by the fitting scripts in this directory.
+
+Every model family implements the CalibrationModel fit/predict/to_dict interface and
+the scripts are thin command-line wrappers around it. Importing the package only
+imports NumPy: matplotlib, SciPy, scikit-learn and pyGAM are imported by
+the functions that need them, the first time they are called.
+"""
+
+from .base import MODELS, CalibrationModel, create_model, model_from_dict, register_model
+from .learners import GAMModel, RandomForestModel
+from .metrics import evaluate, format_metrics, mse, rmse, sem
+from .models import LinearModel, LogarithmicModel, MultivariatePolynomialModel, PolynomialModel, PowerModel, ToppModel
+from .hilhorst import HilhorstModel, estimate_esb_0, pore_water_ec
+from .piecewise import PiecewiseLinearModel, find_best_breakpoint, find_breakpoints
+from .splines import LinearSplineModel
+from .surrogate import SurrogateModel, compile_surrogate
@@ -0,0 +1,448 @@
+"""
+Command-line entry point, run from the calibration directory as `python -m calibration <command>`.
+
+Commands:
+    fit            Fit a model family once and save it as a model artifact.
+    update         Apply new reference points to a fitted linear-in-parameters model recursively.
+    predict        Convert a file (or standard input) of raw readings with a fitted model.
+    batch          Fit several model families to every sensor of a directory or manifest.
+    export         Write a fitted model as a C header for the sensor firmware.
+    compile        Compile an expensive fitted model into a fast surrogate model.
+    pore-water-ec  Recompute the Hilhorst pore-water EC of a logged history with a calibrated esb_0.
+    ingest         Convert live MQTT sensor readings with fitted models, republish or store them and watch for drift.
+    benchmark      Measure fit time, prediction throughput and fit memory of every model family.
+    history        Read raw readings or min/mean/max rollups of a series from a time-series store.
+    generate       Write a synthetic RAW/VWC/BULK_EC/TEMPERATURE data set for tests and benchmarks.
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import sys
+
+import numpy as np
+
+from . import MODELS, create_model
+from .artifacts import load_artifact, read_artifact_header, save_artifact
+from .benchmark import DEFAULT_PREDICT_SIZE, benchmark_targets, format_result, run_benchmarks
+from .benchmark import write_results as write_benchmark_results
+from .batch import DEFAULT_FAMILIES, discover_datasets, run_batch, write_results
+from .cli import add_data_argument, add_variable_arguments, load_variables, predictor_vars
+from .dataset import DATASET_FORMATS, DEFAULT_CHUNKSIZE, load_columns
+from .drift import DriftMonitor
+from .export import export_header
+from .hilhorst import COCO_COIR_ESB_0, ESB_0_VARIABLE, HilhorstModel, read_esb_0, write_pore_water_ec
+from .ingest import DEFAULT_BATCH_SIZE, DEFAULT_FLUSH_INTERVAL, CsvSink, IngestService, Route, connect, load_routes
+from .online import ONLINE_FAMILIES, update_artifact
+from .surrogate import SURROGATE_METHODS, SurrogateModel, compile_surrogate, format_report
+from .predict import write_predictions
+from .store import RESOLUTIONS, SeriesStore
+from .synthetic import SYNTHETIC_COLUMNS, SYNTHETIC_FORMATS, SensorSimulator, write_synthetic
+
+
+def parse_setting(setting):
+    """Parse a KEY=VALUE option, reading VALUE as JSON when possible."""
+    key, separator, value = setting.partition('=')
+    if not separator:
+        raise argparse.ArgumentTypeError(f"Expected KEY=VALUE, got '{setting}'.")
+    try:
+        return key, json.loads(value)
+    except ValueError:
+        return key, value
+
+
+def fit_command(args):
+    x, y = load_variables(args)
+    model = create_model(args.family, **dict(args.set)).fit(x, y)
+    output = args.output or f"{args.family}.{'json' if model.parametric else 'model'}"
+    predictors = predictor_vars(args)
+    # One predictor is recorded as a name, several (see the multivariate families) as a list
+    predictor = predictors[0] if len(predictors) == 1 else predictors
+    header = save_artifact(model, output, data=(x, y),
+                           metadata={'predictor': predictor, 'response': args.response_var, 'source': args.data or '.env'})
+    print(f"Saved {args.family} model fitted on {header['n_samples']} samples to {output}", file=sys.stderr)
+
+
+def update_command(args):
+    metadata = read_artifact_header(args.model).get('metadata', {})
+    predictor = args.predictor_var or metadata.get('predictor')
+    response = args.response_var or metadata.get('response')
+    if predictor is None or response is None:
+        raise ValueError(f"'{args.model}' does not record its variables; please give --predictor-var and --response-var.")
+    if not isinstance(predictor, str):
+        raise ValueError(f"'{args.model}' was fitted on the predictors {', '.join(predictor)}; "
+                         f"only models of a single predictor can be updated recursively.")
+    data = args.data or (metadata.get('source') if metadata.get('source') != '.env' else None)
+    x, y = load_columns([predictor, response], data)
+    model, count = update_artifact(args.model, x, y, forgetting=args.forgetting)
+    print(f"Updated {model.name} model in {args.model} with {count} new points "
+          f"(forgetting factor {model.params['forgetting']:g}, {model.params['n_updates']} updates in total)", file=sys.stderr)
+
+
+def predict_command(args):
+    model = load_artifact(args.model)
+    if args.output == '-':
+        write_predictions(model, args.input, sys.stdout, args.column, args.chunksize, header=not args.no_header)
+        return
+    with open(args.output, 'w') as output:
+        count = write_predictions(model, args.input, output, args.column, args.chunksize, header=not args.no_header)
+    print(f"Wrote {count} predictions to {args.output}", file=sys.stderr)
+
+
+def batch_command(args):
+    datasets = discover_datasets(args.source, args.predictor_var, args.response_var)
+    rows = run_batch(datasets, args.family or DEFAULT_FAMILIES, workers=args.workers, plot_dir=args.plot_dir)
+    count = write_results(rows, args.output)
+    if args.output != '-':
+        print(f"Wrote {count} results for {len(datasets)} sensors to {args.output}", file=sys.stderr)
+
+
+def export_command(args):
+    model = load_artifact(args.model)
+    text = export_header(model, name=args.name, x_range=args.range, tolerance=args.tolerance)
+    if args.output == '-':
+        sys.stdout.write(text)
+        return
+    with open(args.output, 'w') as output:
+        output.write(text)
+    print(f"Wrote {model.name} model to {args.output}", file=sys.stderr)
+
+
+def compile_command(args):
+    model = load_artifact(args.model)
+    surrogate, report = compile_surrogate(model, args.range, tolerance=args.tolerance, method=args.method)
+    save_artifact(surrogate, args.output, metadata={'source_model': args.model, 'max_error': report.max_error})
+    print(format_report(report), file=sys.stderr)
+    print(f"Saved surrogate of the {model.name} model to {args.output}", file=sys.stderr)
+
+
+def pore_water_ec_command(args):
+    columns = {'conductivity': args.conductivity_column, 'temperature': args.temperature_column,
+               'humidity': args.humidity_column, 'permittivity': args.permittivity_column, 'chunksize': args.chunksize}
+    esb_0 = read_esb_0(args.esb_0)
+    if args.output == '-':
+        write_pore_water_ec(args.input, sys.stdout, esb_0, header=not args.no_header, **columns)
+        return
+    with open(args.output, 'w') as output:
+        count = write_pore_water_ec(args.input, output, esb_0, header=not args.no_header, **columns)
+    print(f"Wrote the pore-water EC of {count} readings (esb_0 = {esb_0:g}) to {args.output}", file=sys.stderr)
+
+
+async def _ingest(args, service):
+    async with connect(args.host, port=args.port, username=args.username, password=args.password) as client:
+        if not args.no_publish:
+            service.publish = client.publish
+        await service.run(client)
+
+
+def _drift_monitor(args):
+    """
+    DriftMonitor appending its alerts to --drift-log as JSON lines, restored from
+    --drift-state if saved; the --drift-* settings given override the saved ones.
+    """
+    settings = {name: getattr(args, f'drift_{name}') for name in ('sigma', 'rise', 'drop', 'delta', 'threshold')}
+    settings = {name: value for name, value in settings.items() if value is not None}
+    if args.drift_state and os.path.exists(args.drift_state):
+        monitor = DriftMonitor.load(args.drift_state)
+        for name, value in settings.items():
+            setattr(monitor, name, value)
+    else:
+        monitor = DriftMonitor(**settings)
+
+    def on_alert(alert):
+        print(f"Drift of {alert.probe}: {alert.kind} statistic {alert.statistic:.3g}", file=sys.stderr)
+        with open(args.drift_log, 'a') as log:
+            log.write(json.dumps(alert._asdict()) + '\n')
+
+    monitor.on_alert = on_alert
+    return monitor
+
+
+def _reference_route(text):
+    """Parse a --drift-references REFERENCE_TOPIC=PROBE_TOPIC option into a Route mapping reference topics to probes."""
+    topic, separator, probe = text.partition('=')
+    if not separator or not topic or not probe:
+        raise argparse.ArgumentTypeError(f"Expected REFERENCE_TOPIC=PROBE_TOPIC, got '{text}'.")
+    return Route(topic, probe)
+
+
+def ingest_command(args):
+    sinks = []
+    if args.persist:
+        sinks.append(CsvSink(args.persist))
+    if args.drift_references and not args.drift_log:
+        raise ValueError("--drift-references needs --drift-log to report the alerts to.")
+    monitor = _drift_monitor(args) if args.drift_log else None
+    if monitor is not None:
+        sinks.append(monitor)
+
+    def sink(*batch):
+        for each in sinks:
+            each(*batch)
+
+    store = SeriesStore(args.store) if args.store else None
+    references = args.drift_references
+
+    def record(topics, timestamps, values):
+        # Reference VWCs are compared with the latest calibrated reading of the probe their topic maps to
+        probes, positions = [], []
+        for i, topic in enumerate(topics):
+            resolved = next((r for r in (route.resolve(topic) for route in references) if r is not None), None)
+            if resolved is not None:
+                probes.append(resolved[0])
+                positions.append(i)
+        if probes:
+            for alert in monitor.add_latest_references(probes, np.asarray(values)[positions], np.asarray(timestamps)[positions]):
+                monitor.on_alert(alert)
+        if store is not None:
+            store.append_many(topics, timestamps, values)
+
+    service = IngestService(load_routes(args.routes), sink=sink if sinks else None, batch_size=args.batch_size,
+                            flush_interval=args.flush_interval, recorder=record if store or references else None,
+                            subscriptions=args.record + [route.subscription for route in references])
+    try:
+        asyncio.run(_ingest(args, service))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if args.persist:
+            sinks[0].close()
+        if monitor is not None and args.drift_state:
+            monitor.save(args.drift_state)
+        print(', '.join(f'{count} {name}' for name, count in service.stats.items()) + ' readings', file=sys.stderr)
+
+
+def benchmark_command(args):
+    targets = args.target or benchmark_targets()
+    sizes = [10**exponent for exponent in range(args.sizes[0], args.sizes[1] + 1)]
+    results = []
+    for result in run_benchmarks(targets, sizes, timeout=args.timeout, predict_size=args.predict_size):
+        print(format_result(result), flush=True)
+        results.append(result)
+    if args.output:
+        write_benchmark_results(results, args.output)
+        print(f"Wrote {len(results)} benchmark results to {args.output}", file=sys.stderr)
+
+
+def parse_time(text):
+    """POSIX seconds from a number or an ISO 8601 date or time, taken as UTC unless it has an offset."""
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    try:
+        moment = datetime.datetime.fromisoformat(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'{text}' is neither POSIX seconds nor an ISO 8601 date or time.") from None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=datetime.timezone.utc)
+    return moment.timestamp()
+
+
+def history_command(args):
+    records = SeriesStore(args.store).read(args.series, args.start, args.stop, args.resolution)
+    output = sys.stdout if args.output == '-' else open(args.output, 'w')
+    try:
+        output.write(','.join(records.dtype.names) + '\n')
+        row = ','.join({'time': '%.13g', 'count': '%d'}.get(name, '%.10g') for name in records.dtype.names) + '\n'
+        output.write((row * len(records)) % tuple(value for record in records.tolist() for value in record))
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    if output is not sys.stdout:
+        print(f"Wrote {len(records)} records of {args.series} to {args.output}", file=sys.stderr)
+
+
+def generate_command(args):
+    simulator = SensorSimulator(seed=args.seed, start=args.start, interval=args.interval, noise=args.noise, drift=args.drift,
+                                outliers=args.outliers, esb_0=args.esb_0, pore_water_ec=args.pore_water_ec)
+    count = write_synthetic(args.output, args.rows, simulator, columns=args.column or SYNTHETIC_COLUMNS,
+                            chunksize=args.chunksize)
+    print(f"Wrote {count} synthetic rows to {args.output}", file=sys.stderr)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m calibration', description='Calibration model tools.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    fit = subparsers.add_parser('fit', help='Fit a model family and save it as a model artifact.')
+    families = sorted(name for name, cls in MODELS.items() if cls not in (SurrogateModel, HilhorstModel))
+    fit.add_argument('-f', '--family', type=str, required=True, choices=families, help='Model family to fit.')
+    add_variable_arguments(fit, predictor='RAW', response='VWC', multiple=True)
+    fit.add_argument('-s', '--set', type=parse_setting, action='append', default=[], metavar='KEY=VALUE',
+                     help='Model family option, e.g. degree=3 or knots=[20,35]; may be repeated.')
+    fit.add_argument('-o', '--output', type=str, default=None,
+                     help='Artifact path. Defaults to <family>.json for parametric families and <family>.model otherwise.')
+    fit.set_defaults(handler=fit_command)
+
+    update = subparsers.add_parser('update', help='Apply new reference points to a fitted model by recursive least squares.')
+    update.add_argument('-m', '--model', type=str, required=True,
+                        help=f"Artifact of a {', '.join(ONLINE_FAMILIES)} model, rewritten in place.")
+    add_data_argument(update)
+    update.add_argument('-p', '--predictor-var', type=str, default=None,
+                        help='Predictor variable or column name. Defaults to the one the model was fitted with.')
+    update.add_argument('-r', '--response-var', type=str, default=None,
+                        help='Response variable or column name. Defaults to the one the model was fitted with.')
+    update.add_argument('--forgetting', type=float, default=None,
+                        help='Forgetting factor in (0, 1]; older points are weighted down by it per newer point. '
+                             'Defaults to 1 (no forgetting), or the factor already stored with the model.')
+    update.set_defaults(handler=update_command)
+
+    predict = subparsers.add_parser('predict', help='Convert raw readings with a fitted model.')
+    predict.add_argument('-m', '--model', type=str, required=True, help='Fitted model file.')
+    predict.add_argument('-i', '--input', type=str, default='-',
+                         help="Data file, text file of numbers, or '-' for standard input (the default).")
+    predict.add_argument('-c', '--column', type=str, action='append', default=None,
+                         help='Column holding the readings in a data file; repeat it, in the order fitted, for a model '
+                              'of several predictors.')
+    predict.add_argument('-o', '--output', type=str, default='-', help="Output CSV file, or '-' for standard output (the default).")
+    predict.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE, help='Number of readings converted per vectorized call.')
+    predict.add_argument('--no-header', action='store_true', help='Do not write a header row.')
+    predict.set_defaults(handler=predict_command)
+
+    batch = subparsers.add_parser('batch', help='Fit several model families to every sensor of a directory or manifest.')
+    batch.add_argument('source', type=str,
+                       help=f"Directory of per-sensor data files ({', '.join(DATASET_FORMATS)} or .env), "
+                            "or a CSV manifest with sensor and path columns.")
+    batch.add_argument('-f', '--family', type=str, action='append', choices=families,
+                       help=f"Model family to fit; may be repeated. Defaults to {', '.join(DEFAULT_FAMILIES)}.")
+    batch.add_argument('-p', '--predictor-var', type=str, default='RAW', help='Predictor variable or column name. Defaults to RAW.')
+    batch.add_argument('-r', '--response-var', type=str, default='VWC', help='Response variable or column name. Defaults to VWC.')
+    batch.add_argument('-w', '--workers', type=int, default=None, help='Number of worker processes. Defaults to one per CPU core.')
+    batch.add_argument('-o', '--output', type=str, default='-', help="Results CSV file, or '-' for standard output (the default).")
+    batch.add_argument('--plot-dir', type=str, default=None, help='Write a PNG diagnostic figure for every fit to this directory.')
+    batch.set_defaults(handler=batch_command)
+
+    export = subparsers.add_parser('export', help='Write a fitted model as a C header for the sensor firmware.')
+    export.add_argument('-m', '--model', type=str, required=True, help='Fitted model file.')
+    export.add_argument('-o', '--output', type=str, default='-', help="Header file, or '-' for standard output (the default).")
+    export.add_argument('-n', '--name', type=str, default='calibration',
+                        help='Prefix of the generated identifiers, e.g. vwc gives vwc_evaluate(). Defaults to calibration.')
+    export.add_argument('--range', type=float, nargs=2, default=None, metavar=('LOW', 'HIGH'),
+                        help='Valid range of readings, required for models exported as lookup tables.')
+    export.add_argument('--tolerance', type=float, default=0.01,
+                        help='Maximum error of a lookup table against the model. Defaults to 0.01.')
+    export.set_defaults(handler=export_command)
+
+    compile_ = subparsers.add_parser('compile', help='Compile an expensive fitted model into a fast surrogate model.')
+    compile_.add_argument('-m', '--model', type=str, required=True, help='Fitted model file.')
+    compile_.add_argument('-o', '--output', type=str, required=True, help='Surrogate artifact path (JSON).')
+    compile_.add_argument('--range', type=float, nargs=2, required=True, metavar=('LOW', 'HIGH'),
+                          help='Valid range of readings to compile the model over.')
+    compile_.add_argument('--tolerance', type=float, default=0.01, help='Maximum deviation from the model. Defaults to 0.01.')
+    compile_.add_argument('--method', choices=SURROGATE_METHODS, default='linear',
+                          help='Adaptive piecewise-linear (the default) or Chebyshev surrogate.')
+    compile_.set_defaults(handler=compile_command)
+
+    pore = subparsers.add_parser('pore-water-ec', help='Recompute the Hilhorst pore-water EC of a logged history.')
+    pore.add_argument('-i', '--input', type=str, required=True, help=f"Data file ({', '.join(DATASET_FORMATS)}) of the history.")
+    pore.add_argument('-o', '--output', type=str, default='-', help="Output CSV file, or '-' for standard output (the default).")
+    pore.add_argument('--esb-0', type=str, default=str(COCO_COIR_ESB_0),
+                      help=f'Permittivity at zero bulk EC: a number, an esb_0 artifact or an .env file setting {ESB_0_VARIABLE}. '
+                           f'Defaults to the firmware\'s {COCO_COIR_ESB_0} for coco coir.')
+    pore.add_argument('--conductivity-column', type=str, default='conductivity', help='Bulk EC column. Defaults to conductivity.')
+    pore.add_argument('--temperature-column', type=str, default='temperature', help='Temperature column. Defaults to temperature.')
+    permittivity = pore.add_mutually_exclusive_group()
+    permittivity.add_argument('--humidity-column', type=str, default='moisture',
+                              help='Humidity column the bulk permittivity is computed from. Defaults to moisture.')
+    permittivity.add_argument('--permittivity-column', type=str, default=None, help='Bulk permittivity column, if logged.')
+    pore.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE, help='Number of readings processed per vectorized call.')
+    pore.add_argument('--no-header', action='store_true', help='Do not write a header row.')
+    pore.set_defaults(handler=pore_water_ec_command)
+
+    ingest = subparsers.add_parser('ingest', help='Convert live MQTT sensor readings with fitted models (requires aiomqtt).')
+    ingest.add_argument('-r', '--routes', type=str, required=True,
+                        help='JSON file mapping topic patterns to model artifacts and output topics.')
+    ingest.add_argument('--host', type=str, default='localhost', help='MQTT broker host. Defaults to localhost.')
+    ingest.add_argument('--port', type=int, default=1883, help='MQTT broker port. Defaults to 1883.')
+    ingest.add_argument('--username', type=str, default=None, help='MQTT user name.')
+    ingest.add_argument('--password', type=str, default=None, help='MQTT password.')
+    ingest.add_argument('--persist', type=str, default=None, help='Append every converted reading to this CSV file.')
+    ingest.add_argument('--no-publish', action='store_true', help='Do not republish converted readings to the output topics.')
+    ingest.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f'Number of buffered readings that triggers a conversion. Defaults to {DEFAULT_BATCH_SIZE}.')
+    ingest.add_argument('--flush-interval', type=float, default=DEFAULT_FLUSH_INTERVAL,
+                        help=f'Seconds between conversions of the buffered readings. Defaults to {DEFAULT_FLUSH_INTERVAL}.')
+    ingest.add_argument('--store', type=str, default=None,
+                        help='Time-series store directory keeping the raw value of every numeric message received.')
+    ingest.add_argument('--record', type=str, action='append', default=[], metavar='TOPIC',
+                        help='Additional topic filter to subscribe to and record in --store, e.g. soil/+/temperature; may be repeated.')
+    ingest.add_argument('--drift-log', type=str, default=None,
+                        help='Watch the saturation plateaus of the converted readings for drift and append alerts to this file as JSON lines.')
+    ingest.add_argument('--drift-state', type=str, default=None,
+                        help='File the drift statistics are restored from at start and saved to at exit.')
+    ingest.add_argument('--drift-references', type=_reference_route, action='append', default=[],
+                        metavar='REFERENCE_TOPIC=PROBE_TOPIC',
+                        help='Topic of reference VWCs and the topic of the probe they belong to, e.g. '
+                             'soil/{sensor}/reference=soil/{sensor}/moisture; each reference is compared with the '
+                             "probe's latest converted reading by a CUSUM. May be repeated.")
+    ingest.add_argument('--drift-sigma', type=float, default=None,
+                        help='Residual standard deviation of the calibrations, scaling the reference CUSUM. Defaults to 1.')
+    ingest.add_argument('--drift-rise', type=float, default=None,
+                        help='Rise of the converted reading starting an irrigation event, in its units. '
+                             'Defaults to 3 (VWC in percent); use e.g. 0.03 for models predicting fractions.')
+    ingest.add_argument('--drift-drop', type=float, default=None,
+                        help="Drop below an event's peak ending it, in the units of the converted reading. Defaults to 1.")
+    ingest.add_argument('--drift-delta', type=float, default=None,
+                        help='Shift of the plateau levels tolerated by the Page-Hinkley test, in the units of the converted '
+                             'reading. Defaults to 0.5.')
+    ingest.add_argument('--drift-threshold', type=float, default=None,
+                        help='Page-Hinkley decision threshold of the plateau levels. Defaults to 5.')
+    ingest.set_defaults(handler=ingest_command)
+
+    benchmark = subparsers.add_parser('benchmark', help='Measure fit time, prediction throughput and peak memory above the worker\'s pre-fit baseline per model family.')
+    benchmark.add_argument('-t', '--target', type=str, action='append', choices=benchmark_targets(), metavar='TARGET',
+                           help='Model family or multi_model_regressor.py regressor to benchmark; may be repeated. Defaults to all of them.')
+    benchmark.add_argument('--sizes', type=int, nargs=2, default=(2, 5), metavar=('MIN', 'MAX'),
+                           help='Benchmark 10^MIN to 10^MAX data points, one power of ten at a time. Defaults to 2 5.')
+    benchmark.add_argument('--timeout', type=float, default=120,
+                           help='Seconds after which a case is stopped and its target skipped at larger sizes. Defaults to 120.')
+    benchmark.add_argument('--predict-size', type=int, default=DEFAULT_PREDICT_SIZE,
+                           help=f'Largest number of readings predicted in one batch. Defaults to {DEFAULT_PREDICT_SIZE}.')
+    benchmark.add_argument('-o', '--output', type=str, default=None, help='Also write the results to this CSV file.')
+    benchmark.set_defaults(handler=benchmark_command)
+
+    history = subparsers.add_parser('history', help='Read a series of raw readings or rollups from a time-series store.')
+    history.add_argument('store', type=str, help='Time-series store directory.')
+    history.add_argument('series', type=str, help='Series name, the topic its readings arrived on, e.g. soil/thcs1/moisture.')
+    history.add_argument('--start', type=parse_time, default=None,
+                         help='First time to read, as POSIX seconds or an ISO 8601 date or time (UTC unless given).')
+    history.add_argument('--stop', type=parse_time, default=None, help='Time to read up to, excluding it.')
+    history.add_argument('--resolution', choices=RESOLUTIONS, default=None,
+                         help='Read min/mean/max rollups at this resolution instead of the raw readings.')
+    history.add_argument('-o', '--output', type=str, default='-', help="Output CSV file, or '-' for standard output (the default).")
+    history.set_defaults(handler=history_command)
+
+    generate = subparsers.add_parser('generate', help='Write a synthetic data set following the Topp and Hilhorst relations.')
+    generate.add_argument('-n', '--rows', type=int, default=100_000, help='Number of rows, one per logging interval. Defaults to 100000.')
+    generate.add_argument('-o', '--output', type=str, required=True,
+                          help=f"Output file; its extension selects the format ({', '.join(SYNTHETIC_FORMATS)}).")
+    generate.add_argument('-c', '--column', type=str, action='append', choices=SYNTHETIC_COLUMNS, metavar='COLUMN',
+                          help=f"Column to write; may be repeated. Defaults to all of them: {', '.join(SYNTHETIC_COLUMNS)}.")
+    generate.add_argument('--seed', type=int, default=0, help='Random seed; the same seed gives the same data. Defaults to 0.')
+    generate.add_argument('--start', type=parse_time, default=SensorSimulator().start,
+                          help='Time of the first row, as POSIX seconds or an ISO 8601 date or time. Defaults to 2026-01-01.')
+    generate.add_argument('--interval', type=float, default=600, help='Seconds between rows. Defaults to 600.')
+    generate.add_argument('--noise', type=float, default=0.3, help='Standard deviation of the raw reading noise. Defaults to 0.3.')
+    generate.add_argument('--drift', type=float, default=0.0, help='Drift of the raw reading per day. Defaults to 0.')
+    generate.add_argument('--outliers', type=float, default=0.0, help='Fraction of raw readings that are outliers. Defaults to 0.')
+    generate.add_argument('--esb-0', type=float, default=COCO_COIR_ESB_0,
+                          help=f'Permittivity at zero bulk EC of the simulated substrate. Defaults to {COCO_COIR_ESB_0}.')
+    generate.add_argument('--pore-water-ec', type=float, default=2000.0,
+                          help='Pore-water EC (uS/cm) at the first row; it rises by salt build-up. Defaults to 2000.')
+    generate.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE,
+                          help=f'Rows generated and written at a time. Defaults to {DEFAULT_CHUNKSIZE}.')
+    generate.set_defaults(handler=generate_command)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+"""
+Versioned model artifacts, so a model is fitted once and later processes only load it.
+
+Parametric models are stored as compact JSON. Estimator-backed models (random forests,
+GAMs) are stored in a binary file: a magic number, the length of a JSON header, the
+JSON header itself and a pickle of the model. Both formats carry the same header:
+
+    {
+        "format": "calibration-model",
+        "version": 1,
+        "family": "polynomial",
+        "data_hash": "sha256:...",     # content hash of the training data, or null
+        "n_samples": 40,
+        "created": "2026-10-17T12:00:00+00:00",
+        "metadata": {...}
+    }
+
+so a stale artifact can be detected by hashing the current training data and
+comparing it with `data_hash`, without unpickling anything.
+
+Only load binary artifacts from trusted sources: unpickling can execute code.
+"""
+
+import datetime
+import hashlib
+import json
+import os
+import pickle
+import struct
+import warnings
+
+import numpy as np
+
+from .base import model_from_dict
+
+ARTIFACT_FORMAT = 'calibration-model'
+ARTIFACT_VERSION = 1
+
+# Leading bytes of binary artifacts; JSON artifacts start with '{'
+BINARY_MAGIC = b'CALMODEL'
+
+# Number of values hashed at a time, so memory-mapped data is not read in one go
+_HASH_CHUNKSIZE = 1 << 20
+
+
+class ArtifactError(ValueError):
+    """Raised when a file is not a model artifact this version can read."""
+
+
+class StaleArtifactError(ArtifactError):
+    """Raised when an artifact was fitted on different data than the data it is checked against."""
+
+
+def data_hash(*arrays):
+    """Content hash of the given arrays, taken over their float64 values and lengths."""
+    digest = hashlib.sha256()
+    for array in arrays:
+        array = np.asarray(array)
+        digest.update(struct.pack('<q', len(array)))
+        for start in range(0, len(array), _HASH_CHUNKSIZE):
+            chunk = np.ascontiguousarray(array[start:start + _HASH_CHUNKSIZE], dtype='<f8')
+            digest.update(chunk.tobytes())
+    return f"sha256:{digest.hexdigest()}"
+
+
+def _header(model, data, metadata):
+    return {
+        'format': ARTIFACT_FORMAT,
+        'version': ARTIFACT_VERSION,
+        'family': model.name,
+        'data_hash': data_hash(*data) if data else None,
+        'n_samples': len(data[0]) if data else None,
+        'created': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'metadata': metadata or {},
+    }
+
+
+def save_artifact(model, path, data=(), metadata=None):
+    """
+    Save a fitted model to `path`.
+
+    `data` is the tuple of training arrays (e.g. `(x, y)`) whose content hash is stored
+    with the model. Returns the artifact header.
+    """
+    header = _header(model, data, metadata)
+    if model.parametric:
+        with open(path, 'w') as file:
+            json.dump({**header, 'model': model.to_dict()}, file, separators=(',', ':'))
+        return header
+
+    header_bytes = json.dumps(header, separators=(',', ':')).encode()
+    with open(path, 'wb') as file:
+        file.write(BINARY_MAGIC)
+        file.write(struct.pack('<I', len(header_bytes)))
+        file.write(header_bytes)
+        pickle.dump(model, file, protocol=pickle.HIGHEST_PROTOCOL)
+    return header
+
+
+def _check_header(path, header):
+    if header.get('format') != ARTIFACT_FORMAT:
+        raise ArtifactError(f"'{path}' is not a calibration model artifact.")
+    if header.get('version', 0) > ARTIFACT_VERSION:
+        raise ArtifactError(f"'{path}' has artifact version {header['version']}, "
+                            f"but this version of the package only reads up to version {ARTIFACT_VERSION}.")
+    return header
+
+
+def _read(path, load_model):
+    with open(path, 'rb') as file:
+        if file.read(len(BINARY_MAGIC)) == BINARY_MAGIC:
+            (length,) = struct.unpack('<I', file.read(4))
+            header = _check_header(path, json.loads(file.read(length)))
+            return header, pickle.load(file) if load_model else None
+
+        file.seek(0)
+        try:
+            content = json.load(file)
+        except ValueError:
+            raise ArtifactError(f"'{path}' is not a calibration model artifact.") from None
+
+    # Plain `CalibrationModel.to_dict()` output carries no header
+    if 'format' not in content and 'family' in content:
+        header = {'format': ARTIFACT_FORMAT, 'version': 0, 'family': content['family'], 'data_hash': None}
+        return header, model_from_dict(content) if load_model else None
+
+    header = _check_header(path, {key: value for key, value in content.items() if key != 'model'})
+    return header, model_from_dict(content['model']) if load_model else None
+
+
+def read_artifact_header(path):
+    """Read an artifact's header without loading the model."""
+    return _read(path, load_model=False)[0]
+
+
+def check_artifact(header, data):
+    """Raise StaleArtifactError unless the artifact described by `header` was fitted on `data`."""
+    if header.get('data_hash') is None:
+        return
+    current = data_hash(*data)
+    if current != header['data_hash']:
+        raise StaleArtifactError(f"The {header['family']} model was fitted on different data "
+                                 f"({header['data_hash']}, current data is {current}); it needs to be refitted.")
+
+
+def load_artifact(path, data=None):
+    """
+    Load the fitted model saved at `path`.
+
+    When the training arrays are passed as `data`, raise StaleArtifactError if they no
+    longer match the data the model was fitted on.
+    """
+    if data is not None:
+        check_artifact(read_artifact_header(path), data)
+    return _read(path, load_model=True)[1]
+
+
+def load_or_fit(path, fit, data=(), refit=False, metadata=None):
+    """
+    Return the model saved at `path`, or fit, save and return a new one.
+
+    A new model is fitted when `refit` is set, when there is no artifact at `path` yet,
+    or when the training arrays `data` no longer match the data the saved model was
+    fitted on. `fit` is called without arguments and must return the fitted model.
+    """
+    if not refit and os.path.exists(path):
+        try:
+            return load_artifact(path, data or None)
+        except StaleArtifactError as error:
+            warnings.warn(f"{error} Refitting and overwriting '{path}'.", stacklevel=2)
+    model = fit()
+    save_artifact(model, path, data=data, metadata=metadata)
+    return model
@@ -0,0 +1,146 @@
+"""
+Common interface shared by every calibration model family.
+
+A calibration model maps a predictor (usually the raw sensor reading) to a response
+(usually VWC). Concrete families subclass CalibrationModel, implement `_fit` and
+`_predict`, and register themselves under a short family name so that they can be
+created, and re-created from a serialized dict, by name.
+"""
+
+import numpy as np
+
+# Registry of model families, keyed by family name
+MODELS = {}
+
+
+def register_model(cls):
+    """Class decorator adding a CalibrationModel subclass to the registry."""
+    if not cls.name:
+        raise ValueError(f"{cls.__name__} must define a family name to be registered.")
+    MODELS[cls.name] = cls
+    return cls
+
+
+def create_model(family, **config):
+    """Create an unfitted model of the given family."""
+    try:
+        cls = MODELS[family]
+    except KeyError:
+        raise ValueError(f"Unknown model family '{family}'. Available families: {', '.join(sorted(MODELS))}.") from None
+    return cls(**config)
+
+
+def model_from_dict(data):
+    """Re-create a fitted model from the output of `CalibrationModel.to_dict`."""
+    try:
+        cls = MODELS[data['family']]
+    except KeyError:
+        raise ValueError(f"Unknown model family '{data.get('family')}'.") from None
+    return cls.from_dict(data)
+
+
+def _to_serializable(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+class CalibrationModel:
+    """
+    Base class for calibration models.
+
+    Subclasses set `name`, accept their configuration as constructor keyword arguments
+    (returned again by `config`), and implement `_fit(x, y)`, which returns a dict of
+    fitted parameters, and `_predict(x)`, which evaluates the model using `self.params`.
+
+    Parametric families keep plain numbers and arrays in `params`, so their serialized
+    form is JSON-friendly. Families backed by a third-party estimator set `parametric`
+    to False and keep the estimator object itself in `params`.
+
+    The predictor is a 1-D array of readings. Families setting `multivariate` also take
+    several predictor columns (e.g. the raw reading, temperature and bulk EC) as an
+    (n, k) array, and record their number k in `params['n_features']`.
+    """
+
+    name = None
+    parametric = True
+    multivariate = False
+
+    def __init__(self):
+        self.params = None
+
+    @property
+    def config(self):
+        """Constructor keyword arguments needed to re-create this model."""
+        return {}
+
+    @property
+    def fitted(self):
+        return self.params is not None
+
+    @property
+    def n_features(self):
+        """Number of predictor columns the model was fitted on."""
+        return int(self.params.get('n_features', 1))
+
+    def _predictor(self, x):
+        x = np.asarray(x, dtype=np.float64)
+        if x.ndim == 2 and x.shape[1] == 1:
+            return x[:, 0]
+        if x.ndim > 1 and not self.multivariate:
+            raise ValueError(f"The {self.name} family takes a single predictor column, got {x.shape[1]}.")
+        return x
+
+    def fit(self, x, y):
+        x = self._predictor(x)
+        y = np.asarray(y, dtype=np.float64)
+        if len(x) != len(y):
+            raise ValueError(f"Predictor and response must have the same length, got {len(x)} and {len(y)}.")
+        self.params = self._fit(x, y)
+        return self
+
+    def predict(self, x):
+        if not self.fitted:
+            raise RuntimeError(f"{type(self).__name__} must be fitted before it can predict.")
+        x = self._predictor(x)
+        if self.multivariate and (1 if x.ndim == 1 else x.shape[1]) != self.n_features:
+            raise ValueError(f"The {self.name} model was fitted on {self.n_features} predictor columns, "
+                             f"got {1 if x.ndim == 1 else x.shape[1]}.")
+        return self._predict(x)
+
+    def design_matrix(self, x):
+        """
+        Return the design matrix of families that are linear least-squares fits, whose
+        predictions are a linear combination of its columns, or None for other families.
+
+        Cross-validation uses it to compute held-out errors without refitting.
+        """
+        return None
+
+    def to_dict(self):
+        if not self.fitted:
+            raise RuntimeError(f"{type(self).__name__} must be fitted before it can be serialized.")
+        return {
+            'family': self.name,
+            'config': {key: _to_serializable(value) for key, value in self.config.items()},
+            'params': {key: _to_serializable(value) for key, value in self.params.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        model = cls(**data.get('config', {}))
+        model.params = {key: np.asarray(value, dtype=np.float64) if isinstance(value, list) else value
+                        for key, value in data['params'].items()}
+        return model
+
+    def _fit(self, x, y):
+        raise NotImplementedError
+
+    def _predict(self, x):
+        raise NotImplementedError
+
+    def __repr__(self):
+        config = ', '.join(f"{key}={value!r}" for key, value in self.config.items())
+        return f"{type(self).__name__}({config})"
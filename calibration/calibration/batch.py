@@ -0,0 +1,156 @@
+"""
+Calibrating many sensors at once.
+
+A batch is a set of per-sensor data sets, given either as a directory holding one data
+file (or .env file) per sensor, named after the sensor, or as a CSV manifest with
+`sensor` and `path` columns and optional `predictor` and `response` columns overriding
+the variable names for that sensor. Relative manifest paths are resolved against the
+manifest's directory.
+
+Each sensor is loaded once and fitted with every requested model family in a worker
+process, so a batch spreads across CPU cores. The results form one table with a row per
+sensor and family holding the fitted configuration and parameters as JSON and the
+error metrics. A family that fails on a sensor is reported in its row and skipped.
+"""
+
+import csv
+import json
+import os
+import sys
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .base import create_model
+from .dataset import DATASET_FORMATS, load_dataset, load_env_file
+from .metrics import evaluate
+from .splines import LinearSplineModel, select_knots
+
+# The topp family relates permittivity to VWC, not raw readings, so it is only fitted when asked for
+DEFAULT_FAMILIES = ('polynomial', 'power', 'logarithmic', 'spline', 'piecewise')
+
+RESULT_COLUMNS = ('sensor', 'family', 'status', 'n_samples', 'mse', 'rmse', 'sem', 'config', 'params', 'error')
+
+SensorDataset = namedtuple('SensorDataset', ['sensor', 'path', 'predictor', 'response'])
+
+
+def _is_sensor_file(name):
+    return name.endswith('.env') or os.path.splitext(name)[1].lower() in DATASET_FORMATS
+
+
+def discover_datasets(source, predictor='RAW', response='VWC'):
+    """List the SensorDatasets of a directory or CSV manifest, sorted by sensor name."""
+    if os.path.isdir(source):
+        datasets = [SensorDataset(os.path.splitext(name)[0], os.path.join(source, name), predictor, response)
+                    for name in os.listdir(source) if _is_sensor_file(name)]
+    else:
+        base = os.path.dirname(os.path.abspath(source))
+        with open(source, newline='') as file:
+            datasets = [SensorDataset(row['sensor'], os.path.join(base, row['path']),
+                                      row.get('predictor') or predictor, row.get('response') or response)
+                        for row in csv.DictReader(file)]
+    if not datasets:
+        raise ValueError(f"No sensor data sets found in '{source}'.")
+    return sorted(datasets)
+
+
+def load_sensor(dataset):
+    """Load the predictor and response arrays of a SensorDataset."""
+    columns = (dataset.predictor, dataset.response)
+    if dataset.path.endswith('.env'):
+        return load_env_file(dataset.path, *columns)
+    return tuple(np.asarray(array) for array in load_dataset(dataset.path, columns))
+
+
+def make_model(family, x, y):
+    """Create an unfitted model of `family` for this data, selecting spline knots by BIC."""
+    if family == 'spline':
+        return LinearSplineModel(select_knots(x, y, criterion='bic'))
+    return create_model(family)
+
+
+def _json(values):
+    return json.dumps(values, separators=(',', ':'))
+
+
+def _result(dataset, family, n_samples, **fields):
+    return {'sensor': dataset.sensor, 'family': family, 'n_samples': n_samples, **fields}
+
+
+def calibrate_sensor(dataset, families, plot_dir=None):
+    """
+    Fit every family in `families` to one sensor's data and return a result row for each.
+
+    With `plot_dir`, the diagnostic figure of each fit is written there as
+    <sensor>_<family>.png.
+    """
+    try:
+        x, y = load_sensor(dataset)
+    except Exception as error:
+        return [_result(dataset, family, 0, status='failed', error=f"{type(error).__name__}: {error}") for family in families]
+
+    rows = []
+    for family in families:
+        try:
+            model = make_model(family, x, y).fit(x, y)
+            predicted = model.predict(x)
+            # Families defined on part of the range only (e.g. logarithmic) predict NaN elsewhere
+            valid = np.isfinite(predicted)
+            fields = model.to_dict()
+            row = _result(dataset, family, len(x), status='ok', config=_json(fields['config']),
+                          params=_json(fields['params']), **evaluate(y[valid], predicted[valid]))
+        except Exception as error:
+            rows.append(_result(dataset, family, len(x), status='failed', error=f"{type(error).__name__}: {error}"))
+            continue
+        rows.append(row)
+        if plot_dir is not None:
+            try:
+                from .plotting import fit_curve, plot_fit_diagnostics
+
+                plot_fit_diagnostics(x[valid], y[valid], predicted[valid], f'{family} fit ({dataset.sensor})',
+                                     curve=fit_curve(model, x[valid]), plot='png',
+                                     output=os.path.join(plot_dir, f'{dataset.sensor}_{family}.png'))
+            except Exception as error:
+                # The fit itself succeeded, so its row stands
+                print(f"Cannot plot the {family} fit of {dataset.sensor}: {type(error).__name__}: {error}", file=sys.stderr)
+    return rows
+
+
+def run_batch(datasets, families=DEFAULT_FAMILIES, workers=None, plot_dir=None):
+    """
+    Calibrate every sensor, yielding the result rows in the order of `datasets`.
+
+    Sensors are calibrated in up to `workers` processes (by default one per CPU core),
+    or one after another in this process when `workers` is 1.
+    """
+    families = list(families)
+    for family in families:
+        create_model(family)  # Fail fast on unknown family names
+    if plot_dir is not None:
+        os.makedirs(plot_dir, exist_ok=True)
+
+    if workers == 1 or len(datasets) == 1:
+        for dataset in datasets:
+            yield from calibrate_sensor(dataset, families, plot_dir)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(calibrate_sensor, dataset, families, plot_dir) for dataset in datasets]
+        for future in futures:
+            yield from future.result()
+
+
+def write_results(rows, output):
+    """Write result rows as CSV to the path `output`, or to standard output for '-'. Returns the row count."""
+    file = sys.stdout if output == '-' else open(output, 'w', newline='')
+    try:
+        writer = csv.DictWriter(file, fieldnames=RESULT_COLUMNS, restval='')
+        writer.writeheader()
+        count = 0
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+        return count
+    finally:
+        if file is not sys.stdout:
+            file.close()
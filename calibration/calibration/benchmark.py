@@ -0,0 +1,179 @@
+"""
+Benchmarks of fit time, prediction throughput and memory for every model family.
+
+Each target is fitted to n readings of a simulated probe (see calibration.synthetic) for
+n = 10^2, 10^3, ..., then asked to predict a batch of readings. A target is either a
+calibration model family (polynomial, power, spline, gam, random_forest, ...) or one of
+the regressors of multi_model_regressor.py. Every (target, n) case runs in a fresh
+worker process, so a case running past the timeout is killed; a target that times out
+or fails is not run at larger sizes.
+
+Workers are forked from a process that has already imported its libraries, and each
+holds its own data, so their total resident set mostly measures that shared baseline.
+The memory reported is instead how far the worker's peak resident set rose above its
+resident set just before the timed fits, i.e. after the warm-up fit has imported the
+target's libraries and the data has been generated.
+
+The results tell which families can keep up with the ingest path:
+
+    python -m calibration benchmark --sizes 2 6 -o benchmark.csv
+"""
+
+import csv
+import resource
+import sys
+import time
+import warnings
+from collections import namedtuple
+
+import numpy as np
+
+from .synthetic import SensorSimulator
+from .tournament import run_tournament
+
+# Calibration model families benchmarked by default, in their usual configuration
+FAMILY_TARGETS = ('polynomial', 'curve_fit_polynomial', 'linear', 'power', 'logarithmic', 'topp', 'spline', 'piecewise',
+                  'gam', 'random_forest')
+
+# Number of readings predicted in one batch, at most
+DEFAULT_PREDICT_SIZE = 1_000_000
+
+# peak_memory is the rise of the worker's peak resident set size over its resident set
+# before the timed fits, in MiB
+BenchmarkResult = namedtuple('BenchmarkResult', ['target', 'n_samples', 'status', 'fit_seconds', 'predict_rate',
+                                                 'peak_memory', 'error'])
+
+RESULT_COLUMNS = BenchmarkResult._fields
+
+
+def sensor_curve(n, seed=0):
+    """Synthetic calibration data: n raw readings of a simulated probe and their reference VWCs."""
+    data = SensorSimulator(seed=seed).rows(0, n)
+    return data['RAW'], data['VWC']
+
+
+def benchmark_targets():
+    """Every target: the model families, then the regressors of multi_model_regressor.py."""
+    from .regressors import REGRESSORS
+
+    return list(FAMILY_TARGETS) + list(REGRESSORS)
+
+
+def _make_target(target, x):
+    """(fit, predict) functions of a fresh instance of `target`, for readings `x`."""
+    from .regressors import REGRESSORS, make_regressor
+
+    if target in REGRESSORS:
+        estimator = make_regressor(target)
+        return (lambda x, y: estimator.fit(x.reshape(-1, 1), y)), (lambda x: estimator.predict(x.reshape(-1, 1)))
+
+    from . import create_model
+
+    if target == 'spline':
+        # Knots at fixed quantiles, as fit_lsq_spline_with_user_knots.py would place them
+        model = create_model('spline', knots=np.quantile(x, [0.2, 0.4, 0.6, 0.8]).tolist())
+    else:
+        model = create_model(target)
+    return model.fit, model.predict
+
+
+def _best_time(function, budget=1.0, max_repeats=5):
+    """Shortest of up to `max_repeats` timings of `function()`, repeating while under `budget` seconds in total."""
+    best = np.inf
+    spent = 0.0
+    for _ in range(max_repeats):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = min(best, elapsed)
+        spent += elapsed
+        if spent > budget:
+            break
+    return best
+
+
+def _peak_rss():
+    """Peak resident set size of this process in MiB."""
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1 << 20 if sys.platform == 'darwin' else 1 << 10)
+
+
+def _current_rss():
+    """Current resident set size of this process in MiB, or the peak where /proc is not available."""
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * resource.getpagesize() / (1 << 20)
+    except OSError:
+        return _peak_rss()
+
+
+def benchmark_case(target, n_samples, predict_size=DEFAULT_PREDICT_SIZE):
+    """Fit `target` to `n_samples` synthetic points and time it and a batch prediction. Returns a dict."""
+    # Warm up on a small data set, so one-time library imports are not timed
+    warm_x, warm_y = sensor_curve(100, seed=1)
+    fit, predict = _make_target(target, warm_x)
+    fit(warm_x, warm_y)
+    predict(warm_x)
+
+    x, y = sensor_curve(n_samples)
+    baseline = _current_rss()
+
+    def fit_fresh():
+        fit, _ = _make_target(target, x)
+        fit(x, y)
+
+    fit_seconds = _best_time(fit_fresh)
+    fit, predict = _make_target(target, x)
+    fit(x, y)
+    readings = np.linspace(5, 60, min(predict_size, max(n_samples, 1000)))
+    predict_seconds = _best_time(lambda: predict(readings))
+    return {'fit_seconds': fit_seconds, 'predict_rate': len(readings) / max(predict_seconds, 1e-9),
+            'peak_memory': max(_peak_rss() - baseline, 0.0)}
+
+
+def _evaluate(name, predict_size):
+    target, n_samples = name
+    # Convergence warnings of the estimators on synthetic data would only clutter the report
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return benchmark_case(target, n_samples, predict_size)
+
+
+def run_benchmarks(targets, sizes, timeout=120, predict_size=DEFAULT_PREDICT_SIZE):
+    """
+    Benchmark every target at every size, yielding a BenchmarkResult per case.
+
+    Sizes run in increasing order, every case in its own worker process, one at a time
+    so timings are not disturbed by other cases. A target is dropped from the larger
+    sizes once it fails or runs past `timeout` seconds.
+    """
+    remaining = list(targets)
+    for size in sorted(sizes):
+        names = [(target, size) for target in remaining]
+        for result in run_tournament(names, _evaluate, (predict_size,), workers=1, timeout=timeout):
+            target = result.name[0]
+            if result.status != 'ok':
+                remaining.remove(target)
+                yield BenchmarkResult(target, size, result.status, None, None, None, result.error)
+                continue
+            yield BenchmarkResult(target, size, 'ok', result.score['fit_seconds'], result.score['predict_rate'],
+                                  result.score['peak_memory'], None)
+
+
+def format_result(result):
+    if result.status != 'ok':
+        return f"{result.target:<34} {result.n_samples:>10}  {result.status}: {result.error}"
+    return (f"{result.target:<34} {result.n_samples:>10}  fit {result.fit_seconds * 1000:10.2f} ms  "
+            f"predict {result.predict_rate:12.4g} readings/s  memory +{result.peak_memory:8.1f} MiB")
+
+
+def write_results(results, path):
+    """Write BenchmarkResults to a CSV file, returning their number."""
+    count = 0
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(RESULT_COLUMNS)
+        for result in results:
+            writer.writerow(['' if value is None else value for value in result])
+            count += 1
+    return count
@@ -0,0 +1,113 @@
+"""
+Command-line options shared by the fitting scripts.
+"""
+
+import os
+import sys
+
+import numpy as np
+
+from .dataset import DATASET_FORMATS, load_columns
+from .plotting import PLOT_MODES
+from .robust import DEFAULT_TUNING, ROBUST_METHODS
+
+
+def add_data_argument(parser):
+    parser.add_argument('--data', type=str, default=None,
+                        help=f"Data file ({', '.join(DATASET_FORMATS)}) to read the variables from as columns. "
+                             "When omitted, the variables are read from the .env file.")
+
+
+def add_variable_arguments(parser, predictor=None, response=None, multiple=False):
+    """
+    Add --data and the -p/--predictor-var and -r/--response-var options.
+
+    The variable options are required unless a default is given. With `multiple`,
+    -p takes one or more predictor variables, e.g. the raw reading, temperature and
+    bulk EC.
+    """
+    add_data_argument(parser)
+    parser.add_argument('-p', '--predictor-var', type=str, nargs='+' if multiple else None,
+                        default=[predictor] if multiple and predictor else predictor, required=predictor is None,
+                        help=('Environment variable names, or column names when --data is given, for one or more predictor variables.'
+                              if multiple else
+                              'Environment variable name, or column name when --data is given, for the predictor variable data.')
+                             + (f" Defaults to {predictor}." if predictor else ''))
+    parser.add_argument('-r', '--response-var', type=str, default=response, required=response is None,
+                        help='Environment variable name, or column name when --data is given, for the response variable data.'
+                             + (f" Defaults to {response}." if response else ''))
+
+
+def predictor_vars(args):
+    """The predictor variable names selected by `add_variable_arguments` options, as a list."""
+    return [args.predictor_var] if isinstance(args.predictor_var, str) else list(args.predictor_var)
+
+
+def load_variables(args):
+    """
+    Load the predictor and response arrays selected by `add_variable_arguments` options.
+
+    Several predictor variables are returned as the columns of an (n, k) array, a
+    single one as a 1-D array.
+    """
+    names = predictor_vars(args)
+    *predictors, response = load_columns(names + [args.response_var], args.data)
+    return (predictors[0] if len(predictors) == 1 else np.column_stack(predictors)), response
+
+
+def add_cross_validation_arguments(parser):
+    """Add the --cv, --repeats and --loo options selecting a cross-validation scheme."""
+    parser.add_argument('--cv', type=int, default=None, metavar='K',
+                        help='Score models by K-fold cross-validation.')
+    parser.add_argument('--repeats', type=int, default=1, help='Number of times K-fold cross-validation is repeated with reshuffled folds.')
+    parser.add_argument('--loo', action='store_true', help='Score models by leave-one-out cross-validation.')
+
+
+def make_folds(args, n_samples):
+    """Return the Folds selected by `add_cross_validation_arguments` options, or None for a train/test split."""
+    from .crossval import Folds
+
+    if args.loo:
+        return Folds(n_samples, n_splits=None)
+    if args.cv is not None:
+        return Folds(n_samples, n_splits=args.cv, n_repeats=args.repeats)
+    return None
+
+
+def add_robust_arguments(parser):
+    """Add the --robust and --tuning options selecting a fit that resists outliers (see calibration.robust)."""
+    parser.add_argument('--robust', choices=ROBUST_METHODS, default=None,
+                        help='Fit robustly to bad readings: IRLS with Huber or Tukey loss, or RANSAC. Defaults to least squares.')
+    parser.add_argument('--tuning', type=float, default=None,
+                        help='Tuning constant of the robust fit, in units of the residual scale. Defaults to '
+                             + ', '.join(f'{value:g} ({method})' for method, value in DEFAULT_TUNING.items()) + '.')
+
+
+def robust_options(args):
+    """Model keyword arguments from `add_robust_arguments` options."""
+    return {'robust': args.robust, 'tuning': args.tuning}
+
+
+def format_robust_fit(model):
+    """One line summarizing a robust fit's outliers, or an empty string for a least-squares fit."""
+    if 'n_outliers' not in model.params:
+        return ''
+    outliers = 'points down-weighted' if model.robust == 'huber' else 'outliers rejected'
+    return (f"Robust {model.robust} fit: {model.params['n_outliers']} {outliers}, "
+            f"residual scale {model.params['robust_scale']:.6g}")
+
+
+def add_plot_arguments(parser):
+    """Add the --plot and --plot-output options selecting how the script's figure is drawn."""
+    parser.add_argument('--plot', choices=PLOT_MODES, default='show',
+                        help="Show the figure in a window (default), write it as a PNG or SVG file, or skip plotting.")
+    parser.add_argument('--plot-output', type=str, default=None, metavar='FILE',
+                        help='File to write the figure to with --plot png/svg. Defaults to the script name with the format as extension.')
+
+
+def plot_options(args):
+    """Keyword arguments for the calibration.plotting functions from `add_plot_arguments` options."""
+    output = args.plot_output
+    if output is None and args.plot in ('png', 'svg'):
+        output = f"{os.path.splitext(os.path.basename(sys.argv[0]))[0]}.{args.plot}"
+    return {'plot': args.plot, 'output': output}
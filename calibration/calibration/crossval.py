@@ -0,0 +1,165 @@
+"""
+Repeated k-fold and leave-one-out cross-validation for model selection.
+
+With the 30-60 points of a typical calibration, the ranking from a single 80/20 split
+is mostly noise. Folds are drawn once per data set as a Folds object and every model
+is scored on the same folds, so their mean and spread of MSE are comparable.
+
+Least-squares fits that are linear in their coefficients are not refitted per fold.
+With H the hat matrix of the full fit and e its residuals, the residuals of the points
+in a held-out set T under the fit without them are (I - H_TT)^-1 e_T, which for
+leave-one-out reduces to e_i / (1 - h_ii).
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from .regressors import POLYNOMIAL_DEGREES, make_regressor
+
+# Mean and standard deviation over folds of the held-out MSE, and the per-fold MSEs
+CVScore = namedtuple('CVScore', ['mean', 'std', 'fold_mse'])
+
+
+class Folds:
+    """
+    Fold assignments for a data set of `n_samples` points, computed once and shared by
+    every model evaluated on it.
+
+    `n_splits=None` gives leave-one-out. Otherwise each of the `n_repeats` repeats
+    assigns the points to `n_splits` folds of (nearly) equal size at random.
+    """
+
+    def __init__(self, n_samples, n_splits=5, n_repeats=1, random_state=42):
+        self.n_samples = int(n_samples)
+        self._splits = None
+        self.loo = n_splits is None or n_splits >= self.n_samples
+        if self.loo:
+            self.n_splits = self.n_samples
+            self.n_repeats = 1
+            self.assignments = np.arange(self.n_samples)[np.newaxis, :]
+        else:
+            if n_splits < 2:
+                raise ValueError(f"Cross-validation needs at least 2 folds, got {n_splits}.")
+            self.n_splits = int(n_splits)
+            self.n_repeats = int(n_repeats)
+            rng = np.random.default_rng(random_state)
+            balanced = np.arange(self.n_samples) % self.n_splits
+            self.assignments = np.array([rng.permutation(balanced) for _ in range(self.n_repeats)])
+
+    def __len__(self):
+        return self.n_splits * self.n_repeats
+
+    def __iter__(self):
+        """Iterate over (train_indices, test_indices) for every fold of every repeat."""
+        # The index arrays are built on first use and then reused by every model
+        if self._splits is None:
+            self._splits = []
+            for assignment in self.assignments:
+                order = np.argsort(assignment, kind='stable')
+                bounds = np.searchsorted(assignment[order], np.arange(self.n_splits + 1))
+                for fold in range(self.n_splits):
+                    test = order[bounds[fold]:bounds[fold + 1]]
+                    mask = np.ones(self.n_samples, dtype=bool)
+                    mask[test] = False
+                    self._splits.append((np.flatnonzero(mask), test))
+        return iter(self._splits)
+
+    def __getstate__(self):
+        # Worker processes rebuild the index arrays from the assignments
+        return {**self.__dict__, '_splits': None}
+
+    def __repr__(self):
+        if self.loo:
+            return f"Folds({self.n_samples}, leave-one-out)"
+        return f"Folds({self.n_samples}, n_splits={self.n_splits}, n_repeats={self.n_repeats})"
+
+
+def _score(fold_mse):
+    fold_mse = np.asarray(fold_mse, dtype=np.float64)
+    return CVScore(float(fold_mse.mean()), float(fold_mse.std()), fold_mse)
+
+
+def cross_validate(fit_predict, X, y, folds):
+    """
+    Score a model by refitting it on every fold.
+
+    `fit_predict(X_train, y_train, X_test)` fits a fresh model and returns its
+    predictions for `X_test`.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    fold_mse = []
+    for train, test in folds:
+        predictions = fit_predict(X[train], y[train], X[test])
+        fold_mse.append(np.mean((y[test] - predictions)**2))
+    return _score(fold_mse)
+
+
+def cross_validate_linear(design, y, folds):
+    """Score a least-squares fit on the columns of `design` in closed form, without refitting."""
+    # Scaling the columns leaves the hat matrix unchanged and keeps the QR well conditioned
+    scale = np.abs(design).max(axis=0)
+    q, _ = np.linalg.qr(design / np.where(scale > 0, scale, 1))
+    return cross_validate_orthonormal(q, y, folds)
+
+
+def cross_validate_orthonormal(q, y, folds):
+    """Score a least-squares fit on the space spanned by the orthonormal columns of `q`, whose hat matrix is q q^T."""
+    y = np.asarray(y, dtype=np.float64)
+    residuals = y - q @ (q.T @ y)
+
+    if folds.loo:
+        leverage = np.einsum('ij,ij->i', q, q)
+        return _score((residuals / (1 - leverage))**2)
+
+    fold_mse = []
+    for _, test in folds:
+        q_test = q[test]
+        held_out = np.linalg.solve(np.eye(len(test)) - q_test @ q_test.T, residuals[test])
+        fold_mse.append(np.mean(held_out**2))
+    return _score(fold_mse)
+
+
+def cross_validate_model(model, x, y, folds):
+    """
+    Score a CalibrationModel configuration on `folds`.
+
+    Families exposing a design matrix are scored in closed form; others are refitted
+    on every fold with the same configuration as `model`.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    design = model.design_matrix(x)
+    if design is not None:
+        return cross_validate_linear(design, y, folds)
+
+    def fit_predict(x_train, y_train, x_test):
+        return type(model)(**model.config).fit(x_train, y_train).predict(x_test)
+
+    return cross_validate(fit_predict, x, y, folds)
+
+
+def cross_validate_regressor(name, X, y, folds, features=None):
+    """
+    Score one of the multi_model_regressor.py regressors on `folds`.
+
+    The polynomial regressors are scored in closed form on their polynomial features of
+    the columns of `X`, taken from `features`, a calibration.features.PolynomialFeatures
+    of `X` shared by all of them, when given.
+    """
+    X = np.asarray(X, dtype=np.float64).reshape(len(X), -1)
+    if name in POLYNOMIAL_DEGREES:
+        degree = POLYNOMIAL_DEGREES[name]
+        if features is None or features.degree < degree:
+            from .features import PolynomialFeatures
+
+            features = PolynomialFeatures(X, degree)
+        return cross_validate_linear(features.design(degree), y, folds)
+
+    def fit_predict(X_train, y_train, X_test):
+        return make_regressor(name).fit(X_train, y_train).predict(X_test)
+
+    return cross_validate(fit_predict, X, y, folds)
+
+
+def format_score(score):
+    return f"{score.mean:.8f} ± {score.std:.8f}"
@@ -0,0 +1,167 @@
+"""
+Loading calibration data sets.
+
+Small data sets can be kept in a .env file as comma-separated values. Older .env files
+separate values with ', ' and newer ones with ',', and both are accepted here.
+
+Logged sensor histories are far too large for environment variables and are read from
+columnar files instead, with column names taking the place of the variable names:
+
+- `.npy`: memory-mapped. Structured arrays are addressed by field name, plain 2-D
+  arrays by column index ('0', '1', ...).
+- `.npz`: addressed by array name.
+- `.csv`: a header row followed by comma-separated numbers, read in chunks.
+- `.parquet`: addressed by column name, read in record batches (requires pyarrow).
+"""
+
+import itertools
+import os
+
+import numpy as np
+
+# Number of rows read at a time when streaming CSV and Parquet files
+DEFAULT_CHUNKSIZE = 1_000_000
+
+DATASET_FORMATS = ('.npy', '.npz', '.csv', '.parquet')
+
+
+def parse_values(values_string):
+    """Convert a comma-separated string of numbers into a float64 array."""
+    return np.array(values_string.split(','), dtype=np.float64)
+
+
+def load_env_values(*names):
+    """
+    Load the named variables from the environment (and the nearest .env file) as arrays.
+
+    Raises ValueError naming every variable that is not set.
+    """
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    strings = [os.getenv(name) for name in names]
+    missing = [name for name, string in zip(names, strings) if string is None]
+    if missing:
+        raise ValueError(f"Please ensure the environment variable(s) {', '.join(repr(name) for name in missing)} are set.")
+    return tuple(parse_values(string) for string in strings)
+
+
+def load_env_file(path, *names):
+    """
+    Load the named variables from the .env file at `path` as arrays, without touching
+    the process environment.
+    """
+    from dotenv import dotenv_values
+
+    values = dotenv_values(path)
+    missing = [name for name in names if values.get(name) is None]
+    if missing:
+        raise ValueError(f"Variable(s) {', '.join(repr(name) for name in missing)} not set in '{path}'.")
+    return tuple(parse_values(values[name]) for name in names)
+
+
+def _dataset_format(path):
+    extension = os.path.splitext(str(path))[1].lower()
+    if extension not in DATASET_FORMATS:
+        raise ValueError(f"Unsupported data file '{path}'. Supported formats: {', '.join(DATASET_FORMATS)}.")
+    return extension
+
+
+def _missing_columns_error(path, missing, available):
+    return ValueError(f"Column(s) {', '.join(repr(name) for name in missing)} not found in '{path}'. "
+                      f"Available columns: {', '.join(str(name) for name in available)}.")
+
+
+def _npy_columns(path, columns):
+    array = np.load(path, mmap_mode='r')
+    if array.dtype.names is not None:
+        missing = [name for name in columns if name not in array.dtype.names]
+        if missing:
+            raise _missing_columns_error(path, missing, array.dtype.names)
+        return [array[name] for name in columns]
+    if array.ndim == 1:
+        array = array[:, np.newaxis]
+    available = [str(i) for i in range(array.shape[1])]
+    missing = [name for name in columns if str(name) not in available]
+    if missing:
+        raise _missing_columns_error(path, missing, available)
+    return [array[:, int(name)] for name in columns]
+
+
+def _iter_csv(path, columns, chunksize):
+    with open(path, newline='') as file:
+        header = [name.strip() for name in file.readline().split(',')]
+        missing = [name for name in columns if name not in header]
+        if missing:
+            raise _missing_columns_error(path, missing, header)
+        usecols = [header.index(name) for name in columns]
+        while True:
+            lines = list(itertools.islice(file, chunksize))
+            if not lines:
+                break
+            chunk = np.loadtxt(lines, delimiter=',', usecols=usecols, dtype=np.float64, ndmin=2)
+            yield tuple(chunk[:, i] for i in range(len(columns)))
+
+
+def _iter_parquet(path, columns, chunksize):
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path)
+    available = parquet_file.schema_arrow.names
+    missing = [name for name in columns if name not in available]
+    if missing:
+        raise _missing_columns_error(path, missing, available)
+    for batch in parquet_file.iter_batches(batch_size=chunksize, columns=list(dict.fromkeys(columns))):
+        yield tuple(batch.column(name).to_numpy(zero_copy_only=False).astype(np.float64, copy=False) for name in columns)
+
+
+def iter_dataset(path, columns, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Yield the named columns of a data file in chunks of at most `chunksize` rows.
+
+    Each chunk is a tuple of float64 arrays in the order of `columns`.
+    """
+    columns = [str(name) for name in columns]
+    extension = _dataset_format(path)
+    if extension == '.csv':
+        yield from _iter_csv(path, columns, chunksize)
+    elif extension == '.parquet':
+        yield from _iter_parquet(path, columns, chunksize)
+    else:
+        arrays = load_dataset(path, columns)
+        for start in range(0, len(arrays[0]), chunksize):
+            yield tuple(array[start:start + chunksize] for array in arrays)
+
+
+def load_dataset(path, columns, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Load the named columns of a data file as a tuple of float64 arrays.
+
+    Columns of .npy files are returned as memory-mapped views whenever they are already
+    stored as float64, so nothing is read until it is used.
+    """
+    columns = [str(name) for name in columns]
+    extension = _dataset_format(path)
+    if extension == '.npy':
+        return tuple(np.asarray(array, dtype=np.float64) if array.dtype != np.float64 else array
+                     for array in _npy_columns(path, columns))
+    if extension == '.npz':
+        with np.load(path) as archive:
+            missing = [name for name in columns if name not in archive.files]
+            if missing:
+                raise _missing_columns_error(path, missing, archive.files)
+            return tuple(np.asarray(archive[name], dtype=np.float64) for name in columns)
+
+    chunks = list(iter_dataset(path, columns, chunksize))
+    if not chunks:
+        return tuple(np.empty(0) for _ in columns)
+    return tuple(np.concatenate([chunk[i] for chunk in chunks]) for i in range(len(columns)))
+
+
+def load_columns(columns, data=None):
+    """
+    Load the named columns from the data file `data`, or from the .env file when `data` is None.
+    """
+    if data is None:
+        return load_env_values(*columns)
+    return load_dataset(data, columns)
@@ -0,0 +1,257 @@
+"""
+Streaming drift detection for calibrated probes.
+
+Compaction and salt build-up in coco coir shift a probe's response, so a calibration
+that was right when it was fitted slowly goes wrong. DriftMonitor watches two signals
+per probe and flags the probe when either changes persistently:
+
+- residuals against reference points (a gravimetric VWC next to the probe's calibrated
+  reading), standardized by the calibration's residual standard deviation and tracked by
+  a two-sided CUSUM: S+ = max(0, S+ + z - k) and S- = max(0, S- - z - k), flagging when
+  either exceeds h;
+- saturation plateaus: after an irrigation event the calibrated VWC rises to the
+  substrate's container capacity, which should be the same every time. An event starts
+  when the reading rises `rise` above its lowest value since the previous plateau, and
+  its plateau is the peak, taken once the reading has dropped `drop` below it. The
+  plateau levels are tracked by a two-sided Page-Hinkley test against their running
+  mean, flagging a shift of more than `delta` accumulated beyond `threshold`.
+
+`rise`, `drop` and `delta` are in the units of the calibrated readings: the defaults
+suit VWC in percent, and a calibration predicting fractions needs them divided by 100.
+Reference points are compared either with a given prediction (`add_references`) or
+with the probe's latest calibrated reading (`add_latest_references`), e.g. for
+reference VWCs arriving on their own MQTT topic.
+
+Every statistic is a fixed set of numbers per probe, kept in arrays indexed by probe,
+so memory is constant per probe and a batch of readings from hundreds of probes is
+processed with array operations: readings are handled in rounds, each taking the next
+reading of every probe in the batch at once.
+"""
+
+import json
+from collections import namedtuple
+
+import numpy as np
+
+# kind is 'residual' or 'plateau'; direction is +1 when the signal rose and -1 when it fell
+DriftAlert = namedtuple('DriftAlert', ['probe', 'kind', 'time', 'statistic', 'direction'])
+
+# Per-probe state, all float64 and initialized to these values
+_STATE = {
+    # Residual CUSUM
+    'residuals': 0.0, 'cusum_high': 0.0, 'cusum_low': 0.0,
+    # Latest calibrated reading, compared with reference points arriving on their own
+    'last': np.nan,
+    # Plateau detection
+    'low': np.inf, 'peak': -np.inf, 'in_event': 0.0,
+    # Page-Hinkley test of the plateau levels
+    'plateaus': 0.0, 'plateau_mean': 0.0, 'ph_high': 0.0, 'ph_high_min': 0.0, 'ph_low': 0.0, 'ph_low_max': 0.0,
+    # 1 once a probe has drifted, until it is reset
+    'drifted': 0.0,
+}
+
+
+def _rounds(indices):
+    """Split reading positions into rounds holding at most one reading per probe, in their original order."""
+    order = np.argsort(indices, kind='stable')
+    sorted_indices = indices[order]
+    starts = np.flatnonzero(np.concatenate([[True], sorted_indices[1:] != sorted_indices[:-1]]))
+    # Occurrence number of each reading within its probe
+    rank = np.arange(len(indices)) - np.repeat(starts, np.diff(np.append(starts, len(indices))))
+    occurrence = np.empty(len(indices), dtype=np.int64)
+    occurrence[order] = rank
+    for round_ in range(occurrence.max() + 1 if len(indices) else 0):
+        yield np.flatnonzero(occurrence == round_)
+
+
+class DriftMonitor:
+    """
+    Drift detection for many probes, by CUSUM on reference residuals and Page-Hinkley on
+    saturation plateaus. Probes are identified by any hashable name, e.g. the topic of
+    their readings.
+
+    `sigma` is the residual standard deviation of the calibrations (e.g. their RMSE),
+    `k` and `h` the CUSUM allowance and decision interval in units of sigma. `rise` and
+    `drop` (in VWC units) delimit irrigation events, and `delta` and `threshold` are the
+    Page-Hinkley tolerance and decision threshold of the plateau levels. Plateau tests
+    start after `warmup` plateaus.
+    """
+
+    def __init__(self, sigma=1.0, k=0.5, h=5.0, rise=3.0, drop=1.0, delta=0.5, threshold=5.0, warmup=3):
+        self.sigma = sigma
+        self.k = k
+        self.h = h
+        self.rise = rise
+        self.drop = drop
+        self.delta = delta
+        self.threshold = threshold
+        self.warmup = warmup
+        self.probes = []
+        self._index = {}
+        self._state = {name: np.empty(0) for name in _STATE}
+
+    @property
+    def config(self):
+        return {'sigma': self.sigma, 'k': self.k, 'h': self.h, 'rise': self.rise, 'drop': self.drop,
+                'delta': self.delta, 'threshold': self.threshold, 'warmup': self.warmup}
+
+    def _indices(self, probes):
+        """Array indices of `probes`, adding the probes not seen yet."""
+        indices = np.empty(len(probes), dtype=np.int64)
+        for i, probe in enumerate(probes):
+            index = self._index.get(probe)
+            if index is None:
+                index = self._index[probe] = len(self.probes)
+                self.probes.append(probe)
+            indices[i] = index
+        count = len(self.probes)
+        if count > len(self._state['drifted']):
+            # Grow the arrays geometrically, filling new slots with initial values
+            size = max(count, 2 * len(self._state['drifted']), 16)
+            for name, initial in _STATE.items():
+                grown = np.full(size, initial)
+                grown[:len(self._state[name])] = self._state[name]
+                self._state[name] = grown
+        return indices
+
+    def _alerts(self, indices, mask, kind, times, statistic, direction):
+        alerts = []
+        for i in np.flatnonzero(mask):
+            alerts.append(DriftAlert(self.probes[indices[i]], kind, float(times[i]), float(statistic[i]), int(direction[i])))
+        self._state['drifted'][indices[mask]] = 1
+        return alerts
+
+    def add_references(self, probes, references, predictions, times=None, sigma=None):
+        """
+        Add reference points: reference VWCs next to the probes' calibrated predictions.
+        `sigma` optionally overrides the residual standard deviation per point. Returns
+        the DriftAlerts raised.
+        """
+        indices = self._indices(probes)
+        residuals = (np.asarray(references, dtype=np.float64) - np.asarray(predictions, dtype=np.float64))
+        z = residuals / np.broadcast_to(self.sigma if sigma is None else np.asarray(sigma, dtype=np.float64), residuals.shape)
+        times = np.full(len(z), np.nan) if times is None else np.asarray(times, dtype=np.float64)
+        state = self._state
+        alerts = []
+        for positions in _rounds(indices):
+            p = indices[positions]
+            state['residuals'][p] += 1
+            high = np.maximum(0, state['cusum_high'][p] + z[positions] - self.k)
+            low = np.maximum(0, state['cusum_low'][p] - z[positions] - self.k)
+            raised = (high > self.h) | (low > self.h)
+            direction = np.where(high > self.h, 1, -1)
+            alerts += self._alerts(p, raised, 'residual', times[positions], np.maximum(high, low), direction)
+            # Restart the sums after an alert, so a persisting drift is reported again later
+            state['cusum_high'][p] = np.where(raised, 0, high)
+            state['cusum_low'][p] = np.where(raised, 0, low)
+        return alerts
+
+    def add_latest_references(self, probes, references, times=None):
+        """
+        Add reference VWCs of the probes, compared with each probe's latest calibrated
+        reading. References of probes without a reading yet are skipped. Returns the
+        DriftAlerts raised.
+        """
+        indices = self._indices(probes)
+        predictions = self._state['last'][indices]
+        known = np.isfinite(predictions)
+        references = np.asarray(references, dtype=np.float64)[known]
+        times = None if times is None else np.asarray(times, dtype=np.float64)[known]
+        return self.add_references([probe for probe, keep in zip(probes, known) if keep], references, predictions[known], times)
+
+    def add_readings(self, probes, values, times=None):
+        """Add calibrated readings (VWC) of the probes, in time order. Returns the DriftAlerts raised."""
+        indices = self._indices(probes)
+        values = np.asarray(values, dtype=np.float64)
+        times = np.full(len(values), np.nan) if times is None else np.asarray(times, dtype=np.float64)
+        state = self._state
+        alerts = []
+        for positions in _rounds(indices):
+            p = indices[positions]
+            value = values[positions]
+            finite = np.isfinite(value)
+            p, value, positions = p[finite], value[finite], positions[finite]
+            state['last'][p] = value
+            in_event = state['in_event'][p] > 0
+            # Outside events track the lowest reading, and start an event on a rise above it
+            low = np.where(in_event, state['low'][p], np.minimum(state['low'][p], value))
+            starts = ~in_event & (value >= low + self.rise)
+            in_event |= starts
+            peak = np.where(in_event, np.maximum(np.where(starts, -np.inf, state['peak'][p]), value), -np.inf)
+            # An event ends once the reading drops below its peak; the peak is its plateau
+            ends = in_event & (value <= peak - self.drop)
+            state['low'][p] = np.where(ends, value, low)
+            state['peak'][p] = np.where(ends, -np.inf, peak)
+            state['in_event'][p] = in_event & ~ends
+            if ends.any():
+                alerts += self._plateaus(p[ends], peak[ends], times[positions][ends])
+        return alerts
+
+    def _plateaus(self, p, levels, times):
+        """Page-Hinkley update of the probes `p` (each at most once) with new plateau levels."""
+        state = self._state
+        count = state['plateaus'][p] + 1
+        state['plateaus'][p] = count
+        # Deviation from the mean of the previous plateaus; the first plateau only sets the mean
+        previous = state['plateau_mean'][p]
+        deviation = np.where(count > 1, levels - previous, 0)
+        state['plateau_mean'][p] = previous + (levels - previous) / count
+        testing = count > self.warmup
+        high = state['ph_high'][p] + np.where(testing, deviation - self.delta, 0)
+        low = state['ph_low'][p] + np.where(testing, deviation + self.delta, 0)
+        high_min = np.minimum(state['ph_high_min'][p], high)
+        low_max = np.maximum(state['ph_low_max'][p], low)
+        rose = high - high_min > self.threshold
+        fell = low_max - low > self.threshold
+        raised = rose | fell
+        alerts = self._alerts(p, raised, 'plateau', times, np.maximum(high - high_min, low_max - low), np.where(rose, 1, -1))
+        # Restart the test after an alert, from the new plateau level
+        state['ph_high'][p] = np.where(raised, 0, high)
+        state['ph_low'][p] = np.where(raised, 0, low)
+        state['ph_high_min'][p] = np.where(raised, 0, high_min)
+        state['ph_low_max'][p] = np.where(raised, 0, low_max)
+        state['plateau_mean'][p] = np.where(raised, levels, state['plateau_mean'][p])
+        state['plateaus'][p] = np.where(raised, 1, state['plateaus'][p])
+        return alerts
+
+    def __call__(self, topics, readings, predictions, timestamps):
+        """IngestService sink: watch the calibrated predictions of each topic, reporting alerts through `on_alert`."""
+        for alert in self.add_readings(topics, predictions, timestamps):
+            self.on_alert(alert)
+
+    def on_alert(self, alert):
+        """Called for every alert raised while used as a sink; replace to act on drifted probes."""
+
+    def drifted(self):
+        """Names of the probes flagged as drifted."""
+        return [self.probes[i] for i in np.flatnonzero(self._state['drifted'][:len(self.probes)])]
+
+    def status(self, probe):
+        """Current statistics of a probe as a dict."""
+        index = self._index[probe]
+        return {name: float(values[index]) for name, values in self._state.items()}
+
+    def reset(self, probe):
+        """Forget a probe's history, e.g. after it has been recalibrated."""
+        index = self._index[probe]
+        for name, initial in _STATE.items():
+            self._state[name][index] = initial
+
+    def save(self, path):
+        """Save the monitor's configuration and per-probe state to a JSON file."""
+        count = len(self.probes)
+        state = {name: np.where(np.isfinite(values[:count]), values[:count], None).tolist() for name, values in self._state.items()}
+        with open(path, 'w') as file:
+            json.dump({'config': self.config, 'probes': self.probes, 'state': state}, file, separators=(',', ':'))
+
+    @classmethod
+    def load(cls, path):
+        """Re-create a monitor saved by `save`."""
+        with open(path) as file:
+            data = json.load(file)
+        monitor = cls(**data['config'])
+        monitor._indices(data['probes'])
+        for name, initial in _STATE.items():
+            values = np.array([initial if value is None else value for value in data['state'][name]], dtype=np.float64)
+            monitor._state[name][:len(values)] = values
+        return monitor
@@ -0,0 +1,205 @@
+"""
+Exporting fitted models as C headers for the sensor firmware.
+
+The generated header defines `static inline float <name>_evaluate(float x)`, so the
+firmware converts a reading with a few multiplies instead of hand-copied float
+literals:
+
+- polynomials (polynomial, curve_fit_polynomial, topp, linear) are evaluated in Horner
+  form;
+- power and logarithmic fits are written out in closed form;
+- splines and piecewise fits become tables of breakpoints, slopes and intercepts;
+- every other family (random forests, GAMs, ...) is resampled over the sensor's valid
+  range into a lookup table of 16-bit fixed-point values, interpolated linearly and
+  clamped at the ends. The table is made as fine as needed to meet the requested
+  tolerance, and the header states the maximum error measured against the model.
+"""
+
+import re
+import warnings
+
+import numpy as np
+
+from .base import CalibrationModel
+
+# Largest lookup table generated for families without a closed form
+MAX_TABLE_SIZE = 4096
+
+# Points per table interval at which the lookup table's error is measured
+ERROR_CHECK_DENSITY = 16
+
+
+def _c_float(value):
+    value = float(value)
+    # inff or nanf is not C; the <math.h> macros are, and export_header includes it when they are used
+    if np.isinf(value):
+        return 'INFINITY' if value > 0 else '-INFINITY'
+    if np.isnan(value):
+        return 'NAN'
+    text = f'{value:.9g}'
+    if not any(c in text for c in '.en'):
+        text += '.0'
+    return text + 'f'
+
+
+def _c_array(ctype, name, values, formatter=_c_float, per_line=12):
+    items = [formatter(value) for value in values]
+    if len(items) <= per_line:
+        return f'static const {ctype} {name}[{len(items)}] = {{{", ".join(items)}}};'
+    rows = [', '.join(items[i:i + per_line]) for i in range(0, len(items), per_line)]
+    return f'static const {ctype} {name}[{len(items)}] = {{\n    ' + ',\n    '.join(rows) + '\n};'
+
+
+def _horner(coefficients):
+    """C expression of the polynomial in x with coefficients highest degree first."""
+    expression = _c_float(coefficients[0])
+    for coefficient in coefficients[1:]:
+        expression = f'({expression} * x + {_c_float(coefficient)})'
+    return expression
+
+
+def _polynomial_coefficients(model):
+    """Coefficients highest degree first, or None for families that are not polynomials."""
+    if model.name == 'polynomial':
+        return np.asarray(model.params['coefficients'])
+    if model.name in ('curve_fit_polynomial', 'topp'):
+        return np.asarray(model.params['coefficients'])[::-1]
+    if model.name == 'linear':
+        return np.array([model.params['alpha'], model.params['beta']])
+    return None
+
+
+def _segment_tables(name, breakpoints, slopes, intercepts):
+    """Breakpoint, slope and intercept tables and a linear scan selecting the segment, as header lines."""
+    lines = [
+        f'#define {name.upper()}_SEGMENTS {len(slopes)}',
+        _c_array('float', f'{name}_breakpoints', breakpoints) if len(breakpoints) else '/* single segment */',
+        _c_array('float', f'{name}_slopes', slopes),
+        _c_array('float', f'{name}_intercepts', intercepts),
+        '',
+        f'static inline float {name}_evaluate(float x) {{',
+        '    int i = 0;',
+    ]
+    if len(breakpoints):
+        # A reading equal to a breakpoint belongs to the segment above it
+        lines.append(f'    while (i < {name.upper()}_SEGMENTS - 1 && x >= {name}_breakpoints[i]) i++;')
+    lines += [f'    return {name}_slopes[i] * x + {name}_intercepts[i];', '}']
+    return lines
+
+
+def quantize_table(values):
+    """16-bit fixed-point encoding of `values` as (codes, offset, scale), value = offset + code * scale."""
+    low, high = float(np.min(values)), float(np.max(values))
+    scale = (high - low) / 65535 or 1.0
+    codes = np.round((values - low) / scale).astype(np.int64) - 32768
+    return codes, low + 32768 * scale, scale
+
+
+def lookup_table(model, x_range, tolerance, max_size=MAX_TABLE_SIZE):
+    """
+    Sample `model` on a uniform grid over `x_range`, doubling the grid until linear
+    interpolation of the quantized table stays within `tolerance` of the model.
+
+    Returns (grid, codes, offset, scale, max_error). The error is measured at
+    ERROR_CHECK_DENSITY points per table interval; if `max_size` is reached first the
+    table is returned with its larger error.
+    """
+    low, high = map(float, x_range)
+    if not high > low:
+        raise ValueError(f"Invalid range {low:g}..{high:g} for a lookup table.")
+    size = 17
+    while True:
+        grid = np.linspace(low, high, size)
+        codes, offset, scale = quantize_table(model.predict(grid))
+        check = np.linspace(low, high, (size - 1) * ERROR_CHECK_DENSITY + 1)
+        max_error = float(np.max(np.abs(np.interp(check, grid, offset + codes * scale) - model.predict(check))))
+        if max_error <= tolerance or size >= max_size:
+            return grid, codes, offset, scale, max_error
+        size = min(2 * size - 1, max_size)
+
+
+def export_header(model, name='calibration', x_range=None, tolerance=0.01):
+    """
+    Return the text of a C header evaluating `model` as `<name>_evaluate(x)`.
+
+    `x_range` (the sensor's valid raw range) and `tolerance` are only used by families
+    exported as lookup tables, for which `x_range` is required.
+    """
+    if not isinstance(model, CalibrationModel) or not model.fitted:
+        raise ValueError("Only fitted calibration models can be exported.")
+    if not name.isidentifier():
+        raise ValueError(f"'{name}' is not a valid C identifier.")
+    if model.n_features > 1:
+        raise ValueError(f"The {model.name} model takes {model.n_features} predictor columns; "
+                         "only models of a single reading can be exported.")
+
+    guard = f'{name.upper()}_H'
+    header = [
+        f'/* Generated by python -m calibration export from a fitted {model.name} model; do not edit. */',
+        f'/* Configuration: {model.to_dict()["config"]} */',
+    ]
+    includes = []
+    coefficients = _polynomial_coefficients(model)
+
+    if coefficients is not None:
+        body = [f'static inline float {name}_evaluate(float x) {{', f'    return {_horner(coefficients)};', '}']
+    elif model.name == 'power':
+        a, b, c = model.params['coefficients']
+        includes.append('#include <math.h>')
+        body = [f'static inline float {name}_evaluate(float x) {{',
+                f'    return {_c_float(a)} * powf(x, {_c_float(b)}) + {_c_float(c)};', '}']
+    elif model.name == 'logarithmic':
+        a, b = model.params['coefficients']
+        includes.append('#include <math.h>')
+        header.append('/* Readings <= 0 are outside the model\'s domain and return NaN. */')
+        body = [f'static inline float {name}_evaluate(float x) {{',
+                f'    return {_c_float(a)} + {_c_float(b)} * logf(x);', '}']
+    elif model.name == 'spline':
+        slopes, intercepts = model.segment_coefficients()
+        body = _segment_tables(name, model.params['knots'][1:-1], slopes, intercepts)
+    elif model.name == 'piecewise':
+        segments = np.asarray(model.params['segments'])
+        body = _segment_tables(name, model.params['breakpoints'], segments[:, 0], segments[:, 1])
+    else:
+        if x_range is None:
+            raise ValueError(f"Exporting a {model.name} model as a lookup table needs the valid range of readings.")
+        grid, codes, offset, scale, max_error = lookup_table(model, x_range, tolerance)
+        if max_error > tolerance:
+            warnings.warn(f"The {len(grid)}-point lookup table is within {max_error:.3g} of the {model.name} model, "
+                          f"not the requested {tolerance:g}.")
+        includes.append('#include <stdint.h>')
+        header.append(f'/* Lookup table of {len(grid)} points over [{grid[0]:g}, {grid[-1]:g}], clamped outside it. '
+                      f'Maximum error against the model: {max_error:.3g} (tolerance {tolerance:g}). */')
+        step = (grid[-1] - grid[0]) / (len(grid) - 1)
+        upper = name.upper()
+        body = [
+            f'#define {upper}_TABLE_SIZE {len(grid)}',
+            f'#define {upper}_X0 {_c_float(grid[0])}',
+            f'#define {upper}_INV_STEP {_c_float(1 / step)}',
+            f'#define {upper}_OFFSET {_c_float(offset)}',
+            f'#define {upper}_SCALE {_c_float(scale)}',
+            f'#define {upper}_MAX_ERROR {_c_float(max_error)}',
+            _c_array('int16_t', f'{name}_table', codes, formatter=str),
+            '',
+            f'static inline float {name}_evaluate(float x) {{',
+            f'    float position = (x - {upper}_X0) * {upper}_INV_STEP;',
+            '    if (position <= 0.0f) {',
+            f'        return {upper}_OFFSET + {upper}_SCALE * {name}_table[0];',
+            '    }',
+            f'    if (position >= {upper}_TABLE_SIZE - 1) {{',
+            f'        return {upper}_OFFSET + {upper}_SCALE * {name}_table[{upper}_TABLE_SIZE - 1];',
+            '    }',
+            '    int i = (int)position;',
+            '    float fraction = position - i;',
+            f'    float code = {name}_table[i] + fraction * ({name}_table[i + 1] - {name}_table[i]);',
+            f'    return {upper}_OFFSET + {upper}_SCALE * code;',
+            '}',
+        ]
+
+    if re.search(r'\b(INFINITY|NAN)\b', '\n'.join(body)) and '#include <math.h>' not in includes:
+        includes.append('#include <math.h>')
+    lines = header + ['', f'#ifndef {guard}', f'#define {guard}', '']
+    if includes:
+        lines += includes + ['']
+    lines += body + ['', f'#endif /* {guard} */', '']
+    return '\n'.join(lines)
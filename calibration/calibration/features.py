@@ -0,0 +1,113 @@
+"""
+Polynomial and interaction features of several predictor columns.
+
+A calibration that compensates for temperature and salinity maps the raw reading,
+temperature and bulk EC to VWC. A polynomial of them is linear in their monomials,
+1, x1, x2, x3, x1^2, x1*x2, ..., so it is fitted by least squares on a matrix of those
+features. The columns are standardized first (centered on their mean and divided by
+their standard deviation), which keeps the monomials of raw readings, degrees C and
+uS/cm on a common scale.
+
+PolynomialFeatures builds the monomials up to a maximum degree once, ordered by total
+degree, so the features of every lower degree are a prefix of its columns and those
+without interactions a fixed selection of them: every model fitted to the same data
+shares one feature matrix instead of building its own. Within a degree the monomials
+follow scikit-learn's PolynomialFeatures order.
+"""
+
+import itertools
+
+import numpy as np
+
+
+def as_columns(x):
+    """Predictors as an (n, k) float64 array; a 1-D array is a single column."""
+    x = np.asarray(x, dtype=np.float64)
+    return x.reshape(len(x), -1)
+
+
+def monomials(n_features, degree):
+    """Monomials of `n_features` variables up to total `degree`, as tuples of variable indices ordered by total degree."""
+    return [combination for d in range(degree + 1)
+            for combination in itertools.combinations_with_replacement(range(n_features), d)]
+
+
+def _standardization(x):
+    center = x.mean(axis=0)
+    scale = x.std(axis=0)
+    scale[scale == 0] = 1
+    return center, scale
+
+
+def _build(x, terms):
+    """Feature matrix of the standardized predictors `x` for `terms`, each a monomial one variable longer than an earlier one."""
+    matrix = np.empty((len(x), len(terms)))
+    index = {}
+    for j, term in enumerate(terms):
+        index[term] = j
+        if not term:
+            matrix[:, j] = 1
+        else:
+            # Extend the monomial without the last variable by that variable
+            matrix[:, j] = matrix[:, index[term[:-1]]] * x[:, term[-1]] if len(term) > 1 else x[:, term[0]]
+    return matrix
+
+
+def polynomial_features(x, degree, interactions=True, center=None, scale=None):
+    """
+    Polynomial features of the predictors `x` up to `degree`, standardized by `center`
+    and `scale` (by the mean and standard deviation of `x` when None).
+    """
+    x = as_columns(x)
+    if center is None or scale is None:
+        center, scale = _standardization(x)
+    terms = [term for term in monomials(x.shape[1], degree) if interactions or len(set(term)) <= 1]
+    return _build((x - center) / scale, terms)
+
+
+class PolynomialFeatures:
+    """
+    Polynomial features of the predictors `x` up to `degree`, built once and shared by
+    the models fitted to them. `names` name the predictor columns in `feature_names`.
+    """
+
+    def __init__(self, x, degree, names=None):
+        x = as_columns(x)
+        self.degree = int(degree)
+        self.n_features = x.shape[1]
+        self.names = list(names) if names is not None else [f'x{i}' for i in range(self.n_features)]
+        self.center, self.scale = _standardization(x)
+        self.terms = monomials(self.n_features, self.degree)
+        self.matrix = _build((x - self.center) / self.scale, self.terms)
+
+    def __len__(self):
+        return len(self.matrix)
+
+    def _columns(self, degree, interactions):
+        if degree is None:
+            degree = self.degree
+        if degree > self.degree:
+            raise ValueError(f"The features were built up to degree {self.degree}, not {degree}.")
+        columns = [j for j, term in enumerate(self.terms) if len(term) <= degree and (interactions or len(set(term)) <= 1)]
+        # The features of a degree with interactions are a prefix of the columns, so a view
+        return slice(0, len(columns)) if interactions else np.array(columns)
+
+    def design(self, degree=None, interactions=True):
+        """Feature matrix up to `degree` (the built degree when None), with or without interaction terms."""
+        return self.matrix[:, self._columns(degree, interactions)]
+
+    def feature_names(self, degree=None, interactions=True):
+        """Names of the columns of `design`, e.g. ['1', 'RAW', 'TEMPERATURE', 'RAW^2', 'RAW*TEMPERATURE', ...]."""
+        columns = self._columns(degree, interactions)
+        names = []
+        for term in self.terms[columns] if isinstance(columns, slice) else [self.terms[j] for j in columns]:
+            counts = [(self.names[i], term.count(i)) for i in sorted(set(term))]
+            names.append('*'.join(name if count == 1 else f'{name}^{count}' for name, count in counts) or '1')
+        return names
+
+    def rows(self, rows):
+        """The features of a subset of the rows, e.g. a training split, standardized as the full data."""
+        subset = object.__new__(PolynomialFeatures)
+        subset.__dict__.update(self.__dict__)
+        subset.matrix = self.matrix[rows]
+        return subset
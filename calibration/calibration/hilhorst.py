@@ -0,0 +1,226 @@
+"""
+Pore-water electrical conductivity by the Hilhorst model, over whole time series.
+
+The THC-S firmware computes pore-water EC on the device for every reading:
+
+    eps_w  = 80.3 - 0.37 * (T - 20)                            pore-water permittivity
+    eps_b  = 1.3088 + 0.1439 * h + 0.0076 * h^2                 bulk permittivity from the humidity reading
+    sigma_p = eps_w * sigma_b / (eps_b - eps_sigma_b_0)         pore-water EC
+
+with the permittivity at zero bulk EC, eps_sigma_b_0 (esb_0), hard-coded to 4.1 for coco
+coir. The functions here apply the same pipeline to arrays, with esb_0 taken from each
+sensor's calibration, so the pore-water EC of a logged history can be recomputed after
+recalibrating without re-flashing the devices. Readings whose bulk permittivity does not
+exceed esb_0 have no meaningful pore-water EC and give NaN instead of the device's
+negative or infinite values.
+
+esb_0 itself is estimated from the same model. For a substrate wetted with a nutrient
+solution of constant pore-water EC sigma_p,
+
+    eps_b = esb_0 + (eps_w(T) / sigma_p) * sigma_b
+
+so regressing the bulk permittivity on the temperature-corrected bulk EC
+eps_w(T) * sigma_b gives esb_0 as the intercept and 1 / sigma_p as the slope
+(HilhorstModel). `estimate_esb_0` adds a percentile bootstrap confidence interval; the
+least-squares line has a closed form, so every resample is fitted at once with array
+operations, and large bootstraps are split across a process pool.
+"""
+
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .base import CalibrationModel, register_model
+from .dataset import DEFAULT_CHUNKSIZE, iter_dataset, load_env_file
+
+# Permittivity of water at 20 degrees C and its decrease per degree
+WATER_PERMITTIVITY_20C = 80.3
+WATER_PERMITTIVITY_SLOPE = 0.37
+
+# esb_0 hard-coded in the firmware, for coco coir
+COCO_COIR_ESB_0 = 4.1
+
+# Bulk permittivity polynomial of the THC-S humidity reading, lowest degree first
+THCS_PERMITTIVITY_COEFFICIENTS = (1.3088, 0.1439, 0.0076)
+
+# Variable an .env file stores esb_0 in
+ESB_0_VARIABLE = 'EPSILON_SIGMA_B_0'
+
+# Bootstraps with fewer resampled values than this run in the calling process
+PARALLEL_BOOTSTRAP_SIZE = 10_000_000
+
+# Number of resamples per task of a bootstrap
+_BOOTSTRAP_TASK = 256
+
+# Largest number of resampled values fitted in one array operation
+_BOOTSTRAP_BLOCK = 1 << 22
+
+# esb_0 and the pore-water EC 1 / slope, with the bootstrap confidence interval of esb_0
+EsbEstimate = namedtuple('EsbEstimate', ['esb_0', 'pore_water_ec', 'low', 'high', 'confidence', 'n_boot'])
+
+
+def pore_water_permittivity(temperature):
+    """Real part of the permittivity of the pore water at `temperature` (degrees C)."""
+    return WATER_PERMITTIVITY_20C - WATER_PERMITTIVITY_SLOPE * (np.asarray(temperature, dtype=np.float64) - 20)
+
+
+def bulk_permittivity(humidity, coefficients=THCS_PERMITTIVITY_COEFFICIENTS):
+    """Bulk permittivity of the soil from humidity readings, by a polynomial with coefficients lowest degree first."""
+    return np.polynomial.polynomial.polyval(np.asarray(humidity, dtype=np.float64), coefficients)
+
+
+def pore_water_ec(bulk_ec, permittivity, temperature, esb_0=COCO_COIR_ESB_0):
+    """
+    Pore-water EC from bulk EC, bulk permittivity and temperature arrays.
+
+    `esb_0` is a scalar or an array broadcasting against the readings, e.g. one value per
+    reading of a history mixing several sensors. The result is NaN where the bulk
+    permittivity does not exceed esb_0.
+    """
+    bulk_ec = np.asarray(bulk_ec, dtype=np.float64)
+    excess = np.asarray(permittivity, dtype=np.float64) - esb_0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(excess > 0, pore_water_permittivity(temperature) * bulk_ec / excess, np.nan)
+
+
+def temperature_corrected_ec(bulk_ec, temperature):
+    """Bulk EC scaled by the pore-water permittivity at `temperature`, the predictor of HilhorstModel."""
+    return pore_water_permittivity(temperature) * np.asarray(bulk_ec, dtype=np.float64)
+
+
+def _lines(x, y):
+    """(intercepts, slopes) of the least-squares lines through each row of `x` and `y`."""
+    x_mean = x.mean(axis=-1, keepdims=True)
+    y_mean = y.mean(axis=-1, keepdims=True)
+    xc = x - x_mean
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slopes = np.sum(xc * (y - y_mean), axis=-1) / np.sum(xc * xc, axis=-1)
+    return y_mean[..., 0] - slopes * x_mean[..., 0], slopes
+
+
+@register_model
+class HilhorstModel(CalibrationModel):
+    """
+    Bulk permittivity as a line in the temperature-corrected bulk EC eps_w(T) * sigma_b.
+
+    Fitted with `temperature_corrected_ec(bulk_ec, temperature)` as the predictor and
+    the bulk permittivity as the response. `params['esb_0']` is the intercept, the
+    permittivity at zero bulk EC, and `params['slope']` is 1 / sigma_p.
+    """
+
+    name = 'hilhorst'
+
+    def _fit(self, x, y):
+        if len(np.unique(x)) < 2:
+            raise ValueError("Estimating esb_0 needs at least two distinct bulk EC readings.")
+        intercept, slope = _lines(x, y)
+        return {'esb_0': float(intercept), 'slope': float(slope)}
+
+    def _predict(self, x):
+        return self.params['esb_0'] + self.params['slope'] * x
+
+
+def _bootstrap_intercepts(x, y, n_boot, seed):
+    """Intercepts of the lines fitted to `n_boot` resamples of (x, y) drawn with replacement."""
+    rng = np.random.default_rng(seed)
+    block = max(1, _BOOTSTRAP_BLOCK // len(x))
+    intercepts = []
+    for start in range(0, n_boot, block):
+        sample = rng.integers(0, len(x), size=(min(block, n_boot - start), len(x)))
+        intercepts.append(_lines(x[sample], y[sample])[0])
+    return np.concatenate(intercepts)
+
+
+def bootstrap_esb_0(x, y, n_boot=2000, workers=None, seed=None):
+    """
+    esb_0 of `n_boot` bootstrap resamples of the predictor `x` and bulk permittivity `y`.
+
+    The resamples are split across `workers` processes; by default small bootstraps run
+    in this process and larger ones use one process per CPU core. Results depend only
+    on `seed`, not on the number of workers.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if workers is None:
+        workers = 1 if n_boot * len(x) < PARALLEL_BOOTSTRAP_SIZE else os.cpu_count() or 1
+    # Resamples are drawn in fixed-size tasks with their own seeds, so the draws do not depend on `workers`
+    sizes = [min(_BOOTSTRAP_TASK, n_boot - start) for start in range(0, n_boot, _BOOTSTRAP_TASK)]
+    tasks = len(sizes)
+    seeds = np.random.SeedSequence(seed).spawn(tasks)
+    if workers == 1:
+        return np.concatenate([_bootstrap_intercepts(x, y, size, task_seed) for size, task_seed in zip(sizes, seeds)])
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return np.concatenate(list(executor.map(_bootstrap_intercepts, [x] * tasks, [y] * tasks, sizes, seeds)))
+
+
+def estimate_esb_0(bulk_ec, permittivity, temperature, n_boot=2000, confidence=0.95, workers=None, seed=None):
+    """
+    Estimate esb_0 from bulk EC, bulk permittivity and temperature readings of one substrate.
+
+    Returns the fitted HilhorstModel and an EsbEstimate with the percentile bootstrap
+    confidence interval of esb_0 at level `confidence` (NaN when `n_boot` is 0).
+    """
+    x = temperature_corrected_ec(bulk_ec, temperature)
+    y = np.asarray(permittivity, dtype=np.float64)
+    if not len(x) == len(y):
+        raise ValueError("Bulk EC, permittivity and temperature must have the same length.")
+    model = HilhorstModel().fit(x, y)
+    low = high = np.nan
+    if n_boot:
+        intercepts = bootstrap_esb_0(x, y, n_boot, workers, seed)
+        low, high = np.nanpercentile(intercepts, [50 * (1 - confidence), 50 * (1 + confidence)])
+    slope = model.params['slope']
+    return model, EsbEstimate(model.params['esb_0'], 1 / slope if slope else np.inf, float(low), float(high),
+                              confidence, n_boot)
+
+
+def read_esb_0(source):
+    """esb_0 from a number, a HilhorstModel artifact, or the EPSILON_SIGMA_B_0 variable of an .env file."""
+    from .artifacts import ArtifactError, load_artifact
+
+    try:
+        return float(source)
+    except ValueError:
+        pass
+    try:
+        model = load_artifact(source)
+    except ArtifactError:
+        model = None
+    if model is not None:
+        if model.name != HilhorstModel.name:
+            raise ValueError(f"'{source}' holds a {model.name} model, not an esb_0 estimate.")
+        return model.params['esb_0']
+    (values,) = load_env_file(source, ESB_0_VARIABLE)
+    if len(values) != 1:
+        raise ValueError(f"{ESB_0_VARIABLE} in '{source}' must hold a single value, not {len(values)}.")
+    return float(values[0])
+
+
+def iter_pore_water_ec(source, esb_0, conductivity='conductivity', temperature='temperature', humidity='moisture',
+                       permittivity=None, coefficients=THCS_PERMITTIVITY_COEFFICIENTS, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Yield (bulk_ec, permittivity, temperature, pore_water_ec) arrays for each chunk of the data file `source`.
+
+    The bulk permittivity is read from the `permittivity` column when given, and
+    otherwise computed from the `humidity` column with `coefficients`.
+    """
+    columns = [conductivity, temperature, permittivity or humidity]
+    for bulk_ec, temperatures, values in iter_dataset(source, columns, chunksize):
+        permittivities = values if permittivity else bulk_permittivity(values, coefficients)
+        yield bulk_ec, permittivities, temperatures, pore_water_ec(bulk_ec, permittivities, temperatures, esb_0)
+
+
+def write_pore_water_ec(source, output, esb_0, header=True, **columns):
+    """
+    Stream CSV rows of bulk EC, bulk permittivity, temperature and pore-water EC for the
+    readings in `source` to the text stream `output`. Returns the number of rows written.
+    """
+    if header:
+        output.write('bulk_ec,permittivity,temperature,pore_water_ec\n')
+    count = 0
+    for chunk in iter_pore_water_ec(source, esb_0, **columns):
+        output.write(('%.10g,%.10g,%.10g,%.10g\n' * len(chunk[0])) % tuple(np.column_stack(chunk).ravel()))
+        count += len(chunk[0])
+    return count
@@ -0,0 +1,306 @@
+"""
+Applying calibrations to live MQTT sensor streams.
+
+The firmware publishes raw readings, e.g. `soil/thcs1/moisture` from the THC-S probes
+or `soil/VWC` from the Tinovi probes. An IngestService subscribes to them, maps each
+topic to a model artifact through a list of routes, and converts the readings in
+micro-batches: readings are buffered per model and converted with one vectorized
+predict() call when `batch_size` readings are waiting or every `flush_interval` seconds.
+The results are republished to each route's output topic and/or handed to a sink that
+persists them.
+
+Routes are read from a JSON file:
+
+    {"routes": [
+        {"topic": "soil/{sensor}/moisture", "model": "models/{sensor}.json", "output": "soil/{sensor}/vwc"},
+        {"topic": "soil/VWC", "model": "models/tinovi.json", "output": "soil/VWC/calibrated"}
+    ]}
+
+`{name}` matches one topic level and can be used in the model path and output topic;
+relative model paths are resolved against the routes file's directory. Models are
+loaded on first use and kept in memory.
+
+With a `recorder`, the raw value of every numeric message received is also handed on
+in batches as (topics, timestamps, values), e.g. to SeriesStore.append_many to keep the
+raw readings for recalibration. Extra `subscriptions` bring in topics that are only
+recorded, such as temperature and conductivity.
+
+The service talks to the broker through a small client interface (`subscribe`,
+`publish` and an async `messages()` iterator). `connect` provides one for a real broker
+such as mosquitto (requires aiomqtt), and FakeBroker an in-process one for tests.
+"""
+
+import asyncio
+import contextlib
+import csv
+import json
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+from .artifacts import load_artifact
+
+DEFAULT_BATCH_SIZE = 1024
+DEFAULT_FLUSH_INTERVAL = 0.05
+
+
+def topic_matches(topic_filter, topic):
+    """Whether `topic` matches an MQTT subscription filter with + and # wildcards."""
+    filter_levels = topic_filter.split('/')
+    levels = topic.split('/')
+    for i, level in enumerate(filter_levels):
+        if level == '#':
+            return True
+        if i >= len(levels) or (level != '+' and level != levels[i]):
+            return False
+    return len(levels) == len(filter_levels)
+
+
+class Route:
+    """A topic pattern with {name} placeholders, the model converting its readings and the output topic."""
+
+    def __init__(self, topic, model, output=None):
+        self.topic = topic
+        self.model = model
+        self.output = output
+        self.subscription = re.sub(r'\{\w+\}', '+', topic)
+        parts = re.split(r'\{(\w+)\}', topic)
+        # re.split alternates literal text and placeholder names
+        self._regex = re.compile(''.join(re.escape(part) if i % 2 == 0 else f'(?P<{part}>[^/]+)'
+                                         for i, part in enumerate(parts)) + '$')
+
+    def resolve(self, topic):
+        """(model path, output topic) for a matching topic, or None."""
+        match = self._regex.match(topic)
+        if match is None:
+            return None
+        fields = match.groupdict()
+        return self.model.format(**fields), self.output.format(**fields) if self.output else None
+
+
+def load_routes(path):
+    """Read the routes of a JSON routes file."""
+    with open(path) as file:
+        config = json.load(file)
+    base = os.path.dirname(os.path.abspath(path))
+    return [Route(route['topic'], os.path.join(base, route['model']), route.get('output')) for route in config['routes']]
+
+
+class IngestService:
+    """
+    Converts raw readings received on routed topics in vectorized micro-batches.
+
+    `publish(topic, payload)` is awaited for every converted reading whose route has an
+    output topic; `sink(topics, readings, predictions, timestamps)` is called once per
+    batch and model with the topics the readings were received on. Either may be None.
+    `recorder(topics, timestamps, values)` receives the raw value of every numeric
+    message on each flush; readings it fails to record are reported and counted, and the
+    service carries on. Counters are kept in `stats`.
+    """
+
+    def __init__(self, routes, publish=None, sink=None, batch_size=DEFAULT_BATCH_SIZE,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL, precision=4, recorder=None, subscriptions=()):
+        self.routes = list(routes)
+        self.publish = publish
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.precision = precision
+        self.recorder = recorder
+        self.subscriptions = list(subscriptions)
+        self.stats = {'received': 0, 'converted': 0, 'unrouted': 0, 'invalid': 0, 'unrecorded': 0}
+        self._models = {}
+        self._resolved = {}  # topic -> (model path, output topic) or None
+        self._pending = {}  # model path -> (topics, output topics, readings, timestamps)
+        self._waiting = 0
+        self._outputs = set()
+        self._recorded = ([], [], [])  # topics, timestamps, values
+
+    def _resolve(self, topic):
+        try:
+            return self._resolved[topic]
+        except KeyError:
+            pass
+        # Our own output topics are never converted again, even when a route matches them
+        resolved = None
+        if topic not in self._outputs:
+            resolved = next((r for r in (route.resolve(topic) for route in self.routes) if r is not None), None)
+        if resolved is not None and resolved[1] is not None:
+            self._outputs.add(resolved[1])
+            self._resolved.pop(resolved[1], None)
+        self._resolved[topic] = resolved
+        return resolved
+
+    def model(self, path):
+        try:
+            return self._models[path]
+        except KeyError:
+            model = self._models[path] = load_artifact(path)
+            return model
+
+    def submit(self, topic, payload, timestamp=None):
+        """Buffer one message; returns True when it should be flushed now."""
+        self.stats['received'] += 1
+        resolved = self._resolve(topic)
+        recording = self.recorder is not None and topic not in self._outputs
+        if resolved is None:
+            self.stats['unrouted'] += 1
+            if not recording:
+                return False
+        try:
+            reading = float(payload)
+        except ValueError:
+            self.stats['invalid'] += 1
+            return False
+        if timestamp is None:
+            timestamp = time.time()
+        if recording:
+            for column, value in zip(self._recorded, (topic, timestamp, reading)):
+                column.append(value)
+        if resolved is None:
+            return False
+        path, output = resolved
+        topics, outputs, readings, timestamps = self._pending.setdefault(path, ([], [], [], []))
+        topics.append(topic)
+        outputs.append(output)
+        readings.append(reading)
+        timestamps.append(timestamp)
+        self._waiting += 1
+        return self._waiting >= self.batch_size
+
+    async def flush(self):
+        """Convert every buffered reading, one predict() call per model."""
+        # Swap the buffers before awaiting anything, so messages arriving meanwhile go to the next batch
+        pending, self._pending, self._waiting = self._pending, {}, 0
+        recorded, self._recorded = self._recorded, ([], [], [])
+        if recorded[0]:
+            try:
+                self.recorder(*recorded)
+            except Exception as error:
+                # e.g. a topic the store cannot name, or timestamps behind the stored ones after a clock change
+                print(f"Cannot record {len(recorded[0])} readings: {type(error).__name__}: {error}", file=sys.stderr)
+                self.stats['unrecorded'] += len(recorded[0])
+        for path, (topics, outputs, readings, timestamps) in pending.items():
+            try:
+                predictions = self.model(path).predict(np.array(readings))
+            except Exception as error:
+                print(f"Cannot convert {len(readings)} readings with '{path}': {type(error).__name__}: {error}", file=sys.stderr)
+                self.stats['invalid'] += len(readings)
+                continue
+            self.stats['converted'] += len(readings)
+            if self.sink is not None:
+                self.sink(topics, np.array(readings), predictions, np.array(timestamps))
+            if self.publish is not None:
+                for topic, payload in zip(outputs, np.char.mod(f'%.{self.precision}f', predictions).tolist()):
+                    if topic is not None:
+                        await self.publish(topic, payload)
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def run(self, client):
+        """Subscribe to every route's topics on `client` and convert its messages until it stops delivering them."""
+        for subscription in dict.fromkeys([route.subscription for route in self.routes] + self.subscriptions):
+            await client.subscribe(subscription)
+        flusher = asyncio.create_task(self._flush_periodically())
+        try:
+            async for topic, payload in client.messages():
+                if self.submit(topic, payload):
+                    await self.flush()
+        finally:
+            flusher.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await flusher
+            await self.flush()
+
+
+class CsvSink:
+    """Sink appending time, topic, reading and prediction rows to a CSV file."""
+
+    def __init__(self, path):
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, 'a', newline='')
+        self.writer = csv.writer(self.file)
+        if new:
+            self.writer.writerow(['time', 'topic', 'reading', 'prediction'])
+
+    def __call__(self, topics, readings, predictions, timestamps):
+        self.writer.writerows(zip(np.round(timestamps, 3), topics, readings, predictions))
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class FakeClient:
+    """In-process client of a FakeBroker."""
+
+    def __init__(self, broker):
+        self.broker = broker
+        self.filters = []
+        self.queue = asyncio.Queue()
+
+    async def subscribe(self, topic_filter):
+        self.filters.append(topic_filter)
+
+    async def publish(self, topic, payload):
+        self.broker.deliver(topic, payload)
+
+    async def messages(self):
+        while True:
+            message = await self.queue.get()
+            if message is None:
+                return
+            yield message
+
+    def close(self):
+        """Stop `messages()` once the messages already delivered are consumed."""
+        self.queue.put_nowait(None)
+
+
+class FakeBroker:
+    """In-process MQTT stand-in: delivers published messages to the clients subscribed to them."""
+
+    def __init__(self):
+        self.clients = []
+
+    def client(self):
+        client = FakeClient(self)
+        self.clients.append(client)
+        return client
+
+    def deliver(self, topic, payload):
+        for client in self.clients:
+            if any(topic_matches(topic_filter, topic) for topic_filter in client.filters):
+                client.queue.put_nowait((topic, payload))
+
+
+class MQTTClient:
+    """Client interface over an aiomqtt client."""
+
+    def __init__(self, client):
+        self.client = client
+
+    async def subscribe(self, topic_filter):
+        await self.client.subscribe(topic_filter)
+
+    async def publish(self, topic, payload):
+        await self.client.publish(topic, payload)
+
+    async def messages(self):
+        async for message in self.client.messages:
+            yield message.topic.value, message.payload
+
+
+@contextlib.asynccontextmanager
+async def connect(host, port=1883, username=None, password=None):
+    """Connect to an MQTT broker, yielding an MQTTClient (requires aiomqtt)."""
+    import aiomqtt
+
+    async with aiomqtt.Client(host, port=port, username=username, password=password) as client:
+        yield MQTTClient(client)
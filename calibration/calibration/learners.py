@@ -0,0 +1,59 @@
+"""
+Calibration model families backed by scikit-learn and pyGAM estimators.
+
+These are not parametric: the fitted estimator object itself is the model state.
+"""
+
+import numpy as np
+
+from .base import CalibrationModel, register_model
+
+
+class EstimatorModel(CalibrationModel):
+    """Base for families wrapping an estimator with the scikit-learn fit/predict API; they take several predictor columns."""
+
+    parametric = False
+    multivariate = True
+
+    def _make_estimator(self):
+        raise NotImplementedError
+
+    def _fit(self, x, y):
+        x = x.reshape(len(x), -1)
+        estimator = self._make_estimator()
+        estimator.fit(x, y)
+        return {'estimator': estimator, 'n_features': x.shape[1]}
+
+    def _predict(self, x):
+        return np.asarray(self.params['estimator'].predict(x.reshape(len(x), -1)), dtype=np.float64)
+
+
+@register_model
+class GAMModel(EstimatorModel):
+    """pyGAM LinearGAM with its default terms."""
+
+    name = 'gam'
+
+    def _make_estimator(self):
+        from pygam import LinearGAM
+
+        return LinearGAM()
+
+
+@register_model
+class RandomForestModel(EstimatorModel):
+    name = 'random_forest'
+
+    def __init__(self, random_state=42, n_estimators=100):
+        super().__init__()
+        self.random_state = random_state
+        self.n_estimators = int(n_estimators)
+
+    @property
+    def config(self):
+        return {'random_state': self.random_state, 'n_estimators': self.n_estimators}
+
+    def _make_estimator(self):
+        from sklearn.ensemble import RandomForestRegressor
+
+        return RandomForestRegressor(random_state=self.random_state, n_estimators=self.n_estimators)
@@ -0,0 +1,117 @@
+"""
+Linear least-squares polynomial fits solved by QR.
+
+A polynomial is linear in its coefficients, so it needs no iterative optimizer. The fit
+is solved in a Chebyshev basis on the data range, which stays well conditioned at
+degrees where the plain Vandermonde matrix of raw sensor readings does not, and the
+solution is then converted to ordinary power-basis coefficients.
+
+The columns of the basis up to degree d span the polynomials of degree d, so a single
+QR factorization of the basis of the highest degree serves every lower degree as well:
+the fit of degree d projects onto the first d + 1 columns of Q. `polynomial_sweep`
+uses this to score a whole range of degrees at the cost of one fit.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+# Fit statistics of one degree in a polynomial sweep; cv is a crossval.CVScore
+DegreeScore = namedtuple('DegreeScore', ['degree', 'rmse', 'aic', 'bic', 'cv'])
+
+
+def _domain(x):
+    low, high = float(np.min(x)), float(np.max(x))
+    if low == high:
+        low, high = low - 1, high + 1
+    return low, high
+
+
+def chebyshev_basis(x, degree, domain):
+    """Chebyshev polynomials T_0..T_degree of `x` mapped from `domain` onto [-1, 1], one column each."""
+    low, high = domain
+    return np.polynomial.chebyshev.chebvander((2 * np.asarray(x, dtype=np.float64) - (low + high)) / (high - low), degree)
+
+
+def chebyshev_to_power(degree, domain):
+    """Matrix mapping coefficients of `chebyshev_basis` to power-basis coefficients, lowest degree first."""
+    transform = np.zeros((degree + 1, degree + 1))
+    for j in range(degree + 1):
+        basis = np.polynomial.Chebyshev(np.eye(degree + 1)[j], domain=domain)
+        coefficients = basis.convert(kind=np.polynomial.Polynomial).coef
+        transform[:len(coefficients), j] = coefficients
+    return transform
+
+
+def polynomial_lstsq(x, y, degree, sigma=None):
+    """
+    Least-squares polynomial fit by QR, returning (coefficients, covariance).
+
+    Coefficients are lowest degree first. `sigma` optionally gives the standard
+    deviation of each point, weighting its residual by 1/sigma. The covariance is scaled
+    by the residual variance, as curve_fit reports it with absolute_sigma=False, and is
+    infinite when there are no more points than coefficients.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n_params = degree + 1
+    domain = _domain(x)
+    basis = chebyshev_basis(x, degree, domain)
+    if sigma is not None:
+        weights = 1 / np.asarray(sigma, dtype=np.float64)
+        basis = basis * weights[:, np.newaxis]
+        y = y * weights
+
+    q, r = np.linalg.qr(basis)
+    if np.any(np.abs(np.diag(r)) <= np.finfo(float).eps * len(x) * np.abs(r).max()):
+        raise np.linalg.LinAlgError(f"Cannot fit a degree {degree} polynomial to {len(np.unique(x))} distinct predictor values.")
+    solution = np.linalg.solve(r, q.T @ y)
+
+    if len(x) > n_params:
+        residual_variance = np.sum((y - basis @ solution)**2) / (len(x) - n_params)
+        r_inverse = np.linalg.inv(r)
+        covariance = residual_variance * (r_inverse @ r_inverse.T)
+    else:
+        covariance = np.full((n_params, n_params), np.inf)
+
+    transform = chebyshev_to_power(degree, domain)
+    with np.errstate(invalid='ignore'):
+        return transform @ solution, transform @ covariance @ transform.T
+
+
+def polynomial_sweep(x, y, degrees, folds=None):
+    """
+    Score least-squares polynomials of every degree in `degrees` from one QR
+    factorization, returning a DegreeScore per degree.
+
+    AIC and BIC use the Gaussian log-likelihood with degree + 1 parameters, as
+    statsmodels' OLS reports them. Cross-validated errors are computed in closed form
+    on `folds` (leave-one-out when None).
+    """
+    from .crossval import Folds, cross_validate_orthonormal
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    degrees = sorted(degrees)
+    if not degrees or degrees[0] < 0:
+        raise ValueError(f"A degree sweep needs one or more degrees of at least 0, got {degrees}.")
+    if folds is None:
+        folds = Folds(n, n_splits=None)
+
+    q, r = np.linalg.qr(chebyshev_basis(x, degrees[-1], _domain(x)))
+    # With Q orthonormal, the RSS of degree d is the RSS of the highest degree plus the
+    # squared projections of y on the columns beyond d + 1
+    projections = q.T @ y
+    highest_rss = np.sum((y - q @ projections)**2)
+    tail = np.concatenate([np.cumsum((projections**2)[::-1])[::-1][1:], [0]])
+    scores = []
+    for degree in degrees:
+        k = degree + 1
+        if abs(r[degree, degree]) <= np.finfo(float).eps * n * np.abs(r).max():
+            raise np.linalg.LinAlgError(f"Cannot fit a degree {degree} polynomial to {len(np.unique(x))} distinct predictor values.")
+        rss = max(float(highest_rss + tail[degree]), np.finfo(float).tiny)
+        log_likelihood = -n / 2 * (np.log(2 * np.pi) + np.log(rss / n) + 1)
+        scores.append(DegreeScore(degree, np.sqrt(rss / n), -2 * log_likelihood + 2 * k,
+                                  -2 * log_likelihood + k * np.log(n), cross_validate_orthonormal(q[:, :k], y, folds)))
+    return scores
@@ -0,0 +1,41 @@
+"""
+Error metrics reported by the fitting scripts.
+"""
+
+import numpy as np
+
+
+def residuals(y_true, y_pred):
+    return np.asarray(y_true, dtype=np.float64) - np.asarray(y_pred, dtype=np.float64)
+
+
+def mse(y_true, y_pred):
+    """Mean Squared Error."""
+    return float(np.mean(residuals(y_true, y_pred)**2))
+
+
+def rmse(y_true, y_pred):
+    """Root Mean Squared Error."""
+    return float(np.sqrt(mse(y_true, y_pred)))
+
+
+def sem(y_true, y_pred):
+    """Standard error of the mean of the residuals."""
+    res = residuals(y_true, y_pred)
+    return float(np.std(res) / np.sqrt(len(res)))
+
+
+def evaluate(y_true, y_pred):
+    """Return MSE, RMSE and SEM of a prediction as a dict."""
+    res = residuals(y_true, y_pred)
+    mse_value = float(np.mean(res**2))
+    return {
+        'mse': mse_value,
+        'rmse': float(np.sqrt(mse_value)),
+        'sem': float(np.std(res) / np.sqrt(len(res))),
+    }
+
+
+def format_metrics(metrics, separator='\n'):
+    """Format the output of `evaluate` the way the fitting scripts print it."""
+    return separator.join(f"{key.upper()}: {metrics[key]:.8f}" for key in ('mse', 'rmse', 'sem'))
@@ -0,0 +1,320 @@
+"""
+Closed-form and curve-fitted calibration model families.
+
+SciPy is only imported by the families fitted with `curve_fit`, and only when they are
+fitted, so importing this module costs no more than importing NumPy.
+"""
+
+import numpy as np
+
+from .base import CalibrationModel, register_model
+from .robust import RobustFit, weighted_lstsq_solver
+
+
+@register_model
+class PolynomialModel(RobustFit, CalibrationModel):
+    """
+    Least-squares polynomial, coefficients stored highest degree first as np.polyfit
+    returns them. `robust` selects a robust fit (see `calibration.robust`).
+    """
+
+    name = 'polynomial'
+
+    def __init__(self, degree=2, robust=None, tuning=None, max_iter=None, seed=0):
+        super().__init__()
+        self.degree = int(degree)
+        self._init_robust(robust, tuning, max_iter, seed)
+
+    @property
+    def config(self):
+        return {'degree': self.degree, **self.robust_config}
+
+    @property
+    def n_params(self):
+        return self.degree + 1
+
+    def design_matrix(self, x):
+        # A robust fit is not the least-squares fit on this matrix, so it is refitted per fold
+        if self.robust is not None:
+            return None
+        return np.vander(np.asarray(x, dtype=np.float64), self.degree + 1)
+
+    def _fit_weighted(self, x, y, weights):
+        # np.polyfit weights multiply the residuals, not their squares
+        return {'coefficients': np.polyfit(x, y, self.degree, w=None if weights is None else np.sqrt(weights))}
+
+    def _weighted_solver(self, x, y):
+        from .lstsq import _domain, chebyshev_basis, chebyshev_to_power
+
+        # Solve in the Chebyshev basis of the data range, converting to power coefficients highest degree first
+        domain = _domain(x)
+        solve = weighted_lstsq_solver(chebyshev_basis(x, self.degree, domain), y)
+        transform = chebyshev_to_power(self.degree, domain)[::-1]
+        return lambda weights: {'coefficients': transform @ solve(weights)}
+
+    def _predict(self, x):
+        return np.polyval(self.params['coefficients'], x)
+
+
+class CurveFitModel(CalibrationModel):
+    """Base for families fitted with scipy.optimize.curve_fit; coefficients follow `function`'s argument order."""
+
+    initial_guess = None
+
+    def __init__(self, p0=None, maxfev=None):
+        super().__init__()
+        self.p0 = list(p0) if p0 is not None else None
+        self.maxfev = maxfev
+
+    @property
+    def config(self):
+        config = {}
+        if self.p0 is not None:
+            config['p0'] = self.p0
+        if self.maxfev is not None:
+            config['maxfev'] = self.maxfev
+        return config
+
+    @staticmethod
+    def function(x, *params):
+        raise NotImplementedError
+
+    def _curve_fit(self, x, y, **kwargs):
+        from scipy.optimize import curve_fit
+
+        if self.maxfev is not None:
+            kwargs['maxfev'] = self.maxfev
+        kwargs.setdefault('p0', self.p0 if self.p0 is not None else self.initial_guess)
+        params, covariance = curve_fit(self.function, x, y, **kwargs)
+        return {'coefficients': params, 'covariance': covariance}
+
+    def _fit(self, x, y):
+        return self._curve_fit(x, y)
+
+    def _fit_weighted(self, x, y, weights):
+        """curve_fit with `weights` multiplying the squared residuals; weighted refits start from the current params."""
+        if weights is None:
+            return self._curve_fit(x, y)
+        kept = weights > 0
+        kwargs = {'sigma': 1 / np.sqrt(weights[kept])}
+        if self.params is not None:
+            kwargs['p0'] = self.params['coefficients']
+        return self._curve_fit(x[kept], y[kept], **kwargs)
+
+    def _predict(self, x):
+        return self.function(x, *self.params['coefficients'])
+
+
+@register_model
+class PowerModel(RobustFit, CurveFitModel):
+    """f(x) = a * x^b + c, with an optional robust fit (see `calibration.robust`)"""
+
+    name = 'power'
+    initial_guess = [1, 0.5, 1]
+    n_params = 3
+
+    def __init__(self, p0=None, maxfev=10000, robust=None, tuning=None, max_iter=None, seed=0):
+        super().__init__(p0=p0, maxfev=maxfev)
+        self._init_robust(robust, tuning, max_iter, seed)
+
+    @property
+    def config(self):
+        return {**super().config, **self.robust_config}
+
+    @staticmethod
+    def function(x, a, b, c):
+        return a * np.power(x, b) + c
+
+
+@register_model
+class LogarithmicModel(RobustFit, CurveFitModel):
+    """
+    f(x) = a + b * log(x)
+
+    Logarithms are undefined for non-positive values, so those points are left out of
+    the fit and predicted as NaN. `robust` selects a robust fit (see `calibration.robust`).
+    """
+
+    name = 'logarithmic'
+    initial_guess = [1, 1]
+    n_params = 2
+
+    def __init__(self, p0=None, maxfev=None, robust=None, tuning=None, max_iter=None, seed=0):
+        super().__init__(p0=p0, maxfev=maxfev)
+        self._init_robust(robust, tuning, max_iter, seed)
+
+    @property
+    def config(self):
+        return {**super().config, **self.robust_config}
+
+    @staticmethod
+    def function(x, a, b):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return a + b * np.log(x)
+
+    def _fit_weighted(self, x, y, weights):
+        positive = x > 0
+        return super()._fit_weighted(x[positive], y[positive], None if weights is None else weights[positive])
+
+    def _weighted_solver(self, x, y):
+        # Linear in (a, b) given log(x)
+        positive = x > 0
+        solve = weighted_lstsq_solver(np.column_stack([np.ones(np.count_nonzero(positive)), np.log(x[positive])]), y[positive])
+        return lambda weights: {'coefficients': solve(None if weights is None else weights[positive])}
+
+    def _predict(self, x):
+        predicted = super()._predict(x)
+        return np.where(x > 0, predicted, np.nan)
+
+
+@register_model
+class CurveFitPolynomialModel(CurveFitModel):
+    """
+    Polynomial with curve_fit-style output, coefficients stored lowest degree first
+    together with their covariance.
+
+    The polynomial is solved by linear least squares (see `calibration.lstsq`), and
+    curve_fit is only used when `bounds` on the coefficients are given.
+    """
+
+    name = 'curve_fit_polynomial'
+
+    def __init__(self, degree=2, p0=None, maxfev=None, bounds=None):
+        super().__init__(p0=p0, maxfev=maxfev)
+        self.degree = int(degree)
+        self.bounds = list(bounds) if bounds is not None else None
+        self.sigma = None
+
+    @property
+    def config(self):
+        config = {'degree': self.degree, **super().config}
+        if self.bounds is not None:
+            config['bounds'] = self.bounds
+        return config
+
+    @property
+    def initial_guess(self):
+        return [1] * (self.degree + 1)
+
+    @staticmethod
+    def function(x, *params):
+        return np.polynomial.polynomial.polyval(x, params)
+
+    def design_matrix(self, x):
+        # A bounded fit is not the least-squares fit on this matrix, so it is refitted per fold
+        if self.bounds is not None:
+            return None
+        return np.vander(np.asarray(x, dtype=np.float64), self.degree + 1, increasing=True)
+
+    def fit(self, x, y, sigma=None):
+        """Fit to `x` and `y`; `sigma` optionally gives each point's standard deviation, weighting the fit as curve_fit does."""
+        self.sigma = np.asarray(sigma, dtype=np.float64) if sigma is not None else None
+        return super().fit(x, y)
+
+    def _fit(self, x, y):
+        if self.bounds is None:
+            from .lstsq import polynomial_lstsq
+
+            coefficients, covariance = polynomial_lstsq(x, y, self.degree, sigma=self.sigma)
+            return {'coefficients': coefficients, 'covariance': covariance}
+        kwargs = {'bounds': self.bounds}
+        if self.sigma is not None:
+            kwargs['sigma'] = self.sigma
+        return self._curve_fit(x, y, **kwargs)
+
+
+@register_model
+class ToppModel(CalibrationModel):
+    """
+    Topp equation, DP = a0 + a1*VWC + a2*VWC^2 + a3*VWC^3.
+
+    Here the predictor is VWC and the response is dielectric permittivity. The model is
+    linear in its coefficients, so it is solved by linear least squares.
+    """
+
+    name = 'topp'
+
+    def design_matrix(self, x):
+        return np.vander(np.asarray(x, dtype=np.float64), 4, increasing=True)
+
+    def _fit(self, x, y):
+        return {'coefficients': np.polynomial.polynomial.polyfit(x, y, 3)}
+
+    def _predict(self, x):
+        return np.polynomial.polynomial.polyval(x, self.params['coefficients'])
+
+
+@register_model
+class MultivariatePolynomialModel(CalibrationModel):
+    """
+    Least-squares polynomial of several predictor columns, e.g. the raw reading,
+    temperature and bulk EC, with their interaction terms unless `interactions` is
+    False (see `calibration.features`).
+
+    The columns are standardized by the mean and standard deviation of the training
+    data, kept in `params['center']` and `params['scale']`, and
+    `params['coefficients']` follow the monomial order of calibration.features.
+    `params['n_features']` is the number of predictor columns.
+    """
+
+    name = 'multivariate_polynomial'
+    multivariate = True
+
+    def __init__(self, degree=2, interactions=True):
+        super().__init__()
+        self.degree = int(degree)
+        self.interactions = bool(interactions)
+        self.features = None
+
+    @property
+    def config(self):
+        return {'degree': self.degree, 'interactions': self.interactions}
+
+    def fit(self, x, y, features=None):
+        """
+        Fit to `x` and `y`; `features` optionally is a calibration.features.PolynomialFeatures
+        of `x`, of this degree or higher, shared with other models so its monomials are not built again.
+        """
+        self.features = features
+        try:
+            return super().fit(x, y)
+        finally:
+            self.features = None
+
+    def design_matrix(self, x):
+        from .features import polynomial_features
+
+        return polynomial_features(x, self.degree, self.interactions)
+
+    def _fit(self, x, y):
+        from .features import PolynomialFeatures
+
+        features = self.features
+        if features is None or len(features) != len(x) or features.degree < self.degree:
+            features = PolynomialFeatures(x, self.degree)
+        coefficients = np.linalg.lstsq(features.design(self.degree, self.interactions), y, rcond=None)[0]
+        return {'center': features.center, 'scale': features.scale, 'coefficients': coefficients,
+                'n_features': features.n_features}
+
+    def _predict(self, x):
+        from .features import polynomial_features
+
+        features = polynomial_features(x, self.degree, self.interactions, self.params['center'], self.params['scale'])
+        return features @ self.params['coefficients']
+
+
+@register_model
+class LinearModel(CalibrationModel):
+    """f(x) = alpha * x + beta"""
+
+    name = 'linear'
+
+    def design_matrix(self, x):
+        return np.vander(np.asarray(x, dtype=np.float64), 2)
+
+    def _fit(self, x, y):
+        alpha, beta = np.polyfit(x, y, 1)
+        return {'alpha': float(alpha), 'beta': float(beta)}
+
+    def _predict(self, x):
+        return self.params['alpha'] * x + self.params['beta']
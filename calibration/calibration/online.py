@@ -0,0 +1,165 @@
+"""
+Recursive least-squares updates of linear-in-parameters calibration models.
+
+Adding a gravimetric reference point should not mean refitting from scratch. The
+polynomial, topp and linear families, and the segments of a piecewise fit (with its
+breakpoints held fixed), are linear least-squares fits, so a new point (x, y) updates
+the coefficients theta and the inverse normal matrix P = (X^T X)^-1 in O(p^2):
+
+    k     = P phi / (lambda + phi^T P phi)
+    theta = theta + k (y - phi^T theta)
+    P     = (P - k phi^T P) / lambda
+
+where phi is the point's design-matrix row. `make_online` starts from the exact P of
+the data the model was fitted on, so with the forgetting factor lambda = 1 every update
+gives the same coefficients as refitting on all points. lambda < 1 weights a point
+observed m points ago by lambda^m, letting the calibration follow a slowly changing
+substrate. Robust fits (see calibration.robust) are not least-squares fits, so they
+cannot be updated this way. The columns are scaled by their magnitude on the initial data, which keeps P
+well conditioned for the powers of raw readings.
+
+The state is kept in the model's params ('covariance', 'column_scale', 'forgetting' and
+'n_updates'), so it is saved with the model artifact and the persisted coefficients
+are updated in place.
+"""
+
+import numpy as np
+
+ONLINE_FAMILIES = ('polynomial', 'topp', 'linear', 'piecewise')
+
+
+def _check_family(family):
+    if family not in ONLINE_FAMILIES:
+        raise ValueError(f"The {family} family cannot be updated recursively. "
+                         f"Families with recursive updates: {', '.join(ONLINE_FAMILIES)}.")
+
+
+def _check_least_squares(model):
+    if getattr(model, 'robust', None) is not None:
+        raise ValueError(f"The {model.name} model was fitted robustly ({model.robust}), but recursive updates extend "
+                         "least-squares fits; refit it with the new points instead.")
+
+
+def _coefficients(model):
+    """Coefficients as a (groups, p) array, one group per piecewise segment and one otherwise."""
+    if model.name == 'linear':
+        return np.array([[model.params['alpha'], model.params['beta']]])
+    if model.name == 'piecewise':
+        return np.array(model.params['segments'], dtype=np.float64)
+    return np.array([model.params['coefficients']], dtype=np.float64)
+
+
+def _set_coefficients(model, theta):
+    if model.name == 'linear':
+        model.params['alpha'], model.params['beta'] = map(float, theta[0])
+    elif model.name == 'piecewise':
+        model.params['segments'] = theta
+    else:
+        model.params['coefficients'] = theta[0]
+
+
+def _rows(model, x):
+    """(group index, design-matrix row) of every reading in `x`."""
+    if model.name == 'piecewise':
+        return model.segment_index(x), np.column_stack([x, np.ones_like(x)])
+    return np.zeros(len(x), dtype=np.int64), model.design_matrix(x)
+
+
+def is_online(model):
+    return model.fitted and 'covariance' in model.params
+
+
+def make_online(model, x, y, forgetting=1.0):
+    """
+    Add recursive least-squares state to `model`, fitted on the data (x, y).
+
+    The coefficients are left unchanged; P is computed exactly from (x, y). Returns the model.
+    """
+    _check_family(model.name)
+    _check_least_squares(model)
+    if not 0 < forgetting <= 1:
+        raise ValueError(f"The forgetting factor must be in (0, 1], not {forgetting:g}.")
+    x = np.asarray(x, dtype=np.float64)
+    groups, rows = _rows(model, x)
+    scale = np.sqrt(np.mean(rows**2, axis=0))
+    scale[scale == 0] = 1
+    rows = rows / scale
+    n_groups, n_params = _coefficients(model).shape
+    covariance = np.empty((n_groups, n_params, n_params))
+    for group in range(n_groups):
+        group_rows = rows[groups == group]
+        # P is the inverse of R^T R from a QR factorization, avoiding the squared condition number of X^T X
+        r = np.linalg.qr(group_rows, mode='r')
+        if len(group_rows) < n_params or np.any(np.abs(np.diag(r)) <= np.finfo(float).eps * len(x) * np.abs(r).max()):
+            raise ValueError(f"Cannot start recursive updates: {len(group_rows)} points do not determine "
+                             f"{n_params} coefficients{' of segment ' + str(group) if n_groups > 1 else ''}.")
+        r_inverse = np.linalg.inv(r)
+        covariance[group] = r_inverse @ r_inverse.T
+    model.params.update({'covariance': covariance, 'column_scale': scale, 'forgetting': float(forgetting), 'n_updates': 0})
+    return model
+
+
+def update(model, x, y):
+    """Update an online model with new points (x, y) in order, in O(p^2) each. Returns the model."""
+    if not is_online(model):
+        raise ValueError(f"The {model.name} model has no recursive least-squares state; call make_online first.")
+    x = np.atleast_1d(np.asarray(x, dtype=np.float64))
+    y = np.atleast_1d(np.asarray(y, dtype=np.float64))
+    if len(x) != len(y):
+        raise ValueError(f"Predictor and response must have the same length, got {len(x)} and {len(y)}.")
+    scale = np.asarray(model.params['column_scale'], dtype=np.float64)
+    covariance = np.array(model.params['covariance'], dtype=np.float64)
+    forgetting = model.params['forgetting']
+    # Work on the coefficients of the scaled columns
+    theta = _coefficients(model) * scale
+    groups, rows = _rows(model, x)
+    for group, row, target in zip(groups, rows / scale, y):
+        p = covariance[group]
+        p_row = p @ row
+        gain = p_row / (forgetting + row @ p_row)
+        theta[group] += gain * (target - row @ theta[group])
+        p -= np.outer(gain, p_row)
+        p /= forgetting
+        # Keep P symmetric against rounding
+        covariance[group] = (p + p.T) / 2
+    _set_coefficients(model, theta / scale)
+    model.params['covariance'] = covariance
+    model.params['n_updates'] = int(model.params['n_updates']) + len(x)
+    return model
+
+
+def update_artifact(path, x, y, forgetting=None):
+    """
+    Bring the model artifact at `path` up to date with the data (x, y), whose first
+    points must be the ones it was fitted on: only the points beyond them are applied,
+    as recursive updates. The artifact is rewritten with the hash of the full data.
+
+    `forgetting` sets the forgetting factor (1 when the model had no online state yet).
+    Returns the model and the number of points applied.
+    """
+    from .artifacts import ArtifactError, StaleArtifactError, check_artifact, load_artifact, read_artifact_header, save_artifact
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    header = read_artifact_header(path)
+    _check_family(header['family'])
+    if x.ndim > 1:
+        raise ValueError(f"Recursive updates take a single predictor column, got {x.shape[1]}.")
+    n_samples = header.get('n_samples')
+    if header.get('data_hash') is None or n_samples is None:
+        raise ArtifactError(f"'{path}' does not record the data it was fitted on, so new points cannot be told apart.")
+    if len(x) < n_samples:
+        raise StaleArtifactError(f"The {header['family']} model was fitted on {n_samples} points, but the data has only {len(x)}.")
+    check_artifact(header, (x[:n_samples], y[:n_samples]))
+
+    model = load_artifact(path)
+    _check_least_squares(model)
+    if not is_online(model):
+        make_online(model, x[:n_samples], y[:n_samples], 1.0 if forgetting is None else forgetting)
+    elif forgetting is not None:
+        if not 0 < forgetting <= 1:
+            raise ValueError(f"The forgetting factor must be in (0, 1], not {forgetting:g}.")
+        model.params['forgetting'] = float(forgetting)
+    update(model, x[n_samples:], y[n_samples:])
+    save_artifact(model, path, data=(x, y), metadata=header.get('metadata'))
+    return model, len(x) - n_samples
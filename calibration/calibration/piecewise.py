@@ -0,0 +1,275 @@
+"""
+Piecewise linear regression with BIC-selected breakpoints.
+
+Each segment is an ordinary least-squares line scored by its BIC, computed as
+statsmodels' OLS does (n*log(2*pi) + n*log(RSS/n) + n + 2*log(n)), and breakpoints are
+chosen to minimize the sum of the segments' BICs.
+
+The data is sorted once by the predictor. Cumulative sums of 1, x, y, x^2, xy and y^2
+then give the RSS of the line through any run of consecutive points in O(1), so the
+two-segment search is O(n) after the O(n log n) sort instead of two OLS fits per
+candidate. With more segments, a dynamic program over candidate breakpoints finds the
+split minimizing the total BIC.
+"""
+
+import numpy as np
+
+from .base import CalibrationModel, register_model
+from .robust import RobustFit, robust_weights
+
+# Largest number of candidate breakpoint positions the k-segment dynamic program
+# considers; longer data sets are searched on an evenly spaced subset and then refined
+DEFAULT_MAX_CANDIDATES = 2000
+
+
+class SegmentStatistics:
+    """
+    Cumulative sums giving least-squares line fits of any run of sorted points in O(1).
+
+    `weights` optionally multiply each point's squared residual, making the lines and
+    RSS weighted least-squares ones; the BIC still counts every point.
+    """
+
+    def __init__(self, x, y, weights=None):
+        order = np.argsort(x, kind='stable')
+        self.x = np.asarray(x, dtype=np.float64)[order]
+        self.y = np.asarray(y, dtype=np.float64)[order]
+        w = np.ones_like(self.x) if weights is None else np.asarray(weights, dtype=np.float64)[order]
+        # Centering keeps the sums of squares well conditioned
+        self.x_mean = self.x.mean() if weights is None else np.average(self.x, weights=w)
+        self.y_mean = self.y.mean() if weights is None else np.average(self.y, weights=w)
+        xc = self.x - self.x_mean
+        yc = self.y - self.y_mean
+        sums = np.column_stack([w, w * xc, w * yc, w * xc * xc, w * xc * yc, w * yc * yc])
+        self.cumulative = np.vstack([np.zeros(6), np.cumsum(sums, axis=0)])
+
+    def __len__(self):
+        return len(self.x)
+
+    def _moments(self, start, stop):
+        sums = self.cumulative[stop] - self.cumulative[start]
+        n, sx, sy, sxx, sxy, syy = np.moveaxis(np.asarray(sums), -1, 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cxx = sxx - sx * sx / n
+            cxy = sxy - sx * sy / n
+            cyy = syy - sy * sy / n
+        return n, sx, sy, cxx, cxy, cyy
+
+    def rss(self, start, stop):
+        """Residual sum of squares of the line fitted to points [start, stop)."""
+        n, _, _, cxx, cxy, cyy = self._moments(start, stop)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rss = np.where(cxx > 0, cyy - cxy * cxy / np.where(cxx > 0, cxx, 1), cyy)
+        # A run of zero-weight points has no residuals
+        return np.maximum(np.where(n > 0, rss, 0), 0)
+
+    def bic(self, start, stop):
+        """BIC of the line fitted to points [start, stop), as statsmodels' OLS reports it."""
+        n = np.asarray(stop) - np.asarray(start)
+        rss = self.rss(start, stop)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return n * np.log(2 * np.pi) + n * np.log(np.maximum(rss / n, np.finfo(float).tiny)) + n + 2 * np.log(n)
+
+    def line(self, start, stop):
+        """(slope, intercept) of the line fitted to points [start, stop)."""
+        n, sx, sy, cxx, cxy, _ = self._moments(start, stop)
+        slope = cxy / cxx if cxx > 0 else 0.0
+        intercept = sy / n - slope * sx / n if n > 0 else 0.0
+        # Undo the centering
+        return float(slope), float(intercept + self.y_mean - slope * self.x_mean)
+
+    def split_positions(self, min_segment_size):
+        """Positions i that can start a segment: x[i] differs from x[i-1] and both sides are long enough."""
+        i = np.arange(min_segment_size, len(self) - min_segment_size + 1)
+        return i[self.x[i] > self.x[i - 1]]
+
+
+def find_best_breakpoint(x, y, min_segment_size=5, weights=None):
+    """
+    Return the breakpoint minimizing the combined BIC of two least-squares lines, or
+    None if the data is too short.
+
+    Only breakpoints leaving at least `min_segment_size` observations in each segment
+    are considered. The data does not need to be sorted. `weights` optionally weight
+    the squared residuals.
+    """
+    stats = SegmentStatistics(x, y, weights)
+    n = len(stats)
+    candidates = stats.split_positions(min_segment_size)
+    # The last segment keeps at least min_segment_size + 1 points, as it always has
+    candidates = candidates[candidates < n - min_segment_size]
+    if not len(candidates):
+        return None
+    combined_bic = stats.bic(0, candidates) + stats.bic(candidates, n)
+    return float(stats.x[candidates[np.argmin(combined_bic)]])
+
+
+def _refine(stats, bounds, positions, min_segment_size):
+    """Move each interior boundary to its best position with its neighbours held fixed."""
+    for s in range(1, len(bounds) - 1):
+        lower, upper = bounds[s - 1], bounds[s + 1]
+        allowed = positions[(positions - lower >= min_segment_size) & (upper - positions >= min_segment_size)]
+        if len(allowed):
+            cost = stats.bic(lower, allowed) + stats.bic(allowed, upper)
+            bounds[s] = allowed[np.argmin(cost)]
+    return bounds
+
+
+def find_breakpoints(x, y, n_segments=2, min_segment_size=5, max_candidates=DEFAULT_MAX_CANDIDATES, weights=None):
+    """
+    Return the n_segments - 1 breakpoints minimizing the total BIC of the segments.
+
+    Breakpoints are found by dynamic programming over candidate positions, O(k * m^2)
+    for k segments and m candidates. Data sets with more than `max_candidates` possible
+    positions are searched on an evenly spaced subset of them, and each breakpoint is
+    then refined over every position between its neighbours. `weights` optionally
+    weight the squared residuals.
+    """
+    if n_segments < 2:
+        return np.array([])
+    stats = SegmentStatistics(x, y, weights)
+    n = len(stats)
+    positions = stats.split_positions(min_segment_size)
+    candidates = positions
+    if len(candidates) > max_candidates:
+        candidates = candidates[np.linspace(0, len(candidates) - 1, max_candidates).round().astype(int)]
+
+    # Boundaries are 0, the candidates and n; cost[a, b] is the BIC of the segment between boundaries a and b
+    boundaries = np.concatenate([[0], candidates, [n]])
+    start, stop = np.meshgrid(boundaries, boundaries, indexing='ij')
+    with np.errstate(all='ignore'):
+        cost = np.where(stop - start >= min_segment_size, stats.bic(start, stop), np.inf)
+
+    # best[b] is the lowest total BIC covering [0, boundaries[b]) with the current number of segments
+    best = cost[0].copy()
+    previous = []
+    for _ in range(n_segments - 1):
+        total = best[:, np.newaxis] + cost
+        previous.append(np.argmin(total, axis=0))
+        best = total[previous[-1], np.arange(len(boundaries))]
+
+    if not np.isfinite(best[-1]):
+        raise ValueError(f"Cannot split {n} observations into {n_segments} segments of at least {min_segment_size}.")
+
+    # Walk back from the last boundary to recover the breakpoints
+    bounds = [len(boundaries) - 1]
+    for back in reversed(previous):
+        bounds.append(back[bounds[-1]])
+    bounds = [0] + [int(boundaries[b]) for b in reversed(bounds)]
+
+    if len(candidates) < len(positions):
+        bounds = _refine(stats, bounds, positions, min_segment_size)
+    return stats.x[bounds[1:-1]]
+
+
+@register_model
+class PiecewiseLinearModel(RobustFit, CalibrationModel):
+    """
+    Independent least-squares line segments separated by breakpoints.
+
+    The breakpoints are searched for by BIC unless given. `params['breakpoints']` holds
+    the n_segments - 1 breakpoints and `params['segments']` one (slope, intercept) row
+    per segment; a reading equal to a breakpoint belongs to the segment above it.
+    With `robust`, every reweighting searches the breakpoints again on the weighted
+    data (see `calibration.robust`).
+    """
+
+    name = 'piecewise'
+
+    def __init__(self, breakpoints=None, n_segments=2, min_segment_size=5, max_candidates=DEFAULT_MAX_CANDIDATES,
+                 robust=None, tuning=None, max_iter=None, seed=0):
+        super().__init__()
+        self.breakpoints = sorted(float(b) for b in breakpoints) if breakpoints is not None else None
+        self.n_segments = len(self.breakpoints) + 1 if self.breakpoints is not None else int(n_segments)
+        self.min_segment_size = int(min_segment_size)
+        self.max_candidates = int(max_candidates)
+        self._init_robust(robust, tuning, max_iter, seed)
+        # Breakpoints held fixed while a robust fit reweights the segments
+        self._held_breakpoints = None
+
+    @property
+    def config(self):
+        config = {'n_segments': self.n_segments, 'min_segment_size': self.min_segment_size}
+        if self.breakpoints is not None:
+            config['breakpoints'] = self.breakpoints
+        if self.max_candidates != DEFAULT_MAX_CANDIDATES:
+            config['max_candidates'] = self.max_candidates
+        return {**config, **self.robust_config}
+
+    @property
+    def n_params(self):
+        """Points in a ransac subset: two per segment with given breakpoints, enough to search them otherwise."""
+        if self.breakpoints is not None:
+            return 2 * self.n_segments
+        return self.n_segments * self.min_segment_size + 1
+
+    def _fit_irls(self, x, y, tuning):
+        """
+        Reweight with the least-squares breakpoints held fixed, O(n) per iteration, then
+        search the breakpoints again on the robust weights and reweight once more if
+        they moved.
+        """
+        if self.breakpoints is not None:
+            return super()._fit_irls(x, y, tuning)
+        try:
+            self._held_breakpoints = self._fit_weighted(x, y, None)['breakpoints']
+            params = super()._fit_irls(x, y, tuning)
+            if params['robust_scale'] > 0:
+                self._held_breakpoints = None
+                weights = robust_weights(self._residuals(params, x, y) / (tuning * params['robust_scale']), self.robust)
+                breakpoints = self._fit_weighted(x, y, weights)['breakpoints']
+                if not np.array_equal(breakpoints, params['breakpoints']):
+                    self._held_breakpoints = breakpoints
+                    params = super()._fit_irls(x, y, tuning, weights)
+        finally:
+            self._held_breakpoints = None
+        return params
+
+    def _weighted_solver(self, x, y):
+        breakpoints = self._held_breakpoints if self._held_breakpoints is not None else self.breakpoints
+        if breakpoints is None:
+            return super()._weighted_solver(x, y)
+        # With the breakpoints fixed, each segment's weighted line comes from per-segment sums in O(n)
+        breakpoints = np.asarray(breakpoints, dtype=np.float64)
+        segment = np.searchsorted(breakpoints, x, side='right')
+        n_segments = len(breakpoints) + 1
+        x_mean, y_mean = x.mean(), y.mean()
+        xc, yc = x - x_mean, y - y_mean
+
+        def solve(weights):
+            w = np.ones_like(xc) if weights is None else weights
+            n, sx, sy, sxx, sxy = (np.bincount(segment, values, n_segments) for values in (w, w * xc, w * yc, w * xc * xc, w * xc * yc))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                cxx = sxx - sx * sx / n
+                slope = np.where(cxx > 0, (sxy - sx * sy / n) / cxx, 0)
+                intercept = np.where(n > 0, (sy - slope * sx) / n, 0)
+            return {'breakpoints': breakpoints, 'segments': np.column_stack([slope, intercept + y_mean - slope * x_mean])}
+
+        return solve
+
+    def _fit_weighted(self, x, y, weights):
+        if self._held_breakpoints is not None:
+            breakpoints = np.asarray(self._held_breakpoints)
+        elif self.breakpoints is not None:
+            breakpoints = np.array(self.breakpoints)
+        elif self.n_segments == 2:
+            breakpoint = find_best_breakpoint(x, y, self.min_segment_size, weights)
+            if breakpoint is None:
+                raise ValueError(f"Need more than {2 * self.min_segment_size} observations to search for a breakpoint.")
+            breakpoints = np.array([breakpoint])
+        else:
+            breakpoints = find_breakpoints(x, y, self.n_segments, self.min_segment_size, self.max_candidates, weights)
+
+        stats = SegmentStatistics(x, y, weights)
+        bounds = np.concatenate([[0], np.searchsorted(stats.x, breakpoints), [len(stats)]])
+        segments = np.array([stats.line(start, stop) for start, stop in zip(bounds[:-1], bounds[1:])])
+        return {'breakpoints': breakpoints, 'segments': segments}
+
+    def segment_index(self, x):
+        """Index of the segment each reading in `x` falls into."""
+        return np.searchsorted(self.params['breakpoints'], np.asarray(x, dtype=np.float64), side='right')
+
+    def _predict(self, x):
+        segments = self.params['segments']
+        segment = self.segment_index(x)
+        return segments[segment, 0] * x + segments[segment, 1]
@@ -0,0 +1,117 @@
+"""
+Diagnostic figures shown by the fitting scripts.
+
+matplotlib is imported inside the plotting functions, so the rest of the package can be
+used without paying for it. Each function takes a `plot` mode: 'show' opens a window,
+'png' and 'svg' write the figure to `output` with the non-interactive Agg backend, so
+headless batch runs neither block nor need a display, and 'none' draws nothing and
+never imports matplotlib.
+"""
+
+import numpy as np
+
+from .metrics import evaluate, format_metrics
+
+PLOT_MODES = ('none', 'show', 'png', 'svg')
+
+
+def _pyplot(plot):
+    if plot not in PLOT_MODES:
+        raise ValueError(f"Unknown plot mode '{plot}'. Available modes: {', '.join(PLOT_MODES)}.")
+    import matplotlib
+
+    if plot != 'show':
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    return plt
+
+
+def _finish(plt, plot, output):
+    if plot == 'show':
+        plt.show()
+    else:
+        plt.savefig(output or f'figure.{plot}', format=plot)
+        plt.close()
+
+
+def plot_fit_diagnostics(x, y, predicted, fit_label, curve=None, extra=None, plot='show', output=None):
+    """
+    Draw the three-panel figure used by the fitting scripts: the data with the fitted
+    curve, actual vs. predicted response and residuals vs. predicted response.
+
+    `curve` is an (x, y) pair to draw as the fitted curve; when it is None the fit is
+    drawn through the sorted data. `extra`, when given, is called with the first axes
+    to draw anything specific to the model (e.g. a breakpoint marker).
+    """
+    if plot == 'none':
+        return
+    plt = _pyplot(plot)
+
+    x = np.asarray(x)
+    y = np.asarray(y)
+    predicted = np.asarray(predicted)
+    residuals = y - predicted
+    metrics = format_metrics(evaluate(y, predicted), separator=' | ')
+
+    if curve is None:
+        order = np.argsort(x)
+        curve = (x[order], predicted[order])
+
+    plt.figure(figsize=(15, 7))
+
+    # Original Data and Fit Plot
+    ax = plt.subplot(1, 3, 1)
+    plt.scatter(x, y, color='blue', label='Actual VWC')
+    plt.plot(curve[0], curve[1], 'r-', label=fit_label)
+    if extra is not None:
+        extra(ax)
+    plt.xlabel('Sensor Readings')
+    plt.ylabel('Volumetric Water Content (VWC)')
+    plt.title('Sensor Readings vs. VWC')
+    plt.legend()
+
+    # Predicted VWC vs. Actual VWC
+    plt.subplot(1, 3, 2)
+    plt.scatter(y, predicted, color='green', label='Predicted VWC')
+    plt.plot([y.min(), y.max()], [y.min(), y.max()], 'k--', lw=2, label='Perfect Prediction')
+    plt.xlabel('Actual VWC')
+    plt.ylabel('Predicted VWC')
+    plt.title('Actual vs. Predicted VWC')
+    plt.legend()
+
+    # Residuals vs Predicted VWC
+    plt.subplot(1, 3, 3)
+    plt.scatter(predicted, residuals, color='purple')
+    plt.axhline(y=0, color='r', linestyle='--')
+    plt.xlabel('Predicted VWC')
+    plt.ylabel('Residuals')
+    plt.title(f'Residuals vs. Predicted VWC\n{metrics}')
+
+    plt.tight_layout()
+    _finish(plt, plot, output)
+
+
+def plot_fit(x, y, curve, fit_label, xlabel, ylabel, title=None, figsize=(10, 5), grid=True, plot='show', output=None):
+    """Draw the observed data with a single fitted curve."""
+    if plot == 'none':
+        return
+    plt = _pyplot(plot)
+
+    plt.figure(figsize=figsize)
+    plt.scatter(x, y, label='Observed Data')
+    plt.plot(curve[0], curve[1], 'r-', label=fit_label)
+    plt.xlabel(xlabel)
+    plt.ylabel(ylabel)
+    if title:
+        plt.title(title)
+    plt.legend()
+    if grid:
+        plt.grid(True)
+    _finish(plt, plot, output)
+
+
+def fit_curve(model, x, points=200):
+    """Evaluate `model` on an evenly spaced grid spanning `x`, for plotting."""
+    grid = np.linspace(np.min(x), np.max(x), points)
+    return grid, model.predict(grid)
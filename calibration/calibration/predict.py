@@ -0,0 +1,92 @@
+"""
+Batch prediction with fitted calibration models.
+
+Readings are converted a chunk at a time with one vectorized `predict` call per chunk,
+so a season of logged raw values is back-converted without a Python-level loop over
+the readings. A model fitted to several predictor columns (e.g. the raw reading,
+temperature and bulk EC) is given chunks of those columns as (n, k) arrays.
+"""
+
+import itertools
+import os
+import sys
+
+import numpy as np
+
+from .dataset import DATASET_FORMATS, DEFAULT_CHUNKSIZE, iter_dataset
+
+
+def predict_array(model, readings):
+    """Predict the response for an array of readings in a single vectorized call."""
+    return model.predict(np.asarray(readings, dtype=np.float64))
+
+
+def _columns(column):
+    """`column` as a list of column names: None, one name or several."""
+    if column is None or isinstance(column, str):
+        return [column]
+    return list(column)
+
+
+def _iter_text(file, chunksize, n_columns=1):
+    """Yield float64 arrays from lines of comma- or whitespace-separated numbers, `n_columns` per line."""
+    while True:
+        lines = list(itertools.islice(file, chunksize))
+        if not lines:
+            break
+        values = np.array(' '.join(lines).replace(',', ' ').split(), dtype=np.float64)
+        if len(values) % n_columns:
+            raise ValueError(f"Expected {n_columns} numbers per reading, got {len(values)} numbers in total.")
+        if len(values):
+            yield values if n_columns == 1 else values.reshape(-1, n_columns)
+
+
+def iter_readings(source, column=None, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Yield chunks of readings from `source`.
+
+    `source` is either a data file (see `calibration.dataset`), in which case `column`
+    names the column holding the readings, a text file of numbers, or '-' for standard
+    input. With a list of several columns, chunks are (n, k) arrays of them, and text
+    input holds k numbers per line.
+    """
+    columns = _columns(column)
+    if source == '-':
+        yield from _iter_text(sys.stdin, chunksize, len(columns))
+        return
+    if os.path.splitext(source)[1].lower() in DATASET_FORMATS:
+        if columns == [None]:
+            if not source.lower().endswith('.npy'):
+                raise ValueError(f"Please name the column holding the readings in '{source}'.")
+            columns = ['0']
+        if None in columns:
+            raise ValueError(f"Please name every column holding the readings in '{source}'.")
+        for chunk in iter_dataset(source, columns, chunksize):
+            yield chunk[0] if len(chunk) == 1 else np.column_stack(chunk)
+        return
+    with open(source) as file:
+        yield from _iter_text(file, chunksize, len(columns))
+
+
+def iter_predictions(model, source, column=None, chunksize=DEFAULT_CHUNKSIZE):
+    """Yield (readings, predictions) pairs for each chunk of readings in `source`."""
+    for readings in iter_readings(source, column, chunksize):
+        yield readings, predict_array(model, readings)
+
+
+def write_predictions(model, source, output, column=None, chunksize=DEFAULT_CHUNKSIZE, header=True):
+    """
+    Stream predictions for the readings in `source` to the text stream `output` as CSV
+    rows of reading (one value per column) and predicted value. Returns the number of
+    readings converted.
+    """
+    columns = _columns(column)
+    if header:
+        output.write(','.join(name or 'reading' for name in columns) + ',prediction\n')
+    row = '%.10g,' * len(columns) + '%.10g\n'
+    count = 0
+    for readings, predictions in iter_predictions(model, source, column, chunksize):
+        # One %-format over the whole chunk is several times faster than np.savetxt's per-row loop
+        output.write((row * len(readings)) % tuple(np.column_stack([readings, predictions]).ravel()))
+        count += len(readings)
+    return count
@@ -0,0 +1,64 @@
+"""
+The regressors compared by multi_model_regressor.py.
+
+Each entry of REGRESSORS creates a fresh, unfitted estimator. The library providing it
+is imported when the estimator is created, so only the libraries of the regressors
+actually used need to be installed.
+"""
+
+import importlib
+from functools import partial
+
+
+def _create(module, class_name, **kwargs):
+    return getattr(importlib.import_module(module), class_name)(**kwargs)
+
+
+def _polynomial(degree):
+    from sklearn.linear_model import LinearRegression
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import PolynomialFeatures
+
+    return make_pipeline(PolynomialFeatures(degree=degree), LinearRegression())
+
+
+REGRESSORS = {
+    'Linear Regression': partial(_create, 'sklearn.linear_model', 'LinearRegression'),
+    'Ridge Regression': partial(_create, 'sklearn.linear_model', 'Ridge'),
+    'Lasso Regression': partial(_create, 'sklearn.linear_model', 'Lasso'),
+    'Elastic Net Regression': partial(_create, 'sklearn.linear_model', 'ElasticNet'),
+    '1st Degree Polynomial Regression': partial(_polynomial, 1),
+    '2nd Degree Polynomial Regression': partial(_polynomial, 2),
+    '3rd Degree Polynomial Regression': partial(_polynomial, 3),
+    '4th Degree Polynomial Regression': partial(_polynomial, 4),
+    'GAM': partial(_create, 'pygam', 'LinearGAM'),
+    'Random Forest': partial(_create, 'sklearn.ensemble', 'RandomForestRegressor', random_state=42),
+    'Gradient Boosting': partial(_create, 'sklearn.ensemble', 'GradientBoostingRegressor', random_state=42),
+    'XGBoost': partial(_create, 'xgboost', 'XGBRegressor', random_state=42),
+    'LightGBM': partial(_create, 'lightgbm', 'LGBMRegressor', random_state=42, verbose=-1),
+    'CatBoost': partial(_create, 'catboost', 'CatBoostRegressor', random_state=42, verbose=0,
+                        allow_writing_files=False),
+    'SVR': partial(_create, 'sklearn.svm', 'SVR'),
+    'KNN': partial(_create, 'sklearn.neighbors', 'KNeighborsRegressor'),
+    'Gaussian Processes': partial(_create, 'sklearn.gaussian_process', 'GaussianProcessRegressor', random_state=42),
+}
+
+
+# Regressors that are ordinary least-squares polynomials of the given degree, which
+# cross-validation scores in closed form instead of refitting them per fold
+POLYNOMIAL_DEGREES = {
+    'Linear Regression': 1,
+    '1st Degree Polynomial Regression': 1,
+    '2nd Degree Polynomial Regression': 2,
+    '3rd Degree Polynomial Regression': 3,
+    '4th Degree Polynomial Regression': 4,
+}
+
+
+def make_regressor(name):
+    """Create a fresh, unfitted estimator of the named regressor."""
+    try:
+        factory = REGRESSORS[name]
+    except KeyError:
+        raise ValueError(f"Unknown regressor '{name}'. Available regressors: {', '.join(REGRESSORS)}.") from None
+    return factory()
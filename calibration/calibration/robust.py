@@ -0,0 +1,206 @@
+"""
+Robust fitting of calibration models whose data contains a few bad readings.
+
+A gravimetric calibration log usually holds a point or two from a bumped probe or a
+scale glitch, and a single one of them skews a least-squares fit. Families mixing in
+RobustFit accept `robust='huber'`, `'tukey'` or `'ransac'`:
+
+- huber and tukey fit by iteratively reweighted least squares (IRLS): every iteration
+  standardizes the residuals of the current fit by their MAD scale,
+  s = 1.4826 * median(|r|), computes all weights at once with the loss' weight function
+  of u = r / (c * s), and refits by weighted least squares, until the fitted values
+  stop changing. Huber weights, min(1, 1 / |u|), down-weight large residuals; Tukey's
+  biweight, (1 - u^2)^2 for |u| < 1 and 0 beyond, rejects them. Tukey's loss is not
+  convex, so its iterations start from the Huber fit.
+- ransac fits random minimal subsets, keeps the fit with the largest consensus set of
+  points within c * s of it (s being the MAD scale of the least-squares residuals) and
+  refits on that set. The number of trials adapts to the inlier fraction found so far.
+
+Families that are linear in their coefficients set up their design matrix once, and
+each iteration solves the weighted normal equations in O(n p^2), a fraction of an
+ordinary fit, so a robust fit stays within a small factor of least squares. The fitted
+params gain 'robust_scale', the residual scale, and 'n_outliers', the number of points
+given weight zero (tukey, ransac) or down-weighted (huber).
+"""
+
+import warnings
+
+import numpy as np
+
+ROBUST_METHODS = ('huber', 'tukey', 'ransac')
+
+# Tuning constants c: 95% efficiency at the normal distribution for huber and tukey,
+# and the residual threshold of ransac, in units of the residual scale
+DEFAULT_TUNING = {'huber': 1.345, 'tukey': 4.685, 'ransac': 3.0}
+
+# Consistency factor making the MAD estimate the standard deviation of normal residuals
+_MAD_SCALE = 1.4826
+
+
+def robust_scale(residuals):
+    """Scale of regression residuals by their median absolute value, consistent with the standard deviation of normal errors."""
+    magnitude = np.abs(residuals[np.isfinite(residuals)])
+    if not len(magnitude):
+        return 0.0
+    return float(_MAD_SCALE * np.median(magnitude))
+
+
+def robust_weights(u, loss):
+    """IRLS weights of residuals `u` already divided by c times their scale; non-finite residuals get weight 0."""
+    magnitude = np.abs(u)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if loss == 'huber':
+            weights = np.minimum(1, 1 / magnitude)
+        elif loss == 'tukey':
+            weights = np.where(magnitude < 1, (1 - u * u)**2, 0)
+        else:
+            raise ValueError(f"Unknown robust loss '{loss}'. Available losses: huber, tukey.")
+    return np.where(np.isfinite(magnitude), weights, 0)
+
+
+def weighted_lstsq_solver(design, y):
+    """
+    Function solving the weighted least-squares problem of `design` and `y` for given
+    weights (None for all 1) by the normal equations. The columns are scaled once, which
+    keeps the normal equations well conditioned for a well-chosen basis.
+    """
+    scale = np.sqrt(np.mean(design**2, axis=0))
+    scale[scale == 0] = 1
+    design = design / scale
+
+    def solve(weights):
+        weighted = design if weights is None else design * weights[:, np.newaxis]
+        return np.linalg.solve(weighted.T @ design, weighted.T @ y) / scale
+
+    return solve
+
+
+class RobustFit:
+    """
+    Mixin giving a CalibrationModel family a robust fitting mode.
+
+    The family implements `_fit_weighted(x, y, weights)`, a least-squares fit with
+    `weights` multiplying the squared residuals (all 1 when None), and `n_params`, the
+    number of points in a minimal subset for ransac; its `_fit` is replaced by the
+    robust fit selected by `robust`. Families override `_weighted_solver` to reuse work
+    across the IRLS iterations. `tuning` overrides the tuning constant c, `max_iter`
+    bounds the IRLS iterations or ransac trials, and `seed` seeds the ransac subsets.
+    """
+
+    n_params = None
+
+    def _init_robust(self, robust=None, tuning=None, max_iter=None, seed=0):
+        if robust is not None and robust not in ROBUST_METHODS:
+            raise ValueError(f"Unknown robust method '{robust}'. Available methods: {', '.join(ROBUST_METHODS)}.")
+        self.robust = robust
+        self.tuning = float(tuning) if tuning is not None else None
+        self.max_iter = int(max_iter) if max_iter is not None else None
+        self.seed = seed
+
+    @property
+    def robust_config(self):
+        """The robust settings that differ from their defaults, for `config`."""
+        config = {}
+        if self.robust is not None:
+            config['robust'] = self.robust
+        if self.tuning is not None:
+            config['tuning'] = self.tuning
+        if self.max_iter is not None:
+            config['max_iter'] = self.max_iter
+        if self.seed != 0:
+            config['seed'] = self.seed
+        return config
+
+    def _weighted_solver(self, x, y):
+        """Function returning the params of the fit of (x, y) with the weights it is given."""
+        return lambda weights: self._fit_weighted(x, y, weights)
+
+    def _residuals(self, params, x, y):
+        self.params = params
+        return y - self._predict(x)
+
+    def _fit(self, x, y):
+        if self.robust is None:
+            return self._fit_weighted(x, y, None)
+        tuning = self.tuning if self.tuning is not None else DEFAULT_TUNING[self.robust]
+        if self.robust == 'ransac':
+            return self._fit_ransac(x, y, tuning)
+        return self._fit_irls(x, y, tuning)
+
+    def _irls(self, x, y, tuning, loss, weights=None, tol=1e-4):
+        """
+        IRLS from the fit with `weights`, until the fitted values move by less than tol
+        times the scale on average. Returns (params, weights, scale).
+        """
+        solve = self._weighted_solver(x, y)
+        params = solve(weights)
+        residuals = self._residuals(params, x, y)
+        weights = np.ones_like(y) if weights is None else weights
+        scale = 0.0
+        for _ in range(self.max_iter if self.max_iter is not None else 50):
+            scale = robust_scale(residuals)
+            if scale == 0:
+                # More than half the points fit exactly: the rest are all outliers
+                weights = (residuals == 0).astype(np.float64)
+                break
+            weights = robust_weights(residuals / (tuning * scale), loss)
+            params = solve(weights)
+            previous, residuals = residuals, self._residuals(params, x, y)
+            # The mean, as the fit at a few high-leverage outliers may settle slowly
+            if np.nanmean(np.abs(residuals - previous)) <= tol * scale:
+                break
+        return params, weights, scale
+
+    def _fit_irls(self, x, y, tuning, weights=None):
+        """IRLS fit, starting from the weighted fit with `weights` when given."""
+        if self.robust == 'tukey' and weights is None:
+            # Tukey's loss is not convex, so start from a rough Huber fit rather than least squares
+            _, weights, _ = self._irls(x, y, DEFAULT_TUNING['huber'], 'huber', tol=1e-2)
+        _, weights, scale = self._irls(x, y, tuning, self.robust, weights)
+        # The family's own weighted fit, starting from the IRLS params, gives the stored params
+        params = self._fit_weighted(x, y, weights)
+        params['robust_scale'] = scale
+        params['n_outliers'] = int(np.sum(weights < (1 if self.robust == 'huber' else np.finfo(float).eps)))
+        return params
+
+    def _fit_ransac(self, x, y, tuning, confidence=0.99):
+        n = len(x)
+        size = self.n_params
+        if n <= size:
+            raise ValueError(f"RANSAC needs more than {size} points to fit the {self.name} family, got {n}.")
+        scale = robust_scale(self._residuals(self._fit_weighted(x, y, None), x, y))
+        threshold = tuning * scale
+        rng = np.random.default_rng(self.seed)
+        best_params, best_inliers = None, None
+        best_count = 0
+        trials = self.max_iter if self.max_iter is not None else 1000
+        trial = 0
+        while trial < trials:
+            trial += 1
+            subset = rng.choice(n, size, replace=False)
+            try:
+                # Minimal subsets fit exactly, so rank and covariance warnings are expected
+                with np.errstate(all='ignore'), warnings.catch_warnings():
+                    warnings.simplefilter('ignore')
+                    params = self._fit_weighted(x[subset], y[subset], None)
+                    inliers = np.abs(self._residuals(params, x, y)) <= threshold
+            except (ValueError, RuntimeError, np.linalg.LinAlgError):
+                # A degenerate subset, e.g. repeated readings or a curve_fit failure
+                continue
+            count = int(inliers.sum())
+            if count > best_count:
+                best_params, best_inliers, best_count = params, inliers, count
+                # Trials needed to draw an all-inlier subset with the given confidence
+                fraction = count / n
+                if fraction >= 1:
+                    break
+                needed = np.log(1 - confidence) / np.log1p(-fraction**size) if fraction > 0 else np.inf
+                trials = min(trials, max(trial, int(np.ceil(needed))))
+        if best_inliers is None or best_count <= size:
+            raise ValueError(f"RANSAC found no consensus set of more than {size} points within {threshold:g} of a fit.")
+        # Refit on the consensus set, starting iterative fits from the best subset's fit
+        self.params = best_params
+        params = self._fit_weighted(x, y, best_inliers.astype(np.float64))
+        params['robust_scale'] = robust_scale(self._residuals(params, x, y)[best_inliers])
+        params['n_outliers'] = n - best_count
+        return params
@@ -0,0 +1,202 @@
+"""
+Least-squares linear (k=1) splines and the knot placement helpers used by the
+fit_lsq_spline_* scripts.
+
+`select_knots` chooses the number and positions of the knots by GCV or BIC. The hat
+functions of a linear spline overlap only their neighbours, so its normal equations are
+tridiagonal, and each interval's contribution to them is a combination of the interval's
+sums of 1, x, x^2, y, xy and y^2. With cumulative sums over the sorted data, refitting
+the spline for a new set of knots therefore costs O(knots) however long the data is.
+"""
+
+import numpy as np
+
+from .base import CalibrationModel, register_model
+
+# Criteria `select_knots` can minimize, as functions of (rss, n_samples, n_params)
+KNOT_CRITERIA = {
+    'gcv': lambda rss, n, p: n * rss / (n - p)**2,
+    'bic': lambda rss, n, p: n * np.log(rss / n) + p * np.log(n),
+}
+
+
+def sort_by_predictor(x, y):
+    """Sort both arrays by the predictor, as LSQUnivariateSpline requires."""
+    order = np.argsort(x, kind='stable')
+    return x[order], y[order]
+
+
+def estimate_curvature(x, y):
+    """Finite-difference estimate of the second derivative of sorted data."""
+    dy = np.diff(y) / np.diff(x)  # First derivative
+    ddy = np.diff(dy) / np.diff(x[:-1])  # Second derivative
+    return ddy
+
+
+def curvature_knots(x, y, threshold_std=2):
+    """Place knots where the estimated curvature exceeds `threshold_std` standard deviations."""
+    curvature = estimate_curvature(x, y)
+    curvature_threshold = np.std(curvature) * threshold_std
+
+    # +1 for the offset from np.diff
+    knot_indices = np.where(abs(curvature) > curvature_threshold)[0] + 1
+
+    # Ensure knots are within the interior of the data domain
+    knot_indices = knot_indices[(knot_indices > 0) & (knot_indices < len(x) - 1)]
+    return x[knot_indices]
+
+
+def validate_knots(x, knots):
+    """Keep the knots that are in the interior of sorted `x` with data on both sides."""
+    if not knots:
+        return []
+    valid_knots = []
+    for knot in knots:
+        if x[0] < knot < x[-1]:  # Check if knot is in the interior
+            idx = np.searchsorted(x, knot)
+            # Ensure at least two points in each segment for k=1
+            if idx > 0 and idx < len(x) - 1:
+                valid_knots.append(knot)
+    return sorted(valid_knots)
+
+
+class _KnotSearch:
+    """Least-squares linear splines of sorted data for any knot set, from cumulative sums."""
+
+    def __init__(self, x, y, min_points):
+        from scipy.linalg import solveh_banded
+
+        self.solve = solveh_banded
+        x, y = sort_by_predictor(np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64))
+        # Mapping x onto [0, 1] and centering y keeps the sums well conditioned
+        self.low, self.span = x[0], (x[-1] - x[0]) or 1.0
+        self.x = (x - self.low) / self.span
+        y = y - y.mean()
+        self.total_ss = float(y @ y)
+        sums = np.column_stack([np.ones_like(y), self.x, self.x * self.x, y, self.x * y])
+        self.cumulative = np.vstack([np.zeros(5), np.cumsum(sums, axis=0)])
+        self.min_points = min_points
+
+    def rss(self, interior):
+        """Residual sum of squares with the given sorted interior knots, or None if an interval has too few points."""
+        n = len(self.x)
+        bounds = np.concatenate([[0], np.searchsorted(self.x, interior), [n]])
+        if np.any(np.diff(bounds) < self.min_points):
+            return None
+        knots = np.concatenate([[0.0], interior, [1.0]])
+        s0, sx, sxx, sy, sxy = (self.cumulative[bounds[1:]] - self.cumulative[bounds[:-1]]).T
+        start, width = knots[:-1], np.diff(knots)
+
+        # Sums of u, u^2 and u*y over each interval, with u = (x - start) / width
+        su = (sx - start * s0) / width
+        suu = (sxx - 2 * start * sx + start * start * s0) / width**2
+        suy = (sxy - start * sy) / width
+
+        diagonal = np.zeros(len(knots))
+        diagonal[:-1] += s0 - 2 * su + suu
+        diagonal[1:] += suu
+        rhs = np.zeros(len(knots))
+        rhs[:-1] += sy - suy
+        rhs[1:] += suy
+        banded = np.vstack([np.concatenate([[0.0], su - suu]), diagonal])
+        try:
+            coefficients = self.solve(banded, rhs)
+        except np.linalg.LinAlgError:
+            return None
+        return max(self.total_ss - coefficients @ rhs, np.finfo(float).tiny)
+
+
+def select_knots(x, y, criterion='gcv', max_knots=20, n_candidates=100, min_points=3):
+    """
+    Choose interior knots for a linear spline by minimizing GCV or BIC.
+
+    Knots are inserted greedily, one at a time, from `n_candidates` quantiles of `x`,
+    up to `max_knots`, and the best set along the way is then pruned by greedily
+    removing knots while that improves the criterion. Every interval between knots keeps
+    at least `min_points` observations, so the spline is always well defined.
+    """
+    try:
+        score = KNOT_CRITERIA[criterion]
+    except KeyError:
+        raise ValueError(f"Unknown knot criterion '{criterion}'. Available criteria: {', '.join(KNOT_CRITERIA)}.") from None
+    search = _KnotSearch(x, y, min_points)
+    n = len(search.x)
+
+    def evaluate(knots):
+        n_params = len(knots) + 2
+        if n_params >= n:
+            return np.inf
+        rss = search.rss(np.array(knots))
+        return np.inf if rss is None else score(rss, n, n_params)
+
+    candidates = np.unique(np.quantile(search.x, np.linspace(0, 1, n_candidates + 2)[1:-1]))
+    candidates = candidates[(candidates > 0) & (candidates < 1)]
+
+    # Forward insertion, remembering the best knot set seen
+    knots = []
+    best_knots, best_score = [], evaluate([])
+    while len(knots) < max_knots:
+        trials = [(evaluate(sorted(knots + [candidate])), candidate) for candidate in candidates if candidate not in knots]
+        trial_score, candidate = min(trials, default=(np.inf, None), key=lambda trial: trial[0])
+        if not np.isfinite(trial_score):
+            break
+        knots = sorted(knots + [candidate])
+        if trial_score < best_score:
+            best_knots, best_score = knots, trial_score
+
+    # Backward removal from the best set
+    knots = best_knots
+    while knots:
+        trial_score, i = min((evaluate(knots[:i] + knots[i + 1:]), i) for i in range(len(knots)))
+        if trial_score >= best_score:
+            break
+        knots, best_score = knots[:i] + knots[i + 1:], trial_score
+
+    return search.low + np.array(knots) * search.span
+
+
+@register_model
+class LinearSplineModel(CalibrationModel):
+    """
+    Least-squares linear spline with the given interior knots.
+
+    A k=1 B-spline's coefficients are its values at the knots, so the fitted model is
+    stored as the knot positions (including both ends of the data range) and the
+    spline's value at each of them.
+    """
+
+    name = 'spline'
+
+    def __init__(self, knots=()):
+        super().__init__()
+        self.knots = [float(knot) for knot in knots]
+
+    @property
+    def config(self):
+        return {'knots': self.knots}
+
+    def _fit(self, x, y):
+        from scipy.interpolate import LSQUnivariateSpline
+
+        x, y = sort_by_predictor(x, y)
+        spline = LSQUnivariateSpline(x, y, t=self.knots, k=1)
+        return {'knots': spline.get_knots(), 'values': spline.get_coeffs()}
+
+    def segment_coefficients(self):
+        """
+        Slopes and intercepts of the spline's linear pieces, one per interval between
+        consecutive knots, read directly off the knots and knot values.
+        """
+        knots, values = self.params['knots'], self.params['values']
+        slopes = np.diff(values) / np.diff(knots)
+        return slopes, values[:-1] - slopes * knots[:-1]
+
+    def segment_index(self, x):
+        """Index of the linear piece each reading in `x` falls into; the end pieces extend beyond the data."""
+        interior = self.params['knots'][1:-1]
+        return np.searchsorted(interior, np.asarray(x, dtype=np.float64), side='right')
+
+    def _predict(self, x):
+        slopes, intercepts = self.segment_coefficients()
+        segment = self.segment_index(x)
+        return slopes[segment] * x + intercepts[segment]
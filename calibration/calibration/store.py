@@ -0,0 +1,220 @@
+"""
+Append-only store of raw sensor time series with min/mean/max rollups.
+
+Each series is named like the MQTT topic its readings arrive on, e.g.
+`soil/thcs1/moisture`, and kept in a directory of that path under the store's root:
+
+    <root>/soil/thcs1/moisture/_raw/2026-10-17.bin    (time, value) records of one UTC day
+    <root>/soil/thcs1/moisture/_1m.bin                 one record per closed minute
+    <root>/soil/thcs1/moisture/_1h.bin                 ... hour
+    <root>/soil/thcs1/moisture/_1d.bin                 ... day
+
+Records are fixed-size little-endian float64 structs without a header, so appending is
+a plain file append and reads memory-map the files and select a time range by binary
+search. Times are POSIX seconds and must not decrease within a series.
+
+Rollups are built incrementally while appending: the bucket holding a series' latest
+reading stays open in memory and is written once a later reading closes it. Queries
+include the open bucket, and a reopened store recovers it from the last day file (every
+bucket lies within one day). Non-finite readings are stored raw but left out of the
+rollups. A store has a single writer; any number of processes may read it.
+"""
+
+import datetime
+import os
+import re
+
+import numpy as np
+
+RAW_DTYPE = np.dtype([('time', '<f8'), ('value', '<f8')])
+ROLLUP_DTYPE = np.dtype([('time', '<f8'), ('count', '<i8'), ('min', '<f8'), ('mean', '<f8'), ('max', '<f8')])
+
+# Rollup resolutions and their bucket widths in seconds
+RESOLUTIONS = {'1m': 60, '1h': 3600, '1d': 86400}
+
+DAY = 86400
+
+_SEGMENT = re.compile(r'[A-Za-z0-9][A-Za-z0-9_.-]*$')
+
+
+def _day_name(day):
+    return datetime.datetime.fromtimestamp(day * DAY, datetime.timezone.utc).strftime('%Y-%m-%d')
+
+
+def _aggregate(times, values, width):
+    """(bucket, count, min, sum, max) arrays of the buckets of sorted finite readings."""
+    buckets = np.floor(times / width) * width
+    starts = np.flatnonzero(np.concatenate([[True], buckets[1:] != buckets[:-1]]))
+    counts = np.diff(np.append(starts, len(times)))
+    return (buckets[starts], counts, np.minimum.reduceat(values, starts), np.add.reduceat(values, starts),
+            np.maximum.reduceat(values, starts))
+
+
+def _rollup_records(buckets, counts, minimums, sums, maximums):
+    records = np.empty(len(buckets), dtype=ROLLUP_DTYPE)
+    records['time'] = buckets
+    records['count'] = counts
+    records['min'] = minimums
+    records['mean'] = sums / counts
+    records['max'] = maximums
+    return records
+
+
+def _memmap(path, dtype):
+    """Read-only memory map of a record file, or an empty array when it is missing or empty."""
+    try:
+        if os.path.getsize(path) >= dtype.itemsize:
+            return np.memmap(path, dtype=dtype, mode='r', shape=(os.path.getsize(path) // dtype.itemsize,))
+    except FileNotFoundError:
+        pass
+    return np.empty(0, dtype=dtype)
+
+
+def _time_slice(records, start, stop):
+    """Records with start <= time < stop; the records are sorted by time."""
+    low = 0 if start is None else np.searchsorted(records['time'], start, side='left')
+    high = len(records) if stop is None else np.searchsorted(records['time'], stop, side='left')
+    return records[low:high]
+
+
+class _Series:
+    """Write state of one series: its last time and open rollup buckets as [bucket, count, min, sum, max]."""
+
+    def __init__(self, path):
+        self.path = path
+        self.last_time = -np.inf
+        self.open = {}
+        raw = os.path.join(path, '_raw')
+        days = sorted(name[:-4] for name in os.listdir(raw) if name.endswith('.bin')) if os.path.isdir(raw) else []
+        if not days:
+            return
+        records = _memmap(os.path.join(raw, f'{days[-1]}.bin'), RAW_DTYPE)
+        if not len(records):
+            return
+        self.last_time = float(records['time'][-1])
+        finite = records[np.isfinite(records['value'])]
+        for resolution, width in RESOLUTIONS.items():
+            bucket = np.floor(self.last_time / width) * width
+            in_bucket = finite['value'][finite['time'] >= bucket]
+            if len(in_bucket):
+                self.open[resolution] = [bucket, len(in_bucket), in_bucket.min(), in_bucket.sum(), in_bucket.max()]
+
+
+class SeriesStore:
+    """Append-only store of raw time series under the directory `root`, with 1m/1h/1d rollups."""
+
+    def __init__(self, root):
+        self.root = root
+        self._series = {}
+
+    def _path(self, series):
+        segments = series.strip('/').split('/')
+        if not all(_SEGMENT.match(segment) for segment in segments):
+            raise ValueError(f"Invalid series name '{series}': use /-separated names of letters, digits, '_', '.' and '-'.")
+        return os.path.join(self.root, *segments)
+
+    def _state(self, series):
+        try:
+            return self._series[series]
+        except KeyError:
+            state = self._series[series] = _Series(self._path(series))
+            return state
+
+    def series(self):
+        """Names of the series in the store."""
+        names = []
+        for directory, subdirectories, _ in os.walk(self.root):
+            if '_raw' in subdirectories:
+                names.append(os.path.relpath(directory, self.root).replace(os.sep, '/'))
+            subdirectories[:] = [name for name in subdirectories if not name.startswith('_')]
+        return sorted(names)
+
+    def append(self, series, times, values):
+        """Append readings to a series. Their times must be finite and not precede the series' latest reading."""
+        times = np.asarray(times, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)
+        if times.shape != values.shape or times.ndim != 1:
+            raise ValueError("Times and values must be 1-D arrays of the same length.")
+        if not len(times):
+            return
+        if not np.isfinite(times).all():
+            raise ValueError(f"Readings of '{series}' have {np.count_nonzero(~np.isfinite(times))} non-finite times.")
+        order = np.argsort(times, kind='stable')
+        times, values = times[order], values[order]
+        state = self._state(series)
+        if times[0] < state.last_time:
+            raise ValueError(f"Readings of '{series}' from {times[0]:.3f} precede its latest stored reading at {state.last_time:.3f}.")
+
+        # Raw records, split at day boundaries
+        os.makedirs(os.path.join(state.path, '_raw'), exist_ok=True)
+        records = np.empty(len(times), dtype=RAW_DTYPE)
+        records['time'] = times
+        records['value'] = values
+        days = np.floor(times / DAY).astype(np.int64)
+        bounds = np.flatnonzero(np.diff(days)) + 1
+        for start, stop in zip(np.concatenate([[0], bounds]), np.concatenate([bounds, [len(times)]])):
+            with open(os.path.join(state.path, '_raw', f'{_day_name(days[start])}.bin'), 'ab') as file:
+                file.write(records[start:stop].tobytes())
+        state.last_time = float(times[-1])
+
+        # Merge the readings into the open buckets and write the buckets they close
+        finite = np.isfinite(values)
+        if not finite.any():
+            return
+        for resolution, width in RESOLUTIONS.items():
+            buckets, counts, minimums, sums, maximums = _aggregate(times[finite], values[finite], width)
+            current = state.open.get(resolution)
+            if current is not None and current[0] == buckets[0]:
+                counts[0] += current[1]
+                minimums[0] = min(minimums[0], current[2])
+                sums[0] += current[3]
+                maximums[0] = max(maximums[0], current[4])
+            elif current is not None:
+                buckets, counts, minimums, sums, maximums = (np.insert(array, 0, value) for array, value in
+                                                             zip((buckets, counts, minimums, sums, maximums), current))
+            if len(buckets) > 1:
+                with open(os.path.join(state.path, f'_{resolution}.bin'), 'ab') as file:
+                    file.write(_rollup_records(buckets[:-1], counts[:-1], minimums[:-1], sums[:-1], maximums[:-1]).tobytes())
+            state.open[resolution] = [buckets[-1], counts[-1], minimums[-1], sums[-1], maximums[-1]]
+
+    def append_many(self, series, times, values):
+        """Append readings of several series, given as one series name per reading."""
+        groups = {}
+        for i, name in enumerate(series):
+            groups.setdefault(name, []).append(i)
+        times = np.asarray(times, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)
+        for name, indices in groups.items():
+            self.append(name, times[indices], values[indices])
+
+    def iter_raw(self, series, start=None, stop=None):
+        """Yield memory-mapped (time, value) record arrays of a series with start <= time < stop, one per day."""
+        raw = os.path.join(self._path(series), '_raw')
+        if not os.path.isdir(raw):
+            return
+        # ISO dates sort as strings
+        first = '' if start is None else _day_name(np.floor(start / DAY))
+        last = '~' if stop is None else _day_name(np.floor(stop / DAY))
+        for name in sorted(name[:-4] for name in os.listdir(raw) if name.endswith('.bin')):
+            if first <= name <= last:
+                records = _time_slice(_memmap(os.path.join(raw, f'{name}.bin'), RAW_DTYPE), start, stop)
+                if len(records):
+                    yield records
+
+    def read(self, series, start=None, stop=None, resolution=None):
+        """
+        Records of a series with start <= time < stop: raw (time, value) records, or
+        (time, count, min, mean, max) rollup records at `resolution` ('1m', '1h' or '1d').
+        """
+        if resolution is None:
+            chunks = list(self.iter_raw(series, start, stop))
+            return np.concatenate(chunks) if chunks else np.empty(0, dtype=RAW_DTYPE)
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Unknown resolution '{resolution}'. Available resolutions: {', '.join(RESOLUTIONS)}.")
+        records = _time_slice(_memmap(os.path.join(self._path(series), f'_{resolution}.bin'), ROLLUP_DTYPE), start, stop)
+        # The open bucket, kept by this store when it is the writer and recovered from disk otherwise
+        state = self._series.get(series) or _Series(self._path(series))
+        bucket = state.open.get(resolution)
+        if bucket is not None and (start is None or bucket[0] >= start) and (stop is None or bucket[0] < stop):
+            records = np.concatenate([records, _rollup_records(*(np.array([value]) for value in bucket))])
+        return np.asarray(records)
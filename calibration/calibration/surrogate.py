@@ -0,0 +1,180 @@
+"""
+Compiling expensive models into fast surrogates.
+
+Random forests, GAMs, gradient-boosted trees and Gaussian processes cost far too much
+per call to convert every reading of an ingest stream. A surrogate samples such a model
+over the sensor's valid range of readings once and replaces it with one of:
+
+- 'linear': a piecewise-linear interpolant whose breakpoints are refined adaptively,
+  splitting only the intervals where the interpolant misses the model by more than the
+  tolerance, at a few points of each interval or on the validation grid;
+- 'chebyshev': a Chebyshev interpolant whose degree is doubled until it meets the
+  tolerance, for smooth models.
+
+The surrogate is itself a CalibrationModel ('surrogate'), so it is saved as a small JSON
+artifact and used anywhere a fitted model is. Readings outside the compiled range are
+clamped to it. Compiling returns a SurrogateReport with the worst deviation from the
+original model found on a validation grid much denser than the surrogate's own samples.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from .base import CalibrationModel, register_model
+
+SURROGATE_METHODS = ('linear', 'chebyshev')
+
+# Largest number of breakpoints of a linear surrogate, and largest Chebyshev degree
+MAX_POINTS = 65536
+MAX_DEGREE = 512
+
+# Fractions of each interval at which a linear surrogate is checked while refining (the
+# thirds being where compile_surrogate validates it), and at which failing intervals are split
+_CHECK_FRACTIONS = np.array([1 / 4, 1 / 3, 1 / 2, 2 / 3, 3 / 4])
+_SPLIT_FRACTIONS = np.array([1 / 4, 1 / 2, 3 / 4])
+
+# max_error is the largest deviation found on the validation grid, at reading `at`
+SurrogateReport = namedtuple('SurrogateReport', ['method', 'size', 'max_error', 'at', 'tolerance', 'converged'])
+
+
+def _predict_function(model):
+    """A function of a 1-D reading array for a CalibrationModel, an estimator with predict() or a plain function."""
+    if isinstance(model, CalibrationModel):
+        return model.predict
+    if hasattr(model, 'predict'):
+        return lambda x: np.asarray(model.predict(x.reshape(-1, 1)), dtype=np.float64).ravel()
+    return lambda x: np.asarray(model(x), dtype=np.float64)
+
+
+@register_model
+class SurrogateModel(CalibrationModel):
+    """
+    Piecewise-linear or Chebyshev approximation of another model over a fixed range.
+
+    Created by `compile_surrogate` rather than fitted to data. Linear surrogates store
+    `params['knots']` and `params['values']`; Chebyshev surrogates store
+    `params['coefficients']` and `params['domain']`.
+    """
+
+    name = 'surrogate'
+
+    def __init__(self, method='linear'):
+        super().__init__()
+        if method not in SURROGATE_METHODS:
+            raise ValueError(f"Unknown surrogate method '{method}'. Available methods: {', '.join(SURROGATE_METHODS)}.")
+        self.method = method
+
+    @property
+    def config(self):
+        return {'method': self.method}
+
+    def _fit(self, x, y):
+        raise TypeError("Surrogates are compiled from a fitted model with compile_surrogate, not fitted to data.")
+
+    def evaluate(self, x):
+        """Vectorized evaluation of a float64 array, skipping predict()'s checks."""
+        if self.method == 'linear':
+            return np.interp(x, self.params['knots'], self.params['values'])
+        low, high = self.params['domain']
+        t = (2 * np.clip(x, low, high) - (low + high)) / (high - low)
+        return np.polynomial.chebyshev.chebval(t, self.params['coefficients'])
+
+    def _predict(self, x):
+        return self.evaluate(x)
+
+
+def _compile_linear(function, low, high, tolerance, max_points, validation):
+    """
+    Refine a linear surrogate until it meets `tolerance` at the check points of every
+    interval and on the `validation` grid. Returns (knots, values, converged).
+    """
+    knots = np.linspace(low, high, 17)
+    values = function(knots)
+    expected = function(validation)
+    while True:
+        # Check every interval at interior points, in one call of the model
+        width = np.diff(knots)
+        check = knots[:-1, np.newaxis] + width[:, np.newaxis] * _CHECK_FRACTIONS
+        check_values = function(check.ravel()).reshape(check.shape)
+        interpolated = values[:-1, np.newaxis] + (values[1:] - values[:-1])[:, np.newaxis] * _CHECK_FRACTIONS
+        failing = np.abs(check_values - interpolated).max(axis=1) > tolerance
+        if not failing.any():
+            # The check points can all pass while the interpolant misses the model elsewhere
+            # in an interval, so the intervals holding failing validation points fail too
+            missed = validation[np.abs(np.interp(validation, knots, values) - expected) > tolerance]
+            failing[np.clip(np.searchsorted(knots, missed, side='right') - 1, 0, len(width) - 1)] = True
+        # Jumps (e.g. between the leaves of a tree model) can never be interpolated within
+        # tolerance, so intervals stop being split at a millionth of the range
+        failing &= width > (high - low) * 1e-6
+        if not failing.any() or len(knots) + len(_SPLIT_FRACTIONS) * failing.sum() > max_points:
+            return knots, values, not failing.any()
+        # Failing intervals are split into quarters at their check points
+        splits = np.isin(_CHECK_FRACTIONS, _SPLIT_FRACTIONS)
+        knots = np.concatenate([knots, check[failing][:, splits].ravel()])
+        values = np.concatenate([values, check_values[failing][:, splits].ravel()])
+        order = np.argsort(knots, kind='stable')
+        knots, values = knots[order], values[order]
+
+
+def _compile_chebyshev(function, low, high, tolerance, max_degree):
+    check = np.linspace(low, high, 4 * max_degree + 1)
+    expected = function(check)
+    t = (2 * check - (low + high)) / (high - low)
+    degree = 8
+    while True:
+        coefficients = np.polynomial.chebyshev.chebinterpolate(
+            lambda u: function((u * (high - low) + (low + high)) / 2), degree)
+        error = np.max(np.abs(np.polynomial.chebyshev.chebval(t, coefficients) - expected))
+        if error <= tolerance or degree >= max_degree:
+            return coefficients, error <= tolerance
+        degree = min(2 * degree, max_degree)
+
+
+def compile_surrogate(model, x_range, tolerance=0.01, method='linear', max_points=MAX_POINTS, max_degree=MAX_DEGREE,
+                      validation_points=100_001):
+    """
+    Compile `model` into a SurrogateModel over `x_range` = (low, high), returning
+    (surrogate, report).
+
+    `model` is a CalibrationModel, an estimator with a scikit-learn style predict(), or
+    a function of a reading array. The surrogate aims to stay within `tolerance` of it;
+    the report gives the worst deviation on a uniform grid of `validation_points`
+    readings plus points between every pair of a linear surrogate's breakpoints, and
+    whether the tolerance was met before `max_points` or `max_degree` was reached.
+    """
+    if method not in SURROGATE_METHODS:
+        raise ValueError(f"Unknown surrogate method '{method}'. Available methods: {', '.join(SURROGATE_METHODS)}.")
+    low, high = map(float, x_range)
+    if not high > low:
+        raise ValueError(f"Invalid range {low:g}..{high:g} for a surrogate.")
+    if isinstance(model, CalibrationModel) and model.n_features > 1:
+        raise ValueError(f"The {model.name} model takes {model.n_features} predictor columns; "
+                         "only models of a single reading can be compiled into a surrogate.")
+    function = _predict_function(model)
+
+    surrogate = SurrogateModel(method)
+    validation = np.linspace(low, high, validation_points)
+    if method == 'linear':
+        knots, values, converged = _compile_linear(function, low, high, tolerance, max_points, validation)
+        surrogate.params = {'knots': knots, 'values': values}
+        size = len(knots)
+        between = knots[:-1] + np.diff(knots) * (1 / 3)
+        validation = np.concatenate([validation, between, between + np.diff(knots) / 3])
+    else:
+        coefficients, converged = _compile_chebyshev(function, low, high, tolerance, max_degree)
+        surrogate.params = {'coefficients': coefficients, 'domain': np.array([low, high])}
+        size = len(coefficients)
+
+    deviation = np.abs(surrogate.evaluate(validation) - function(validation))
+    worst = int(np.argmax(deviation))
+    report = SurrogateReport(method, size, float(deviation[worst]), float(validation[worst]), tolerance,
+                             bool(converged and deviation[worst] <= tolerance))
+    return surrogate, report
+
+
+def format_report(report):
+    size = f"{report.size} breakpoints" if report.method == 'linear' else f"{report.size} Chebyshev coefficients"
+    status = 'meets' if report.converged else 'does NOT meet'
+    return (f"{report.method} surrogate with {size}: maximum deviation {report.max_error:.6g} at {report.at:.6g}, "
+            f"{status} the tolerance {report.tolerance:g}")
@@ -0,0 +1,192 @@
+"""
+Synthetic calibration data following the physics of a THC-S probe in coco coir.
+
+SensorSimulator produces a logged time series of readings, one row every `interval`
+seconds, by chaining the relations the calibration scripts fit:
+
+- the true VWC follows irrigation cycles: saturated at each irrigation, then drying
+  towards a random depth until the next one;
+- the temperature follows a daily cycle;
+- the bulk permittivity is the Topp cubic of the VWC, with the water's share of it
+  scaled by the permittivity of water at the temperature;
+- the bulk EC follows the Hilhorst relation from the permittivity, with a pore-water EC
+  that grows as salt builds up;
+- the raw reading is the humidity value for which the firmware's permittivity
+  polynomial gives that permittivity.
+
+Noise, a slow drift of the raw reading (compaction) and outliers (a bumped probe, a
+scale glitch) are added on top. The columns use the variable names of the .env file,
+so every fitting script reads the output with `--data`.
+
+Rows are computed in fixed-size blocks with their own random streams, so the data
+depends only on the seed, however many rows are generated at a time, and millions of
+rows are written in seconds to any dataset format.
+"""
+
+import os
+
+import numpy as np
+
+from .dataset import DEFAULT_CHUNKSIZE
+from .hilhorst import COCO_COIR_ESB_0, THCS_PERMITTIVITY_COEFFICIENTS, pore_water_permittivity
+
+# Topp et al. (1980): bulk permittivity from VWC (as a fraction), lowest degree first
+TOPP_COEFFICIENTS = (3.03, 9.3, 146.0, -76.7)
+
+SYNTHETIC_COLUMNS = ('time', 'RAW', 'VWC', 'HUMIDITY_VALS', 'VWC_VALS', 'DP_VALS', 'BULK_EC', 'TEMPERATURE',
+                     'PORE_WATER_EC')
+
+SYNTHETIC_FORMATS = ('.npy', '.npz', '.csv', '.parquet', '.env')
+
+# Rows per block of random numbers
+_BLOCK = 1 << 16
+
+
+class SensorSimulator:
+    """
+    Simulated THC-S probe in coco coir.
+
+    Water content: irrigated every `period` seconds to `vwc_saturated`, drying to a
+    random VWC between `vwc_dry` and half-way to saturation (fractions). Temperature:
+    `temperature` +- `temperature_swing` degrees C over a day. Salinity: pore-water EC
+    `pore_water_ec` rising by `salt_buildup` per day, with permittivity at zero bulk EC
+    `esb_0`. Sensor: Gaussian noise of `noise` on the raw reading (and proportionally on
+    temperature and EC), the reference VWC measured with noise `reference_noise` (in
+    VWC percent), the raw reading drifting by `drift` per day, and a fraction
+    `outliers` of raw readings off by `outlier_scale` on average.
+    """
+
+    def __init__(self, seed=0, start=1767225600.0, interval=600.0, period=2 * 86400.0, vwc_dry=0.08,
+                 vwc_saturated=0.55, temperature=22.0, temperature_swing=4.0, pore_water_ec=2000.0, salt_buildup=5.0,
+                 esb_0=COCO_COIR_ESB_0, noise=0.3, reference_noise=0.5, drift=0.0, outliers=0.0, outlier_scale=15.0):
+        self.seed = seed
+        self.start = start
+        self.interval = interval
+        self.period = period
+        self.vwc_dry = vwc_dry
+        self.vwc_saturated = vwc_saturated
+        self.temperature = temperature
+        self.temperature_swing = temperature_swing
+        self.pore_water_ec = pore_water_ec
+        self.salt_buildup = salt_buildup
+        self.esb_0 = esb_0
+        self.noise = noise
+        self.reference_noise = reference_noise
+        self.drift = drift
+        self.outliers = outliers
+        self.outlier_scale = outlier_scale
+
+    def _cycle_depths(self, cycles):
+        """VWC each irrigation cycle dries down to, drawn per cycle from its own stream."""
+        depths = np.empty(len(cycles))
+        for i, cycle in enumerate(cycles):
+            rng = np.random.default_rng([self.seed, 1, int(cycle)])
+            depths[i] = rng.uniform(self.vwc_dry, (self.vwc_dry + self.vwc_saturated) / 2)
+        return depths
+
+    def _noise(self, start, stop):
+        """Standard normal noise columns and outlier draws of rows [start, stop)."""
+        blocks = range(start // _BLOCK, (stop - 1) // _BLOCK + 1)
+        draws = []
+        for block in blocks:
+            rng = np.random.default_rng([self.seed, 0, block])
+            draws.append(np.vstack([rng.standard_normal((5, _BLOCK)), rng.random((1, _BLOCK))]))
+        draws = np.hstack(draws)
+        offset = start - blocks[0] * _BLOCK
+        return draws[:, offset:offset + stop - start]
+
+    def rows(self, start, stop):
+        """Columns of rows [start, stop) as a dict of float64 arrays."""
+        index = np.arange(start, stop, dtype=np.float64)
+        time = self.start + index * self.interval
+        days = (time - self.start) / 86400
+        normal_raw, normal_temperature, normal_ec, normal_reference, normal_outlier, uniform = self._noise(start, stop)
+
+        # Irrigation cycles: saturated at the start, drying fastest at first
+        cycle, phase = np.divmod(time - self.start, self.period)
+        unique_cycles, inverse = np.unique(cycle, return_inverse=True)
+        depth = self._cycle_depths(unique_cycles)[inverse]
+        vwc = self.vwc_saturated - (self.vwc_saturated - depth) * (phase / self.period)**0.6
+
+        # Daily temperature cycle, warmest in the afternoon
+        temperature = (self.temperature + self.temperature_swing * np.sin(2 * np.pi * (days % 1 - 0.375))
+                       + 0.1 * normal_temperature)
+
+        # Topp permittivity, with the water's contribution following its temperature dependence
+        topp = np.polynomial.polynomial.polyval(vwc, TOPP_COEFFICIENTS)
+        permittivity = TOPP_COEFFICIENTS[0] + (topp - TOPP_COEFFICIENTS[0]) * (
+            pore_water_permittivity(temperature) / pore_water_permittivity(20))
+
+        # Hilhorst: bulk EC from the permittivity and the pore-water EC
+        pore_water_ec = self.pore_water_ec + self.salt_buildup * days
+        bulk_ec = np.maximum(permittivity - self.esb_0, 0) * pore_water_ec / pore_water_permittivity(temperature)
+        bulk_ec *= 1 + 0.01 * self.noise * normal_ec
+
+        # Raw reading: invert the firmware's quadratic permittivity polynomial
+        c0, c1, c2 = THCS_PERMITTIVITY_COEFFICIENTS
+        raw = (-c1 + np.sqrt(c1 * c1 + 4 * c2 * np.maximum(permittivity - c0, 0))) / (2 * c2)
+        raw += self.drift * days + self.noise * normal_raw
+        bumped = uniform < self.outliers
+        raw[bumped] += self.outlier_scale * normal_outlier[bumped]
+        raw = np.maximum(raw, 0)
+
+        reference = np.clip(100 * vwc + self.reference_noise * normal_reference, 0, 100)
+        return {'time': time, 'RAW': raw, 'VWC': reference, 'HUMIDITY_VALS': raw, 'VWC_VALS': reference / 100,
+                'DP_VALS': permittivity, 'BULK_EC': bulk_ec, 'TEMPERATURE': temperature, 'PORE_WATER_EC': pore_water_ec}
+
+    def iter_chunks(self, n, chunksize=DEFAULT_CHUNKSIZE):
+        """Yield the columns of rows [0, n) in chunks of at most `chunksize` rows."""
+        for start in range(0, n, chunksize):
+            yield self.rows(start, min(start + chunksize, n))
+
+
+def _write_env(path, columns, names):
+    with open(path, 'w') as file:
+        for name in names:
+            format_ = '%.13g' if name == 'time' else '%.7g'
+            file.write(f"{name}={','.join(format_ % value for value in columns[name])}\n")
+
+
+def write_synthetic(path, n, simulator=None, columns=SYNTHETIC_COLUMNS, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Write `n` simulated rows to `path` as .npy (a structured array), .npz, .csv, .parquet
+    or .env, chosen by its extension. Returns the number of rows written.
+    """
+    simulator = simulator or SensorSimulator()
+    columns = list(columns)
+    extension = os.path.splitext(path)[1].lower() or os.path.basename(path).lower()
+    if extension not in SYNTHETIC_FORMATS:
+        raise ValueError(f"Cannot write '{path}': unsupported format. Supported formats: {', '.join(SYNTHETIC_FORMATS)}.")
+
+    if extension in ('.npz', '.env'):
+        data = simulator.rows(0, n)
+        if extension == '.npz':
+            np.savez(path, **{name: data[name] for name in columns})
+        else:
+            _write_env(path, data, columns)
+        return n
+
+    if extension == '.npy':
+        array = np.lib.format.open_memmap(path, mode='w+', dtype=[(name, '<f8') for name in columns], shape=(n,))
+        for start, chunk in zip(range(0, n, chunksize), simulator.iter_chunks(n, chunksize)):
+            for name in columns:
+                array[name][start:start + len(chunk[name])] = chunk[name]
+        array.flush()
+        return n
+
+    if extension == '.csv':
+        with open(path, 'w') as file:
+            file.write(','.join(columns) + '\n')
+            for chunk in simulator.iter_chunks(n, chunksize):
+                # Times keep millisecond resolution, other columns 7 significant digits
+                row = ','.join('%.13g' if name == 'time' else '%.7g' for name in columns) + '\n'
+                file.write((row * len(chunk['time'])) % tuple(np.column_stack([chunk[name] for name in columns]).ravel()))
+        return n
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    with pq.ParquetWriter(path, pa.schema([(name, pa.float64()) for name in columns])) as writer:
+        for chunk in simulator.iter_chunks(n, chunksize):
+            writer.write_table(pa.table({name: chunk[name] for name in columns}))
+    return n
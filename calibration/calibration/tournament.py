@@ -0,0 +1,122 @@
+"""
+Scoring the regressors of multi_model_regressor.py, optionally in parallel.
+
+Each regressor is scored by an `evaluate(name, *args)` function: `fit_and_score` for a
+single train/test split, or `calibration.crossval.cross_validate_regressor` for
+cross-validation.
+
+In parallel mode each regressor is fitted in its own worker process, at most `workers`
+at a time. A regressor that raises, crashes its worker or runs past `timeout` seconds
+is reported and skipped; a timed-out worker is killed. Results are yielded as soon as
+each regressor finishes, so the fast models are ranked first.
+"""
+
+import multiprocessing
+import time
+from collections import namedtuple
+from multiprocessing.connection import wait
+
+import numpy as np
+
+from .metrics import mse
+from .regressors import POLYNOMIAL_DEGREES, make_regressor
+
+# status is 'ok', 'failed' or 'timeout'; score is what `evaluate` returned, or None unless status is 'ok'
+TournamentResult = namedtuple('TournamentResult', ['name', 'status', 'score', 'elapsed', 'error'])
+
+
+def fit_and_score(name, X_train, y_train, X_test, y_test, features=None):
+    """
+    Fit the named regressor and return its test MSE.
+
+    `features` optionally is a (train, test) pair of calibration.features.PolynomialFeatures
+    of `X_train` and `X_test`, shared by all regressors: the polynomial regressors are
+    then fitted by least squares on them instead of building their own.
+    """
+    if features is not None and name in POLYNOMIAL_DEGREES:
+        degree = POLYNOMIAL_DEGREES[name]
+        train, test = features
+        coefficients = np.linalg.lstsq(train.design(degree), y_train, rcond=None)[0]
+        return mse(y_test, test.design(degree) @ coefficients)
+    model = make_regressor(name)
+    model.fit(X_train, y_train)
+    return mse(y_test, model.predict(X_test))
+
+
+def _run_one(name, evaluate, args):
+    start = time.perf_counter()
+    try:
+        return TournamentResult(name, 'ok', evaluate(name, *args), time.perf_counter() - start, None)
+    except Exception as error:
+        return TournamentResult(name, 'failed', None, time.perf_counter() - start, f"{type(error).__name__}: {error}")
+
+
+def _worker(connection, name, evaluate, args):
+    try:
+        connection.send(_run_one(name, evaluate, args))
+    finally:
+        connection.close()
+
+
+def _run_parallel(names, evaluate, args, workers, timeout):
+    context = multiprocessing.get_context()
+    pending = list(names)
+    running = {}  # receiving connection -> (process, name, start time)
+    try:
+        while pending or running:
+            while pending and len(running) < workers:
+                name = pending.pop(0)
+                receiver, sender = context.Pipe(duplex=False)
+                process = context.Process(target=_worker, args=(sender, name, evaluate, args), daemon=True)
+                process.start()
+                sender.close()
+                running[receiver] = (process, name, time.monotonic())
+
+            wait_timeout = None
+            if timeout is not None:
+                next_deadline = min(started for _, _, started in running.values()) + timeout
+                wait_timeout = max(0.0, next_deadline - time.monotonic())
+
+            for receiver in wait(list(running), timeout=wait_timeout):
+                process, name, started = running.pop(receiver)
+                try:
+                    result = receiver.recv()
+                except EOFError:
+                    process.join()
+                    result = TournamentResult(name, 'failed', None, time.monotonic() - started,
+                                              f"worker exited with code {process.exitcode}")
+                receiver.close()
+                process.join()
+                yield result
+
+            if timeout is not None:
+                now = time.monotonic()
+                for receiver, (process, name, started) in list(running.items()):
+                    if now - started >= timeout:
+                        del running[receiver]
+                        process.kill()
+                        process.join()
+                        receiver.close()
+                        yield TournamentResult(name, 'timeout', None, now - started, f"timed out after {timeout:g}s")
+    finally:
+        # Stop any workers still running if the caller stops iterating early
+        for receiver, (process, _, _) in running.items():
+            process.kill()
+            process.join()
+            receiver.close()
+
+
+def run_tournament(names, evaluate, args, workers=1, timeout=None):
+    """
+    Score each named regressor with `evaluate(name, *args)`, yielding a TournamentResult
+    as each one finishes.
+
+    With a single worker and no timeout the regressors are scored one after another in
+    this process. Otherwise each is scored in a worker process, at most `workers` at a
+    time, and killed if it runs longer than `timeout` seconds.
+    """
+    if workers <= 1 and timeout is None:
+        for name in names:
+            yield _run_one(name, evaluate, args)
+        return
+    yield from _run_parallel(names, evaluate, args, max(1, workers), timeout)
@@ -32,50 +32,31 @@ Then run the script using:
 `python determine_alpha_for_vwc_estimation.py`
 """
 
-import numpy as np
-import matplotlib.pyplot as plt
-from scipy.optimize import curve_fit
-from dotenv import load_dotenv
-import os
+import argparse
 
-# Load environment variables from .env file
-load_dotenv()
+from calibration import LinearModel
+from calibration.cli import add_plot_arguments, add_variable_arguments, load_variables, plot_options
+from calibration.plotting import fit_curve, plot_fit
 
-# Assuming the .env file has the VWC and DP data as comma-separated strings
-VWC_vals_str = os.getenv("VWC_VALS")
-DP_vals_str = os.getenv("DP_VALS")
+# Set up command-line argument parsing
+parser = argparse.ArgumentParser(description='Fit a linear model to VWC and dielectric permittivity data to determine alpha.')
+add_variable_arguments(parser, predictor='VWC_VALS', response='DP_VALS')
+add_plot_arguments(parser)
+args = parser.parse_args()
 
-# Convert the comma-separated strings into numpy arrays of floats
-VWC = np.array([float(v) for v in VWC_vals_str.split(',')])
-DP = np.array([float(d) for d in DP_vals_str.split(',')])
+# Load the VWC and DP data from the .env file or data file
+VWC, DP = load_variables(args)
 
-# Define the linear model function
-def linear_model(VWC, alpha, beta):
-        return alpha * VWC + beta
-
-# Perform the curve fitting
-params, covariance = curve_fit(linear_model, VWC, DP)
+# Perform the linear fit
+model = LinearModel().fit(VWC, DP)
 
 # Extract the fitted parameters (alpha and beta)
-alpha_fitted, beta_fitted = params
-
-# Generate VWC values for plotting the fitted curve
-VWC_values_for_curve = np.linspace(min(VWC), max(VWC), 100)
-
-# Calculate the fitted curve using the fitted parameters
-fitted_curve = linear_model(VWC_values_for_curve, alpha_fitted, beta_fitted)
+alpha_fitted = model.params['alpha']
 
 # Plot the original data and the fitted curve
-plt.figure(figsize=(10, 5))
-plt.scatter(VWC, DP, label='Observed Data')
-plt.plot(VWC_values_for_curve, fitted_curve, 'r-', label=f'Fitted Line (alpha={alpha_fitted:.2f})')
-plt.xlabel('Volumetric Water Content (VWC)')
-plt.ylabel('Dielectric Permittivity (DP)')
-plt.title('Linear Fit to Determine Alpha')
-plt.legend()
-plt.grid(True)
-plt.show()
+plot_fit(VWC, DP, fit_curve(model, VWC, points=100), f'Fitted Line (alpha={alpha_fitted:.2f})',
+         xlabel='Volumetric Water Content (VWC)', ylabel='Dielectric Permittivity (DP)',
+         title='Linear Fit to Determine Alpha', **plot_options(args))
 
 # Output the fitted alpha value
 print(f"The fitted alpha value is: {alpha_fitted}")
-
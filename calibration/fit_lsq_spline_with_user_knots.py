@@ -18,49 +18,31 @@ Install the packages using:
 `pip install numpy scipy python-dotenv matplotlib`
 """
 
-import os
-import numpy as np
-from scipy.interpolate import LSQUnivariateSpline
-from dotenv import load_dotenv
 import argparse
-import matplotlib.pyplot as plt
+
+from calibration import LinearSplineModel, evaluate, format_metrics
+from calibration.cli import add_plot_arguments, add_variable_arguments, load_variables, plot_options
+from calibration.plotting import fit_curve, plot_fit_diagnostics
+from calibration.splines import sort_by_predictor, validate_knots
 
 # Set up argument parser to accept multiple knot values
 parser = argparse.ArgumentParser(description='Fit a LSQ Univariate Spline to humidity and VWC data.')
 parser.add_argument('-k', '--knot', type=float, action='append', help='The knot value(s) for the spline.')
+add_variable_arguments(parser, predictor='RAW', response='VWC')
+add_plot_arguments(parser)
 args = parser.parse_args()
 
-# Load the environment variables from .env file
-load_dotenv()
-
-# Fetch environment variables and convert them to numpy arrays
-raw = np.array(os.getenv('RAW').split(','), dtype=float)
-true_vwc = np.array(os.getenv('VWC').split(','), dtype=float)
+# Fetch environment variables or data file columns as numpy arrays
+raw, true_vwc = load_variables(args)
 
 # Sort the data by raw, required for LSQUnivariateSpline
-sorted_indices = np.argsort(raw)
-raw_sorted = raw[sorted_indices]
-true_vwc_sorted = true_vwc[sorted_indices]
-
-# Ensure there are enough points around each knot and knots are within interior
-def validate_knots(h_vals, knots):
-    if not knots:
-        return []
-    valid_knots = []
-    for knot in knots:
-        if h_vals[0] < knot < h_vals[-1]:  # Check if knot is in the interior
-            idx = np.searchsorted(h_vals, knot)
-            # Ensure at least two points in each segment for k=1
-            if idx > 0 and idx < len(h_vals) - 1:
-                valid_knots.append(knot)
-    return valid_knots
+raw_sorted, true_vwc_sorted = sort_by_predictor(raw, true_vwc)
 
 # Use the provided knot value(s) if given, otherwise default to [28]
 provided_knots = args.knot if args.knot is not None else [28]
-knots = validate_knots(raw_sorted, provided_knots)
 
-# Sort the validated knots
-knots.sort()
+# Keep the knots that are within the data range with enough points around them
+knots = validate_knots(raw_sorted, provided_knots)
 
 # Check if there are valid knots after validation
 if not knots:
@@ -74,82 +56,23 @@ print(f"Validated knots: {knots}")
 
 # Create the LSQ Univariate Spline for linear fit
 try:
-    spline = LSQUnivariateSpline(raw_sorted, true_vwc_sorted, t=knots, k=1)
+    model = LinearSplineModel(knots).fit(raw_sorted, true_vwc_sorted)
 except ValueError as e:
     print(f"Error creating spline: {e}")
     print("Ensure that the knots satisfy the Schoenberg-Whitney conditions.")
     exit(1)
 
-# Get coefficients for each segment
-coefficients = []
-for i in range(len(knots) + 1):
-    if i == 0:
-        x = raw_sorted[raw_sorted <= knots[0]]
-        y = true_vwc_sorted[:len(x)]
-    elif i == len(knots):
-        x = raw_sorted[raw_sorted > knots[-1]]
-        y = true_vwc_sorted[-len(x):]
-    else:
-        x = raw_sorted[(raw_sorted > knots[i-1]) & (raw_sorted <= knots[i])]
-        y = true_vwc_sorted[(raw_sorted > knots[i-1]) & (raw_sorted <= knots[i])]
-
-    # Fit a new linear model for each segment to get coefficients
-    A = np.vstack([x, np.ones(len(x))]).T
-    m, c = np.linalg.lstsq(A, y, rcond=None)[0]
-    coefficients.append((m, c))
+# Get the slope and intercept of each segment from the fitted spline
+coefficients = list(zip(*model.segment_coefficients()))
 
 # Print the coefficients for each linear segment
 for i, (m, c) in enumerate(coefficients):
     print(f"Segment {i+1} Coefficients: Slope = {m}, Intercept = {c}")
 
-# Plotting section
-# Use a finer grid for plotting the fitted spline
-raw_vals_for_curve = np.linspace(min(raw_sorted), max(raw_sorted), 200)
-fitted_values_for_curve = spline(raw_vals_for_curve)
-
-# Predict the VWC values using the spline model
-predicted_VWC = spline(raw_sorted)
-
-# Calculate residuals
-residuals = true_vwc_sorted - predicted_VWC
-
-# Calculate Mean Squared Error and Root Mean Squared Error
-MSE = np.mean(residuals**2)
-RMSE = np.sqrt(MSE)
-SEM = np.std(residuals) / np.sqrt(len(residuals))
-
-print(f"MSE: {MSE:.8f}")
-print(f"RMSE: {RMSE:.8f}")
-print(f"SEM: {SEM:.8f}")
+# Predict the VWC values using the spline model and report the errors
+predicted_VWC = model.predict(raw_sorted)
+print(format_metrics(evaluate(true_vwc_sorted, predicted_VWC)))
 
 # Plot the original data and the fitted curve, and residuals
-plt.figure(figsize=(15, 7))
-
-# Original Data and Spline Fit Plot
-plt.subplot(1, 3, 1)
-plt.scatter(raw_sorted, true_vwc_sorted, color='blue', label='Actual VWC')
-plt.plot(raw_vals_for_curve, fitted_values_for_curve, 'r-', label=f'Spline Fit with knots at {knots}')
-plt.xlabel('Sensor Readings')
-plt.ylabel('Volumetric Water Content (VWC)')
-plt.title('Sensor Readings vs. VWC')
-plt.legend()
-
-# Predicted VWC vs. Actual VWC
-plt.subplot(1, 3, 2)
-plt.scatter(true_vwc_sorted, predicted_VWC, color='green', label='Predicted VWC')
-plt.plot([true_vwc_sorted.min(), true_vwc_sorted.max()], [true_vwc_sorted.min(), true_vwc_sorted.max()], 'k--', lw=2, label='Perfect Prediction')
-plt.xlabel('Actual VWC')
-plt.ylabel('Predicted VWC')
-plt.title('Actual vs. Predicted VWC')
-plt.legend()
-
-# Residuals vs Predicted VWC
-plt.subplot(1, 3, 3)
-plt.scatter(predicted_VWC, residuals, color='purple')
-plt.axhline(y=0, color='r', linestyle='--')
-plt.xlabel('Predicted VWC')
-plt.ylabel('Residuals')
-plt.title(f'Residuals vs. Predicted VWC\nMSE: {MSE:.8f} | RMSE: {RMSE:.8f} | SEM: {SEM:.8f}')
-
-plt.tight_layout()
-plt.show()
+plot_fit_diagnostics(raw_sorted, true_vwc_sorted, predicted_VWC, f'Spline Fit with knots at {knots}',
+                     curve=fit_curve(model, raw_sorted), **plot_options(args))
@@ -11,41 +11,69 @@ Before running, also make sure that all required Python packages are installed i
 Usage:
 1. Set 'HUMIDITY_VALS' and 'VWC_VALS' environment variables with your dataset.
 2. Run the script in an environment with the required dependencies.
-3. Input a new humidity reading when prompted to get the VWC prediction.
+3. Input a new humidity reading when prompted to get the VWC prediction, or convert a whole file of readings with
+   `python linear_gam.py --predict readings.txt > vwc.csv`.
 """
 
-import os
+import argparse
+import sys
+
 import numpy as np
-from dotenv import load_dotenv
-from pygam import LinearGAM
-from sklearn.model_selection import train_test_split
 
-# Load the environment variables
-load_dotenv()
+from calibration import GAMModel
+from calibration.artifacts import load_or_fit
+from calibration.cli import add_cross_validation_arguments, add_variable_arguments, load_variables, make_folds
+from calibration.crossval import cross_validate_model, format_score
+from calibration.predict import predict_array, write_predictions
+
+# Set up command-line argument parsing
+parser = argparse.ArgumentParser(description='Fit a Linear GAM to humidity and VWC data and predict VWC from a sensor reading.')
+add_variable_arguments(parser, predictor='RAW', response='VWC')
+parser.add_argument('--predict', type=str, default=None,
+                    help="Convert a file of sensor readings ('-' for standard input) instead of prompting for one reading.")
+parser.add_argument('--predict-column', type=str, default=None, help='Column holding the readings when --predict is a data file.')
+parser.add_argument('--model', type=str, default=None,
+                    help='Model artifact to load instead of training. It is trained and saved there if it does not exist yet '
+                         'or was trained on different data.')
+parser.add_argument('--refit', action='store_true', help='Retrain and overwrite the --model artifact even if it is up to date.')
+add_cross_validation_arguments(parser)
+args = parser.parse_args()
+
+# Retrieve data from environment variables or the data file
+humidity_vals, vwc_vals = load_variables(args)
 
-# Retrieve data from environment variables
-humidity_vals = np.array(os.getenv('RAW').split(', '), dtype=np.float64)
-vwc_vals = np.array(os.getenv('VWC').split(', '), dtype=np.float64)
+# Initialize and train the Generalized Additive Model, or load the one trained on the same data before
+def train_gam():
+    from sklearn.model_selection import train_test_split
 
-# Reshape data for model fitting
-X = humidity_vals.reshape(-1, 1)
-y = vwc_vals
+    # Split the data into training and testing sets
+    X_train, X_test, y_train, y_test = train_test_split(humidity_vals, vwc_vals, test_size=0.2, random_state=42)
+    return GAMModel().fit(X_train, y_train)
 
-# Split the data into training and testing sets
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+if args.model is not None:
+    gam = load_or_fit(args.model, train_gam, data=(humidity_vals, vwc_vals), refit=args.refit)
+else:
+    gam = train_gam()
 
-# Initialize and train the Generalized Additive Model
-gam = LinearGAM().fit(X_train, y_train)
+# Optionally report the cross-validated error of the model, which is more reliable than a single train/test split
+folds = make_folds(args, len(vwc_vals))
+if folds is not None:
+    score = cross_validate_model(GAMModel(), humidity_vals, vwc_vals, folds)
+    print(f"Cross-validated MSE over {len(folds)} folds: {format_score(score)}", file=sys.stderr)
 
-# Function to make a prediction based on sensor readings
+# Function to make predictions based on sensor readings; accepts a single reading or an array of readings
 def predict_vwc(sensor_reading):
-    sensor_reading = np.array([sensor_reading]).reshape(-1, 1)
-    predicted_vwc = gam.predict(sensor_reading)
-    return predicted_vwc[0]
+    if np.ndim(sensor_reading) == 0:
+        return predict_array(gam, [sensor_reading])[0]
+    return predict_array(gam, sensor_reading)
 
 # Main program to accept sensor input and make a prediction
 if __name__ == "__main__":
-    # Ask for a new sensor reading
-    sensor_input = float(input("Enter the sensor humidity reading: "))
-    predicted_vwc = predict_vwc(sensor_input)
-    print(f"The predicted VWC for a humidity reading of {sensor_input} is {predicted_vwc}")
+    if args.predict is not None:
+        # Convert every reading in the file with vectorized predictions and stream the VWC values to standard output
+        write_predictions(gam, args.predict, sys.stdout, column=args.predict_column)
+    else:
+        # Ask for a new sensor reading
+        sensor_input = float(input("Enter the sensor humidity reading: "))
+        predicted_vwc = predict_vwc(sensor_input)
+        print(f"The predicted VWC for a humidity reading of {sensor_input} is {predicted_vwc}")
@@ -12,81 +12,98 @@ Example:
 Please ensure the data is preprocessed appropriately, and that the necessary Python packages are installed and available in your environment.
 
 The script will output the test MSE for each model, providing a quick comparison of their performance on the provided dataset.
+
+The slowest models (XGBoost, LightGBM, CatBoost and the Gaussian Process) dominate the run time. Use --workers (-w) to fit
+models in parallel worker processes and --timeout (-t) to skip models that take longer than the given number of seconds.
+Models are reported as they finish, so the fast ones show up first; a model that fails or times out is reported and skipped.
+
+`python multi_model_regressor.py -p HUMIDITY_VALS -r VWC_VALS --workers 4 --timeout 60`
+
+With only a few dozen calibration points the ranking from a single train/test split is mostly noise. Use --cv K (optionally
+with --repeats R) for repeated K-fold cross-validation or --loo for leave-one-out; every model is scored on the same folds
+and the mean and standard deviation of the fold MSEs are reported. The linear and polynomial models are scored in closed
+form, without refitting per fold.
+
+Several predictor variables may be given to -p, e.g. the raw reading together with the temperature and bulk EC the
+THC-S reports, so the models can compensate for them:
+
+`python multi_model_regressor.py -p RAW TEMPERATURE BULK_EC -r VWC --data readings.csv --cv 5`
+
+The polynomial features of the predictors (with their interaction terms) are built once, up to the highest degree, and
+shared by all polynomial models, which are fitted by least squares on them.
 """
 
-import os
 import argparse
+
 import numpy as np
-from dotenv import load_dotenv
-from sklearn.linear_model import LinearRegression, Ridge, Lasso, ElasticNet
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
-from sklearn.svm import SVR
-from sklearn.neighbors import KNeighborsRegressor
-from sklearn.gaussian_process import GaussianProcessRegressor
-from sklearn.preprocessing import PolynomialFeatures
-from sklearn.pipeline import make_pipeline
+from calibration.cli import (add_cross_validation_arguments, add_variable_arguments, load_variables, make_folds,
+                             predictor_vars)
+from calibration.crossval import cross_validate_regressor, format_score
+from calibration.features import PolynomialFeatures
+from calibration.regressors import POLYNOMIAL_DEGREES, REGRESSORS
+from calibration.tournament import fit_and_score, run_tournament
 from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_squared_error
-from pygam import LinearGAM
-from xgboost import XGBRegressor
-from lightgbm import LGBMRegressor
-from catboost import CatBoostRegressor
-
-# Set up command-line arguments
-parser = argparse.ArgumentParser(description='Fit various regression models to data specified in environment variables.')
-parser.add_argument('-p', '--predictor-var', type=str, help='Environment variable name for the predictor variable data.', required=True)
-parser.add_argument('-r', '--response-var', type=str, help='Environment variable name for the response variable data.', required=True)
-args = parser.parse_args()
-
-# Load environment variables
-load_dotenv()
-
-# Retrieve and validate data from environment variables
-predictor_var_string = os.getenv(args.predictor_var)
-response_var_string = os.getenv(args.response_var)
-
-if predictor_var_string is None or response_var_string is None:
-    raise ValueError(f"Data not found. Please ensure the environment variables '{args.predictor_var}' and '{args.response_var}' are set.")
-
-predictor_vals = np.array(predictor_var_string.split(', '), dtype=np.float64).reshape(-1, 1)
-response_vals = np.array(response_var_string.split(', '), dtype=np.float64)
-
-# Split the data into training and testing sets
-X_train, X_test, y_train, y_test = train_test_split(predictor_vals, response_vals, test_size=0.2, random_state=42)
-
-# Define models
-models = {
-    'Linear Regression': LinearRegression(),
-    'Ridge Regression': Ridge(),
-    'Lasso Regression': Lasso(),
-    'Elastic Net Regression': ElasticNet(),
-    '1st Degree Polynomial Regression': make_pipeline(PolynomialFeatures(degree=1), LinearRegression()),
-    '2nd Degree Polynomial Regression': make_pipeline(PolynomialFeatures(degree=2), LinearRegression()),
-    '3rd Degree Polynomial Regression': make_pipeline(PolynomialFeatures(degree=3), LinearRegression()),
-    '4th Degree Polynomial Regression': make_pipeline(PolynomialFeatures(degree=4), LinearRegression()),
-    'GAM': LinearGAM(),
-    'Random Forest': RandomForestRegressor(random_state=42),
-    'Gradient Boosting': GradientBoostingRegressor(random_state=42),
-    'XGBoost': XGBRegressor(random_state=42),
-    'LightGBM': LGBMRegressor(random_state=42, verbose=-1),
-    'CatBoost': CatBoostRegressor(random_state=42, verbose=0),
-    'SVR': SVR(),
-    'KNN': KNeighborsRegressor(),
-    'Gaussian Processes': GaussianProcessRegressor(random_state=42),
-}
-
-# Train and evaluate models, and store results in a dictionary
-mse_results = {}
-for name, model in models.items():
-    model.fit(X_train, y_train)
-    predictions = model.predict(X_test)
-    mse = mean_squared_error(y_test, predictions)
-    mse_results[name] = mse
-
-# Sort models by MSE in ascending order
-sorted_mse_results = sorted(mse_results.items(), key=lambda item: item[1])
-
-# Print sorted results
-print("Model performance sorted from best to worst (by Test MSE):")
-for name, mse in sorted_mse_results:
-    print(f'{name} Test MSE: {mse}')
+
+
+def main():
+    # Set up command-line arguments
+    parser = argparse.ArgumentParser(description='Fit various regression models to data specified in environment variables or a data file.')
+    add_variable_arguments(parser, multiple=True)
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help='Number of worker processes fitting models in parallel. Defaults to 1, fitting them one after another.')
+    parser.add_argument('-t', '--timeout', type=float, default=None,
+                        help='Seconds after which a model still fitting is stopped and skipped. Runs models in worker processes.')
+    add_cross_validation_arguments(parser)
+    args = parser.parse_args()
+
+    # Retrieve and validate data from environment variables or the data file
+    predictor_vals, response_vals = load_variables(args)
+    predictor_vals = predictor_vals.reshape(len(response_vals), -1)
+
+    # Build the polynomial features shared by the polynomial models once, up to the highest degree
+    features = PolynomialFeatures(predictor_vals, max(POLYNOMIAL_DEGREES.values()), predictor_vars(args))
+
+    # Split the data into training and testing sets, or draw the cross-validation folds shared by all models
+    folds = make_folds(args, len(response_vals))
+    if folds is None:
+        train, test = train_test_split(np.arange(len(response_vals)), test_size=0.2, random_state=42)
+        evaluate = fit_and_score
+        evaluate_args = (predictor_vals[train], response_vals[train], predictor_vals[test], response_vals[test],
+                         (features.rows(train), features.rows(test)))
+        metric = 'Test MSE'
+    else:
+        evaluate, evaluate_args = cross_validate_regressor, (predictor_vals, response_vals, folds, features)
+        metric = f'CV MSE (mean ± std over {len(folds)} folds)'
+
+    def describe(score):
+        return format_score(score) if folds is not None else f'{score}'
+
+    # Train and evaluate models, reporting each one as it finishes and storing the results in a dictionary
+    mse_results = {}
+    skipped = []
+    for result in run_tournament(REGRESSORS, evaluate, evaluate_args, workers=args.workers, timeout=args.timeout):
+        if result.status == 'ok':
+            mse_results[result.name] = result.score
+            print(f'Finished {result.name} in {result.elapsed:.2f}s, {metric}: {describe(result.score)}', flush=True)
+        else:
+            skipped.append(result)
+            print(f'Skipped {result.name}: {result.error}', flush=True)
+
+    # Sort models by (mean) MSE in ascending order
+    sorted_mse_results = sorted(mse_results.items(), key=lambda item: item[1] if folds is None else item[1].mean)
+
+    # Print sorted results
+    print("")
+    print(f"Model performance sorted from best to worst (by {metric}):")
+    for name, score in sorted_mse_results:
+        print(f'{name} {metric}: {describe(score)}')
+
+    if skipped:
+        print("")
+        print("Models that failed or timed out:")
+        for result in skipped:
+            print(f'{result.name}: {result.error}')
+
+
+if __name__ == "__main__":
+    main()
@@ -7,11 +7,12 @@ is sourced from environment variables 'HUMIDITY_VALS' and 'VWC_VALS', which shou
 for humidity and Volumetric Water Content (VWC) respectively.
 
 The script outputs the optimal breakpoint and the coefficients of the two linear models. It also saves these results to a
-text file named 'coefficients.txt'.
+text file named 'coefficients.txt'. With --segments K, K - 1 breakpoints are searched for instead, which suits long logged
+sensor sweeps.
 
 Pre-requisites:
 - Set 'HUMIDITY_VALS' and 'VWC_VALS' in your environment variables with valid numerical values.
-- Install required Python packages: statsmodels, scikit-learn, python-dotenv, numpy
+- Install required Python packages: python-dotenv, numpy, matplotlib
 
 Usage:
 1. Ensure that the necessary environment variables are set.
@@ -19,130 +20,65 @@ Usage:
 3. Review the outputted optimal breakpoint and coefficients, or check the 'coefficients.txt' file.
 """
 
-import os
-import numpy as np
-import statsmodels.api as sm
-from statsmodels.tools.tools import add_constant
-from sklearn.metrics import mean_squared_error
-from dotenv import load_dotenv
-import matplotlib.pyplot as plt
-
-
-# Load the environment variables from .env file
-load_dotenv()
-
-# Fetch environment variables and convert them to numpy arrays
-humidity_vals = np.array(os.getenv('RAW').split(','), dtype=float)
-vwc_vals = np.array(os.getenv('VWC').split(','), dtype=float)
-
-# Function to find the best breakpoint using BIC
-def find_best_breakpoint(humidity, vwc, min_segment_size=5):
-    best_breakpoint = None
-    lowest_bic = float('inf')
-
-    # Only consider breakpoints where each segment has at least `min_segment_size` observations
-    for i in range(min_segment_size, len(humidity) - min_segment_size):
-        potential_breakpoint = humidity[i]
-
-        # Segments
-        s1 = humidity[:i]
-        s2 = humidity[i:]
-        vwc_s1 = vwc[:i]
-        vwc_s2 = vwc[i:]
-
-        # Fit models
-        model1 = sm.OLS(vwc_s1, add_constant(s1)).fit()
-        model2 = sm.OLS(vwc_s2, add_constant(s2)).fit()
-
-        # Combined BIC
-        combined_bic = model1.bic + model2.bic
+import argparse
 
-        # Check if we have a new best BIC
-        if combined_bic < lowest_bic:
-            lowest_bic = combined_bic
-            best_breakpoint = potential_breakpoint
-
-    return best_breakpoint
-
-# Find the optimal breakpoint
-optimal_breakpoint = find_best_breakpoint(humidity_vals, vwc_vals)
-
-# Output the breakpoint
-print(f"Optimal Breakpoint: {optimal_breakpoint}")
-
-# Split the data at the optimal breakpoint
-breakpoint_index = np.where(humidity_vals == optimal_breakpoint)[0][0]
-segment1 = humidity_vals[:breakpoint_index]
-segment2 = humidity_vals[breakpoint_index:]
-vwc_segment1 = vwc_vals[:breakpoint_index]
-vwc_segment2 = vwc_vals[breakpoint_index:]
-
-# Fit the linear models to both segments
-model1 = sm.OLS(vwc_segment1, add_constant(segment1)).fit()
-model2 = sm.OLS(vwc_segment2, add_constant(segment2)).fit()
+import numpy as np
 
-# Print or save the coefficients
-print(f"Segment 1 Coefficients: Slope = {model1.params[1]}, Intercept = {model1.params[0]}")
-print(f"Segment 2 Coefficients: Slope = {model2.params[1]}, Intercept = {model2.params[0]}")
+from calibration import PiecewiseLinearModel, evaluate, format_metrics
+from calibration.cli import (add_plot_arguments, add_robust_arguments, add_variable_arguments, format_robust_fit, load_variables,
+                             plot_options, robust_options)
+from calibration.plotting import plot_fit_diagnostics
+
+# Set up command-line argument parsing
+parser = argparse.ArgumentParser(description='Fit a piecewise linear model to humidity and VWC data.')
+add_variable_arguments(parser, predictor='RAW', response='VWC')
+parser.add_argument('-k', '--segments', type=int, default=2, help='Number of linear segments. Defaults to 2.')
+parser.add_argument('--min-segment-size', type=int, default=5, help='Minimum number of observations per segment. Defaults to 5.')
+add_robust_arguments(parser)
+add_plot_arguments(parser)
+args = parser.parse_args()
+
+# Fetch environment variables or data file columns as numpy arrays
+humidity_vals, vwc_vals = load_variables(args)
+
+# Find the optimal breakpoints and fit the linear models to every segment
+model = PiecewiseLinearModel(n_segments=args.segments, min_segment_size=args.min_segment_size,
+                             **robust_options(args)).fit(humidity_vals, vwc_vals)
+breakpoints = model.params['breakpoints']
+segments = model.params['segments']
+
+# Output the breakpoints and the coefficients
+lines = [f"Optimal Breakpoint: {breakpoint}" for breakpoint in breakpoints]
+lines += [f"Segment {i} Coefficients: Slope = {slope}, Intercept = {intercept}"
+          for i, (slope, intercept) in enumerate(segments, start=1)]
+print('\n'.join(lines))
+if args.robust:
+    print(format_robust_fit(model))
 
 # Optionally, save to a text file
 with open('coefficients.txt', 'w') as file:
-    file.write(f"Optimal Breakpoint: {optimal_breakpoint}\n")
-    file.write(f"Segment 1 Coefficients: Slope = {model1.params[1]}, Intercept = {model1.params[0]}\n")
-    file.write(f"Segment 2 Coefficients: Slope = {model2.params[1]}, Intercept = {model2.params[0]}\n")
+    file.writelines(line + '\n' for line in lines)
+
+# Predict the VWC values using the piecewise linear model and report the errors
+predicted_VWC = model.predict(humidity_vals)
+print(format_metrics(evaluate(vwc_vals, predicted_VWC)))
 
-# Use a finer grid for plotting the fitted segments
-predictor_vals_for_curve = np.linspace(min(humidity_vals), max(humidity_vals), 200)
+# Plot the original data and the fitted segments, and residuals
+order = np.argsort(humidity_vals, kind='stable')
+segment_of = model.segment_index(humidity_vals[order])
 
-# Get the fitted values for each segment
-fitted_values_segment1 = model1.predict(add_constant(segment1))
-fitted_values_segment2 = model2.predict(add_constant(segment2))
 
-# Predict the VWC values using the piecewise linear model
-predicted_VWC = np.concatenate((fitted_values_segment1, fitted_values_segment2))
+def segment_curve(i):
+    in_segment = segment_of == i
+    return humidity_vals[order][in_segment], predicted_VWC[order][in_segment]
 
-# Calculate residuals
-residuals = vwc_vals - predicted_VWC
 
-# Calculate Mean Squared Error and Root Mean Squared Error
-MSE = mean_squared_error(vwc_vals, predicted_VWC)
-RMSE = np.sqrt(MSE)
-SEM = np.std(residuals) / np.sqrt(len(residuals))
+def plot_segments(ax):
+    for i in range(1, len(segments)):
+        ax.plot(*segment_curve(i), '-', label=f'Piecewise Fit Segment {i + 1}')
+    for breakpoint in breakpoints:
+        ax.axvline(x=breakpoint, color='k', linestyle='--', label=f'Breakpoint at {breakpoint}')
 
-print(f"MSE: {MSE:.8f}")
-print(f"RMSE: {RMSE:.8f}")
-print(f"SEM: {SEM:.8f}")
 
-# Plot the original data and the fitted segments, and residuals
-plt.figure(figsize=(15, 7))
-
-# Original Data and Piecewise Fit Plot
-plt.subplot(1, 3, 1)
-plt.scatter(humidity_vals, vwc_vals, color='blue', label='Actual VWC')
-plt.plot(segment1, fitted_values_segment1, 'r-', label='Piecewise Fit Segment 1')
-plt.plot(segment2, fitted_values_segment2, 'g-', label='Piecewise Fit Segment 2')
-plt.axvline(x=optimal_breakpoint, color='k', linestyle='--', label=f'Breakpoint at {optimal_breakpoint}')
-plt.xlabel('Sensor Readings')
-plt.ylabel('Volumetric Water Content (VWC)')
-plt.title('Sensor Readings vs. VWC')
-plt.legend()
-
-# Predicted VWC vs. Actual VWC
-plt.subplot(1, 3, 2)
-plt.scatter(vwc_vals, predicted_VWC, color='green', label='Predicted VWC')
-plt.plot([vwc_vals.min(), vwc_vals.max()], [vwc_vals.min(), vwc_vals.max()], 'k--', lw=2, label='Perfect Prediction')
-plt.xlabel('Actual VWC')
-plt.ylabel('Predicted VWC')
-plt.title('Actual vs. Predicted VWC')
-plt.legend()
-
-# Residuals vs Predicted VWC
-plt.subplot(1, 3, 3)
-plt.scatter(predicted_VWC, residuals, color='purple')
-plt.axhline(y=0, color='r', linestyle='--')
-plt.xlabel('Predicted VWC')
-plt.ylabel('Residuals')
-plt.title(f'Residuals vs. Predicted VWC\nMSE: {MSE:.8f} | RMSE: {RMSE:.8f} | SEM: {SEM:.8f}')
-
-plt.tight_layout()
-plt.show()
\ No newline at end of file
+plot_fit_diagnostics(humidity_vals, vwc_vals, predicted_VWC, 'Piecewise Fit Segment 1',
+                     curve=segment_curve(0), extra=plot_segments, **plot_options(args))
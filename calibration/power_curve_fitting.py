@@ -27,81 +27,39 @@ Example usage of the script:
 After running the script, the fitted parameters for the power regression will be printed in the console.
 """
 
-import numpy as np
-from scipy.optimize import curve_fit
-from dotenv import load_dotenv
-import os
-import matplotlib.pyplot as plt
+import argparse
 
-load_dotenv()
+from calibration import PowerModel, evaluate, format_metrics
+from calibration.cli import (add_plot_arguments, add_robust_arguments, add_variable_arguments, format_robust_fit, load_variables,
+                             plot_options, robust_options)
+from calibration.plotting import fit_curve, plot_fit_diagnostics
 
-# Retrieve humidity and VWC values from environment variables and convert them to NumPy arrays
-RAW = np.array(os.getenv('RAW').split(', '), dtype=np.float64)
-TRUE_VWC = np.array(os.getenv('VWC').split(', '), dtype=np.float64)
+# Set up command-line argument parsing
+parser = argparse.ArgumentParser(description='Fit a power function model to sensor data.')
+add_variable_arguments(parser, predictor='RAW', response='VWC')
+add_robust_arguments(parser)
+add_plot_arguments(parser)
+args = parser.parse_args()
 
-# Define the power function for curve fitting
-def power_function(x, a, b, c):
-    return a * np.power(x, b) + c
-
-# Initial guesses for the power function parameters
-initial_guess = [1, 0.5, 1]
+# Retrieve humidity and VWC values from environment variables or the data file
+RAW, TRUE_VWC = load_variables(args)
 
 # Perform the curve fitting using the power function and initial parameter guesses
-params, _ = curve_fit(power_function, RAW, TRUE_VWC, p0=initial_guess, maxfev=10000)
+model = PowerModel(p0=[1, 0.5, 1], maxfev=10000, **robust_options(args)).fit(RAW, TRUE_VWC)
+params = model.params['coefficients']
 
 # Print the fitted parameters for the power regression model, each on its own line
 print("The fitted parameters for the power regression are:")
 print(f"a (pre-exponential factor): {params[0]}")
 print(f"b (exponent): {params[1]}")
 print(f"c (vertical offset): {params[2]}")
+if args.robust:
+    print(format_robust_fit(model))
 
-# Use a finer grid for plotting the fitted power curve
-RAW_for_curve = np.linspace(min(RAW), max(RAW), 200)
-fitted_values_for_curve = power_function(RAW_for_curve, *params)
-
-# Predict the VWC values using the power function model
-predicted_VWC = power_function(RAW, *params)
-
-# Calculate residuals
-residuals = TRUE_VWC - predicted_VWC
-
-# Calculate Mean Squared Error and Root Mean Squared Error
-MSE = np.mean(residuals**2)
-RMSE = np.sqrt(MSE)
-SEM = np.std(residuals) / np.sqrt(len(residuals))
-
-print(f"MSE: {MSE:.8f}")
-print(f"RMSE: {RMSE:.8f}")
-print(f"SEM: {SEM:.8f}")
+# Predict the VWC values using the power function model and report the errors
+predicted_VWC = model.predict(RAW)
+print(format_metrics(evaluate(TRUE_VWC, predicted_VWC)))
 
 # Plot the original data and the fitted power curve, and residuals
-plt.figure(figsize=(15, 7))
-
-# Original Data and Power Fit Plot
-plt.subplot(1, 3, 1)
-plt.scatter(RAW, TRUE_VWC, color='blue', label='Actual VWC')
-plt.plot(RAW_for_curve, fitted_values_for_curve, 'r-', label=f'Power Fit: $f(x) = {params[0]:.2f}x^{params[1]:.2f} + {params[2]:.2f}$')
-plt.xlabel('Sensor Readings')
-plt.ylabel('Volumetric Water Content (VWC)')
-plt.title('Sensor Readings vs. VWC')
-plt.legend()
-
-# Predicted VWC vs. Actual VWC
-plt.subplot(1, 3, 2)
-plt.scatter(TRUE_VWC, predicted_VWC, color='green', label='Predicted VWC')
-plt.plot([TRUE_VWC.min(), TRUE_VWC.max()], [TRUE_VWC.min(), TRUE_VWC.max()], 'k--', lw=2, label='Perfect Prediction')
-plt.xlabel('Actual VWC')
-plt.ylabel('Predicted VWC')
-plt.title('Actual vs. Predicted VWC')
-plt.legend()
-
-# Residuals vs Predicted VWC
-plt.subplot(1, 3, 3)
-plt.scatter(predicted_VWC, residuals, color='purple')
-plt.axhline(y=0, color='r', linestyle='--')
-plt.xlabel('Predicted VWC')
-plt.ylabel('Residuals')
-plt.title(f'Residuals vs. Predicted VWC\nMSE: {MSE:.8f} | RMSE: {RMSE:.8f} | SEM: {SEM:.8f}')
-
-plt.tight_layout()
-plt.show()
+plot_fit_diagnostics(RAW, TRUE_VWC, predicted_VWC, f'Power Fit: $f(x) = {params[0]:.2f}x^{{{params[1]:.2f}}} + {params[2]:.2f}$',
+                     curve=fit_curve(model, RAW), **plot_options(args))
@@ -1,52 +1,68 @@
-"""
-This script performs calibration of a sensor for measuring volumetric water content (VWC)
-using empirical data. It loads environmental variables for humidity, true VWC, bulk electrical
-conductivity (EC), and temperature from a .env file and ensures they have the same data length.
-It defines a model function for calibration, fits the model to the data to find the permittivity
-at zero EC, and prints out the result. This calibrated value can be saved for subsequent EC
-calculations.
-
-To run this script, the following Python packages must be installed:
-- numpy: Used for numerical operations on arrays.
-- scipy: Provides the curve fitting functionality.
-- python-dotenv: Enables loading of environment variables from a .env file.
-
-You can install these packages using pip with the following command:
-`pip install numpy scipy python-dotenv`
-"""
-
-import os
-import numpy as np
-from scipy.optimize import curve_fit
-from dotenv import load_dotenv
-
-load_dotenv()
-
-# Load environment variables and convert them to numpy arrays
-humidity_vals = np.array(os.getenv('HUMIDITY_VALS').split(','), dtype=float)
-vwc_vals = np.array(os.getenv('VWC_VALS').split(','), dtype=float)
-bulk_ec = np.array(os.getenv('BULK_EC').split(','), dtype=float)
-temperature = np.array(os.getenv('TEMPERATURE').split(','), dtype=float)
-
-# Check if the lengths of the arrays are the same
-if not (len(humidity_vals) == len(vwc_vals) == len(bulk_ec) == len(temperature)):
-    raise ValueError("All input data lists must be of the same length.")
-
-# Define the model function for calibration; this needs to be adjusted based on the calibration method
-# For example, a simple linear function might be used initially
-def calibration_model(vwc, permittivity_at_zero_ec):
-    return vwc * permittivity_at_zero_ec
-
-# Perform the curve fitting
-params, covariance = curve_fit(calibration_model, vwc_vals, bulk_ec)
-
-# Extract the permittivity when bulk EC is zero
-epsilon_sigma_b_0 = params[0]
-
-print(f"Estimated dielectric permittivity when bulk EC is zero: {epsilon_sigma_b_0}")
-
-# Save the calibrated value to .env or another file if needed
-# with open('.env', 'a') as f:
-#     f.write(f"\nEPSILON_SIGMA_B_0={epsilon_sigma_b_0}")
-
-# Further code to use epsilon_sigma_b_0 in your EC calculations...
+"""
+This script estimates the dielectric permittivity at zero bulk electrical conductivity (EC),
+epsilon_sigma_b_0 (esb_0), of a substrate for the Hilhorst pore-water EC model. It loads bulk
+EC, temperature and either the bulk permittivity or the humidity readings it is computed from
+(with the THC-S firmware's polynomial) from a .env file or a data file. Following Hilhorst, the
+bulk permittivity is regressed against the bulk EC scaled by the temperature-dependent
+permittivity of the pore water; the intercept is esb_0. A bootstrap confidence interval is
+computed across a process pool, and the estimate is saved as a model artifact that
+`python -m calibration pore-water-ec --esb-0 <artifact>` reads directly.
+
+To run this script, the following Python packages must be installed:
+- numpy: Used for numerical operations on arrays.
+- python-dotenv: Enables loading of environment variables from a .env file.
+
+You can install these packages using pip with the following command:
+`pip install numpy python-dotenv`
+"""
+
+import argparse
+
+from calibration.artifacts import save_artifact
+from calibration.cli import add_data_argument
+from calibration.dataset import load_columns
+from calibration.hilhorst import bulk_permittivity, estimate_esb_0
+
+# Set up command-line argument parsing
+parser = argparse.ArgumentParser(description='Estimate the dielectric permittivity at zero bulk EC (esb_0).')
+add_data_argument(parser)
+parser.add_argument('--ec-var', type=str, default='BULK_EC', help='Bulk EC variable or column name. Defaults to BULK_EC.')
+parser.add_argument('--temperature-var', type=str, default='TEMPERATURE',
+                    help='Temperature variable or column name. Defaults to TEMPERATURE.')
+permittivity = parser.add_mutually_exclusive_group()
+permittivity.add_argument('--humidity-var', type=str, default='HUMIDITY_VALS',
+                          help='Humidity variable or column name the bulk permittivity is computed from. Defaults to HUMIDITY_VALS.')
+permittivity.add_argument('--permittivity-var', type=str, default=None,
+                          help='Bulk permittivity variable or column name (e.g. DP_VALS), used instead of the humidity.')
+parser.add_argument('--bootstrap', type=int, default=2000, help='Number of bootstrap resamples. Defaults to 2000; 0 skips the bootstrap.')
+parser.add_argument('--confidence', type=float, default=0.95, help='Confidence level of the interval. Defaults to 0.95.')
+parser.add_argument('--workers', type=int, default=None,
+                    help='Number of bootstrap worker processes. By default small bootstraps run in this process and large ones on every CPU core.')
+parser.add_argument('--seed', type=int, default=None, help='Random seed of the bootstrap.')
+parser.add_argument('-o', '--output', type=str, default='esb_0.json', help='Artifact path. Defaults to esb_0.json.')
+args = parser.parse_args()
+
+# Load environment variables, or the columns of the same names from the data file, as numpy arrays
+bulk_ec, temperature, values = load_columns([args.ec_var, args.temperature_var, args.permittivity_var or args.humidity_var], args.data)
+
+# Check if the lengths of the arrays are the same
+if not (len(bulk_ec) == len(temperature) == len(values)):
+    raise ValueError("All input data lists must be of the same length.")
+
+# Bulk permittivity as logged, or from the humidity readings as the firmware computes it
+permittivity = values if args.permittivity_var else bulk_permittivity(values)
+
+# Regress the bulk permittivity on the temperature-corrected bulk EC and bootstrap the intercept
+model, estimate = estimate_esb_0(bulk_ec, permittivity, temperature, n_boot=args.bootstrap,
+                                 confidence=args.confidence, workers=args.workers, seed=args.seed)
+
+print(f"Estimated dielectric permittivity when bulk EC is zero: {estimate.esb_0:.4f}")
+if estimate.n_boot:
+    print(f"{100 * estimate.confidence:g}% bootstrap confidence interval ({estimate.n_boot} resamples): "
+          f"{estimate.low:.4f} to {estimate.high:.4f}")
+print(f"Pore-water EC implied by the slope: {estimate.pore_water_ec:.4f}")
+
+# Save the estimate to the artifact store, for `python -m calibration pore-water-ec --esb-0`
+save_artifact(model, args.output, data=(bulk_ec, temperature, permittivity),
+              metadata={'source': args.data or '.env', **estimate._asdict()})
+print(f"Saved esb_0 estimate to {args.output}")